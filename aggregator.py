@@ -0,0 +1,707 @@
+"""
+Group presence aggregator.
+
+With many players on one Discord webhook, every checker posting its own
+"is around" / "went to bed" hits Discord's rate limits and floods the channel.
+Instead, checkers can report to this small self-hosted asyncio server, which:
+
+- dedupes per character (many clients, restarts, retries -> one roster entry),
+- keeps entries alive through client heartbeats and expires silent ones after a TTL
+  (a crashed PC no longer leaves someone "around" forever),
+- publishes at most once per interval, either as a digest message with who arrived /
+  left plus the current roster ("digest"), or by editing one roster message in place
+  ("edit").
+
+    python aggregator.py --webhook https://discord.com/api/webhooks/... --token SECRET --host 0.0.0.0
+    python aggregator.py --loadtest --clients 2000 --duration 20   # all on localhost
+
+Client side: set "aggregator_url" (and "aggregator_token") in the checker's config.json;
+AggregatorReporter below then reports there instead of posting to Discord directly.
+
+Protocol:
+    POST /report  {"client_id", "nickname", "state": "present" | "absent", "ts"}
+                  Authorization: Bearer <token>            -> 204
+    GET  /roster  -> {"present": [{"nickname", "since"}...], "clients": n}
+    GET  /healthz -> {"ok": true}
+"""
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import random
+import re
+import secrets
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+
+DEFAULT_PORT = 8787
+DEFAULT_STATE_PATH = Path(__file__).resolve().with_name("aggregator_state.json")
+PUBLISH_INTERVAL_SEC = 30.0     # at most one Discord request per interval
+PRESENCE_TTL_SEC = 10 * 60      # present entries without a heartbeat for this long expire
+HEARTBEAT_SEC = 3 * 60          # clients re-assert "present" this often
+EXPIRE_CHECK_SEC = 15.0
+IDLE_TIMEOUT_SEC = 30.0         # keep-alive connections idle this long are closed
+MAX_HEADER_BYTES = 8192
+MAX_BODY_BYTES = 4096
+MAX_NICKNAME_LEN = 64
+DISCORD_MAX_CHARS = 2000
+DISCORD_MAX_RETRIES = 3         # 429s waited out per request; then the changes go with the next publish
+CLIENT_RETRY_BASE_SEC = 2.0
+CLIENT_RETRY_MAX_SEC = 120.0
+
+STATE_PRESENT = "present"
+STATE_ABSENT = "absent"
+
+
+# ===== server =====
+class _Request:
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[_Request]:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None  # client closed between requests
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split()
+    if len(parts) < 2:
+        raise ValueError("bad request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise ValueError("body too large")
+    body = await reader.readexactly(length) if length else b""
+    return _Request(parts[0].upper(), parts[1].split("?", 1)[0], headers, body)
+
+
+def _response(status: int, body=None, keep_alive: bool = True) -> bytes:
+    reason = {200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+              404: "Not Found", 413: "Payload Too Large"}.get(status, "OK")
+    data = b"" if body is None else json.dumps(body, separators=(",", ":")).encode("utf-8")
+    head = f"HTTP/1.1 {status} {reason}\r\nContent-Length: {len(data)}\r\n"
+    if data:
+        head += "Content-Type: application/json\r\n"
+    head += "Connection: keep-alive\r\n\r\n" if keep_alive else "Connection: close\r\n\r\n"
+    return head.encode("latin-1") + data
+
+
+class Aggregator:
+    def __init__(self, webhook_url: str, token: str = "", mode: str = "digest",
+                 publish_interval: float = PUBLISH_INTERVAL_SEC, ttl: float = PRESENCE_TTL_SEC,
+                 state_path: Optional[Path] = None, log_fn: Callable[[str], None] = print, clock=time.time):
+        if mode not in ("digest", "edit"):
+            raise ValueError(f"unknown mode {mode!r}")
+        self.webhook_url = webhook_url
+        self.token = token
+        self.mode = mode
+        self.publish_interval = publish_interval
+        self.ttl = ttl
+        self.state_path = Path(state_path) if state_path else None
+        self.log_fn = log_fn
+        self.clock = clock
+
+        # character key (casefolded nickname) -> {"nickname", "state", "since", "last_seen", "client_id"}
+        self.roster: Dict[str, dict] = {}
+        self.arrived: Dict[str, str] = {}   # changes since the last publish (key -> nickname)
+        self.left: Dict[str, str] = {}
+        self.dirty = False
+        self.message_id: Optional[str] = None
+
+        self.reports = 0
+        self.discord_requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks: List[asyncio.Task] = []
+        self._load_state()
+
+    # ----- persisted state (roster + edited message id survive restarts) -----
+    def _load_state(self) -> None:
+        if self.state_path is None or not self.state_path.exists():
+            return
+        try:
+            data = json.loads(self.state_path.read_text(encoding="utf-8"))
+            self.roster = {k: v for k, v in (data.get("roster") or {}).items() if v.get("state") == STATE_PRESENT}
+            self.message_id = data.get("message_id")
+        except Exception as e:
+            self.log_fn(f"Aggregator: ignoring unreadable state file: {e}")
+
+    def _save_state(self) -> None:
+        if self.state_path is None:
+            return
+        tmp = self.state_path.with_suffix(self.state_path.suffix + ".tmp")
+        present = {k: v for k, v in self.roster.items() if v["state"] == STATE_PRESENT}
+        tmp.write_text(json.dumps({"roster": present, "message_id": self.message_id}), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    # ----- roster -----
+    def apply_report(self, nickname: str, state: str, client_id: str = "") -> None:
+        key = nickname.casefold()
+        now = self.clock()
+        self.reports += 1
+        entry = self.roster.get(key)
+        if entry is None and state == STATE_ABSENT:
+            return  # never seen around: nothing to announce
+        if entry is not None and entry["state"] == state:
+            entry["last_seen"] = now  # heartbeat / duplicate: no change to publish
+            entry["client_id"] = client_id or entry["client_id"]
+            return
+        self.roster[key] = {"nickname": nickname, "state": state, "since": now, "last_seen": now,
+                            "client_id": client_id}
+        self._changed(key, nickname, state)
+
+    def _changed(self, key: str, nickname: str, state: str) -> None:
+        # Arrive + leave inside one interval cancel out (nobody needs to see the flap)
+        if state == STATE_PRESENT:
+            if self.left.pop(key, None) is None:
+                self.arrived[key] = nickname
+        else:
+            if self.arrived.pop(key, None) is None:
+                self.left[key] = nickname
+        self.dirty = True
+
+    def expire(self) -> int:
+        now = self.clock()
+        expired = 0
+        for key, entry in self.roster.items():
+            if entry["state"] == STATE_PRESENT and now - entry["last_seen"] > self.ttl:
+                entry["state"] = STATE_ABSENT
+                entry["since"] = now
+                self._changed(key, entry["nickname"], STATE_ABSENT)
+                expired += 1
+        # Forget long-gone characters so the roster can't grow without bound
+        for key in [k for k, e in self.roster.items() if e["state"] == STATE_ABSENT and now - e["since"] > self.ttl]:
+            del self.roster[key]
+        return expired
+
+    def present(self) -> List[dict]:
+        return sorted((e for e in self.roster.values() if e["state"] == STATE_PRESENT),
+                      key=lambda e: e["since"])
+
+    # ----- messages -----
+    @staticmethod
+    def _fit(lines: List[str], more: Callable[[int], str], reserve: int = 0) -> str:
+        out, used = [], 0
+        for i, line in enumerate(lines):
+            if used + len(line) + 1 > DISCORD_MAX_CHARS - 40 - reserve:
+                out.append(more(len(lines) - i))
+                break
+            out.append(line)
+            used += len(line) + 1
+        return "\n".join(out)
+
+    def digest_text(self, arrived: Optional[Dict[str, str]] = None, left: Optional[Dict[str, str]] = None) -> str:
+        arrived = self.arrived if arrived is None else arrived
+        left = self.left if left is None else left
+        lines = []
+        if arrived:
+            lines.append(" :inbox_tray: " + ", ".join(f"**{n}**" for n in arrived.values())
+                         + (" is around." if len(arrived) == 1 else " are around."))
+        if left:
+            lines.append(" :bed: " + ", ".join(f"**{n}**" for n in left.values()) + " went to bed.")
+        # The head count always makes it into the message; a long list of names is cut instead
+        present = self.present()
+        count = f"Around now ({len(present)}): "
+        changes = self._fit(lines, lambda n: f"... and {n} more", reserve=len(count) + 200)
+        room = DISCORD_MAX_CHARS - 40 - len(changes) - 1 - len(count)
+        names = self._join_within([e["nickname"] for e in present], room) or "nobody"
+        return "\n".join(part for part in (changes, count + names) if part)
+
+    @staticmethod
+    def _join_within(names: List[str], room: int) -> str:
+        out, used = [], 0
+        for i, name in enumerate(names):
+            if used + len(name) + 2 > room - 20:
+                return ", ".join(out + [f"... and {len(names) - i} more"])
+            out.append(name)
+            used += len(name) + 2
+        return ", ".join(out)
+
+    def roster_text(self) -> str:
+        present = self.present()
+        lines = [f"**Around in Deadwood ({len(present)})**"]
+        lines += [f" :inbox_tray: **{e['nickname']}** since <t:{int(e['since'])}:t>" for e in present]
+        if not present:
+            lines.append("Nobody right now.")
+        lines.append(f"Updated <t:{int(self.clock())}:R>")
+        return self._fit(lines, lambda n: f"... and {n} more")
+
+    async def _discord(self, method: str, url: str, payload: dict) -> requests.Response:
+        """A 429 is waited out at most DISCORD_MAX_RETRIES times, and never past one publish interval."""
+        retries = 0
+        while True:
+            self.discord_requests += 1
+            resp = await asyncio.to_thread(requests.request, method, url, json=payload, timeout=15)
+            if resp.status_code != 429:
+                return resp
+            try:
+                delay = float((resp.json() or {}).get("retry_after"))
+            except Exception:
+                delay = float(resp.headers.get("retry-after") or 5)
+            if retries >= DISCORD_MAX_RETRIES or delay > self.publish_interval:
+                # The caller's raise_for_status() fails the publish, which keeps the changes for the next one
+                self.log_fn(f"Aggregator: rate limited by Discord (retry after {delay:.1f}s), "
+                            f"merging these changes into the next publish")
+                return resp
+            retries += 1
+            self.log_fn(f"Aggregator: rate limited by Discord, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def publish(self) -> None:
+        """Send pending changes to Discord (one request, or two if the edited message vanished)."""
+        if not self.dirty:
+            return
+        if not self.arrived and not self.left:
+            self.dirty = False  # only flaps that cancelled out
+            return
+        # Take what this publish covers; reports arriving during the request go to the next one
+        arrived, self.arrived = self.arrived, {}
+        left, self.left = self.left, {}
+        self.dirty = False
+        published = False
+        try:
+            if self.mode == "digest":
+                await self._send_digest(arrived, left)
+            else:
+                await self._send_roster()
+            published = True
+        except Exception as e:
+            self.log_fn(f"Aggregator: publish failed: {e!r}")
+        finally:
+            if not published:
+                # Put it back, then replay what came in meanwhile on top (flaps still cancel out)
+                newer_arrived, newer_left = self.arrived, self.left
+                self.arrived, self.left, self.dirty = arrived, left, True
+                for key, nickname in newer_arrived.items():
+                    self._changed(key, nickname, STATE_PRESENT)
+                for key, nickname in newer_left.items():
+                    self._changed(key, nickname, STATE_ABSENT)
+        self._save_state()
+
+    async def _send_digest(self, arrived: Dict[str, str], left: Dict[str, str]) -> None:
+        resp = await self._discord("POST", self.webhook_url, {"content": self.digest_text(arrived, left)})
+        resp.raise_for_status()
+
+    async def _send_roster(self) -> None:
+        payload = {"content": self.roster_text(), "allowed_mentions": {"parse": []}}
+        if self.message_id:
+            resp = await self._discord("PATCH", f"{self.webhook_url}/messages/{self.message_id}", payload)
+            if resp.status_code != 404:
+                resp.raise_for_status()
+                return
+            self.message_id = None  # someone deleted it; post a new one
+        resp = await self._discord("POST", f"{self.webhook_url}?wait=true", payload)
+        resp.raise_for_status()
+        self.message_id = str((resp.json() or {}).get("id") or "") or None
+
+    # ----- HTTP -----
+    def _route(self, req: _Request):
+        if req.method == "GET" and req.path == "/healthz":
+            return 200, {"ok": True}
+        if self.token and not secrets.compare_digest(req.headers.get("authorization", ""), f"Bearer {self.token}"):
+            return 401, None
+        if req.method == "GET" and req.path == "/roster":
+            return 200, {"present": [{"nickname": e["nickname"], "since": e["since"]} for e in self.present()],
+                         "clients": len({e["client_id"] for e in self.roster.values() if e["client_id"]})}
+        if req.method == "POST" and req.path == "/report":
+            try:
+                data = json.loads(req.body)
+                nickname = str(data["nickname"]).strip()
+                state = str(data["state"])
+            except Exception:
+                return 400, None
+            if not nickname or len(nickname) > MAX_NICKNAME_LEN or state not in (STATE_PRESENT, STATE_ABSENT):
+                return 400, None
+            self.apply_report(nickname, state, str(data.get("client_id") or "")[:64])
+            return 204, None
+        return 404, None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    req = await asyncio.wait_for(_read_request(reader), IDLE_TIMEOUT_SEC)
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write(_response(400, keep_alive=False))
+                    break
+                if req is None:
+                    break
+                status, body = self._route(req)
+                writer.write(_response(status, body, req.keep_alive))
+                await writer.drain()
+                if not req.keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    # ----- lifecycle -----
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port, backlog=1024, limit=MAX_HEADER_BYTES)
+        self._tasks = [asyncio.create_task(self._publisher()), asyncio.create_task(self._expirer())]
+        return self._server.sockets[0].getsockname()[1]
+
+    async def _publisher(self) -> None:
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            await self.publish()
+
+    async def _expirer(self) -> None:
+        while True:
+            await asyncio.sleep(EXPIRE_CHECK_SEC)
+            if self.expire():
+                self.log_fn("Aggregator: expired silent clients")
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.publish()  # don't lose the last changes
+
+
+# ===== client side (used by main.py) =====
+class AggregatorReporter:
+    """
+    PresenceMonitor listener + monitor runtime service. Keeps only the latest state per
+    character and sends it (retrying with backoff); while present it re-sends every
+    HEARTBEAT_SEC so the aggregator knows this client is still alive. Heartbeats end when
+    the session closes or monitoring stops.
+    """
+
+    def __init__(self, url: str, token: str = "", log_fn: Callable[[str], None] = lambda msg: None,
+                 heartbeat_sec: float = HEARTBEAT_SEC):
+        self.url = url.rstrip("/") + "/report"
+        self.token = token
+        self.log_fn = log_fn
+        self.heartbeat_sec = heartbeat_sec
+        self.client_id = uuid.uuid4().hex
+        self._latest: Dict[str, dict] = {}   # nickname key -> report not yet delivered
+        self._present: Dict[str, str] = {}   # key -> nickname, for heartbeats
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, event: dict) -> None:
+        kind = event.get("kind")
+        nickname = event.get("nickname") or ""
+        if not nickname:
+            return
+        if kind == "announce" or (kind == "resume" and event.get("announced")):
+            self._queue(nickname, STATE_PRESENT)
+        elif kind == "close" and event.get("announced"):
+            self._queue(nickname, STATE_ABSENT)
+        elif kind == "stop":
+            # Monitoring stopped with the game still running: we can't tell when they leave,
+            # so stop vouching for them and let the aggregator's TTL expire the entry
+            self._present.pop(nickname.casefold(), None)
+
+    def _queue(self, nickname: str, state: str) -> None:
+        key = nickname.casefold()
+        self._latest[key] = {"client_id": self.client_id, "nickname": nickname, "state": state}
+        if state == STATE_PRESENT:
+            self._present[key] = nickname
+        else:
+            self._present.pop(key, None)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._latest:
+            try:
+                await asyncio.wait_for(self._flush(), 3.0)  # e.g. "went to bed" right before exit
+            except Exception:
+                pass
+
+    async def _flush(self) -> None:
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        for key, report in list(self._latest.items()):
+            resp = await asyncio.to_thread(requests.post, self.url, json={**report, "ts": time.time()},
+                                           headers=headers, timeout=10)
+            resp.raise_for_status()
+            if self._latest.get(key) is report:
+                del self._latest[key]
+            self.log_fn(f"Aggregator: reported {report['nickname']} {report['state']}")
+
+    async def _run(self) -> None:
+        attempts = 0
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.heartbeat_sec)
+            except asyncio.TimeoutError:
+                for key, nickname in self._present.items():
+                    self._latest.setdefault(key, {"client_id": self.client_id, "nickname": nickname,
+                                                  "state": STATE_PRESENT})
+            self._wakeup.clear()
+            if not self._latest:
+                continue
+            try:
+                await self._flush()
+                attempts = 0
+            except Exception as e:
+                attempts += 1
+                delay = min(CLIENT_RETRY_MAX_SEC, CLIENT_RETRY_BASE_SEC * (2 ** (attempts - 1)))
+                self.log_fn(f"Aggregator: report failed ({e!r}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                self._wakeup.set()
+
+
+# ===== localhost load test =====
+async def _post_local(url: str, payload: dict, headers: Dict[str, str], timeout: float = 10.0) -> int:
+    """Load-test client: one POST on a fresh connection, returns the status. Thousands of these
+    run at once, which a thread per request (requests) can't do."""
+    hostport, _, path = url.split("://", 1)[1].partition("/")
+    host, _, port = hostport.partition(":")
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port or 80)), timeout)
+    try:
+        head = (f"POST /{path} HTTP/1.1\r\nHost: {hostport}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n"
+                + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+class _StubDiscord:
+    """Webhook stand-in: counts requests, answers like Discord (id for ?wait=true) after `delay`."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = []  # (method, path, content)
+
+    async def _handle(self, reader, writer):
+        try:
+            req = await _read_request(reader)
+            if req is not None:
+                self.requests.append((req.method, req.path, json.loads(req.body or b"{}").get("content", "")))
+                if self.delay:
+                    await asyncio.sleep(self.delay)  # reports keep arriving while a publish is in flight
+                body = {"id": "1000"} if req.method == "POST" else {"id": "1000", "edited": True}
+                # One request per connection, so nothing is left open when the test ends
+                writer.write(_response(200, body, keep_alive=False))
+                await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}/api/webhooks/1/loadtest"
+
+    async def close(self):
+        self._server.close()
+
+
+def _announced(requests_seen: List[tuple], mode: str):
+    """
+    What Discord readers see: (roster size in the last message, casefolded names replayed
+    from every message). names is None when a message was cut to fit Discord's limit.
+    """
+    count = 0
+    names = set()
+    for _method, _path, content in requests_seen:
+        if mode == "edit":
+            names = set()  # each edit replaces the whole roster
+        for line in content.split("\n"):
+            found = {n.casefold() for n in re.findall(r"\*\*([^*]+)\*\*", line)}
+            counted = re.match(r"(?:\*\*Around in Deadwood|Around now) \((\d+)\)", line)
+            if counted:
+                count = int(counted.group(1))
+            elif line.startswith(" :inbox_tray: ") and names is not None:
+                names |= found
+            elif line.startswith(" :bed: ") and names is not None:
+                names -= found
+            elif line.startswith("... and "):
+                names = None
+    return count, names
+
+
+async def _loadtest(clients: int, duration: float, mode: str, publish_interval: float, seed: int,
+                    discord_delay: float = 0.0) -> int:
+    discord = _StubDiscord(discord_delay)
+    webhook = await discord.start()
+    agg = Aggregator(webhook, token="loadtest", mode=mode, publish_interval=publish_interval, log_fn=lambda m: None)
+    port = await agg.start("127.0.0.1", 0)
+    url = f"http://127.0.0.1:{port}/report"
+    headers = {"Authorization": "Bearer loadtest"}
+
+    rng = random.Random(seed)
+    truth: Dict[str, str] = {}
+    latencies: List[float] = []
+    errors = 0
+    end = time.monotonic() + duration
+
+    async def client(i: int):
+        nonlocal errors
+        crng = random.Random(rng.random())
+        nickname = f"Player{i:05d}"
+        cid = uuid.UUID(int=crng.getrandbits(128)).hex
+        await asyncio.sleep(crng.uniform(0, min(duration / 2, 5.0)))  # staggered start
+        state = STATE_ABSENT
+        while time.monotonic() < end:
+            # Mostly heartbeats, sometimes a real change (and occasional duplicate retries)
+            if crng.random() < 0.25:
+                state = STATE_PRESENT if state == STATE_ABSENT else STATE_ABSENT
+            report = {"client_id": cid, "nickname": nickname if crng.random() < 0.9 else nickname.upper(),
+                      "state": state, "ts": time.time()}
+            t0 = time.perf_counter()
+            try:
+                status = await _post_local(url, report, headers)
+                if status >= 400:
+                    raise ConnectionError(f"HTTP {status}")
+                truth[nickname.casefold()] = state
+                latencies.append(time.perf_counter() - t0)
+            except Exception:
+                errors += 1
+            await asyncio.sleep(crng.uniform(1.0, 6.0))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - t0
+    await agg.close()
+    shown, announced = _announced(discord.requests, mode)
+    actual = {e["nickname"].casefold() for e in agg.present()}
+
+    # A report landing while a publish is in flight must go out with the next one
+    discord.delay = max(discord_delay, 0.2)
+    late = Aggregator(webhook, mode=mode, log_fn=lambda m: None)
+    late.apply_report("LateFirst", STATE_PRESENT, "late-1")
+    in_flight = asyncio.create_task(late.publish())
+    await asyncio.sleep(discord.delay / 2)
+    late.apply_report("LateSecond", STATE_PRESENT, "late-2")
+    await in_flight
+    await late.publish()
+    late_ok = "**LateSecond**" in discord.requests[-1][2]
+    await discord.close()
+
+    expected = {k for k, s in truth.items() if s == STATE_PRESENT}
+    lat_ms = sorted(x * 1000 for x in latencies) or [0.0]
+
+    def pct(p):
+        return lat_ms[min(len(lat_ms) - 1, int(len(lat_ms) * p))]
+
+    print(f"{clients} clients, {len(latencies)} reports in {elapsed:.1f}s ({len(latencies) / elapsed:.0f}/s), "
+          f"{errors} errors")
+    print(f"report latency ms: p50 {pct(0.50):.1f}  p95 {pct(0.95):.1f}  p99 {pct(0.99):.1f}  "
+          f"max {lat_ms[-1]:.1f}  (mean {statistics.mean(lat_ms):.1f})")
+    print(f"Discord requests: {len(discord.requests)} ({mode} mode, every {publish_interval:g}s, "
+          f"{discord_delay:g}s per request) instead of one per change")
+    print(f"roster: {len(actual)} present, {len(expected)} expected, {shown} shown on Discord")
+    print(f"report during an in-flight publish: {'published next' if late_ok else 'LOST'}")
+
+    if actual != expected:
+        print("LOADTEST FAILED: roster doesn't match what clients reported")
+        return 1
+    if shown != len(expected) or (announced is not None and announced != expected):
+        print("LOADTEST FAILED: Discord shows a different roster (changes lost while publishing)")
+        return 1
+    if not late_ok:
+        print("LOADTEST FAILED: a report that arrived during a publish was never published")
+        return 1
+    if errors:
+        print("LOADTEST FAILED: report errors")
+        return 1
+    print("LOADTEST OK")
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Deadwood presence aggregator")
+    parser.add_argument("--webhook", default=os.environ.get("DEADWOOD_WEBHOOK_URL", ""), help="Discord webhook URL")
+    parser.add_argument("--token", default=os.environ.get("DEADWOOD_AGGREGATOR_TOKEN", ""),
+                        help="shared secret clients send as 'Authorization: Bearer ...'")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on; anything but loopback needs --token")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--mode", choices=("digest", "edit"), default="digest",
+                        help="digest: periodic message with changes; edit: one roster message edited in place")
+    parser.add_argument("--interval", type=float, default=PUBLISH_INTERVAL_SEC, help="seconds between publishes")
+    parser.add_argument("--ttl", type=float, default=PRESENCE_TTL_SEC, help="expire clients silent this long")
+    parser.add_argument("--state", type=Path, default=DEFAULT_STATE_PATH,
+                        help="where the roster survives restarts (default: next to this script)")
+    parser.add_argument("--loadtest", action="store_true", help="simulate clients against a local instance")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--discord-delay", type=float, default=0.5,
+                        help="load test: seconds the stand-in Discord takes per request")
+    args = parser.parse_args(argv)
+    if not args.loadtest and not args.token and not _is_loopback(args.host):
+        parser.error(f"--host {args.host} accepts reports from other machines; set --token "
+                     f"(or DEADWOOD_AGGREGATOR_TOKEN) too")
+    return args
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False  # a host name: may resolve to anything
+
+
+async def _serve(args) -> None:
+    agg = Aggregator(args.webhook, token=args.token, mode=args.mode, publish_interval=args.interval,
+                     ttl=args.ttl, state_path=args.state)
+    port = await agg.start(args.host, args.port)
+    print(f"Aggregator listening on {args.host}:{port} ({args.mode} mode)")
+    if not args.token:
+        print("warning: no --token set, any local program can report presence")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await agg.close()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.loadtest:
+        return asyncio.run(_loadtest(args.clients, args.duration, args.mode, min(args.interval, 2.0), args.seed,
+                                     args.discord_delay))
+    if not args.webhook:
+        print("--webhook (or DEADWOOD_WEBHOOK_URL) is required", file=sys.stderr)
+        return 2
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,522 @@
+"""
+Benchmarks for the hot paths, with synthetic fixtures and stored baselines.
+
+Fixtures generate process tables (100 - 10,000 entries), window tables and a local
+stub webhook server with configurable latency and error rate, and patch them into
+main.py, so every case measures our code rather than whatever happens to be running
+on the machine.
+
+    python -m pytest --bench tests/test_bench.py   # each case as a test against the baseline
+    python bench.py                      # run, compare against bench_baseline.json
+    python bench.py --save               # run and store the results as the new baseline
+    python bench.py -k webhook -k tick   # only cases whose name contains one of these
+    python bench.py --tolerance 0.5      # allow 50% slowdown before flagging
+
+Off Windows, main.py is imported with stand-ins for psutil/pystray/Pillow/winreg and the
+WinAPI handles; the cases patch in the fixtures above either way, so every case runs on
+any OS. Exits 1 if a case regressed.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, List
+from unittest import mock
+
+from presence import MonitorBackend, PresenceMonitor
+from citizenfx_log import LogTailer, CitizenFxLogSignal
+from server_probe import ServerProbeSignal, synthetic_connections
+from history import SessionHistory
+from runtime import StatusFeed
+
+
+BASELINE_PATH = Path(__file__).with_name("bench_baseline.json")
+DEFAULT_TOLERANCE = 0.25     # flag cases more than 25% slower than baseline
+ROUND_TARGET_SEC = 0.05      # calibrate iterations so one round takes about this long
+ROUNDS = 5
+
+PROCESS_TABLE_SIZES = (100, 1000, 10000)
+WINDOW_TABLE_SIZES = (50, 500)
+REDM_PROCESS = "RedM_GTAProcess.exe"
+
+
+class Skip(Exception):
+    pass
+
+
+_main_module = None
+
+# main.py's imports that only exist on Windows (or in the packaged build's environment)
+WINDOWS_ONLY_MODULES = ("psutil", "PIL", "pystray", "winreg")
+
+
+def _stand_in_modules() -> dict:
+    """
+    Import-time stand-ins for the Windows-only modules main.py needs, for the ones missing
+    here. Every case replaces the calls it makes (process table, window table, version
+    info) with the fixtures above, so what gets timed is still main.py's own code.
+    """
+    modules = {}
+    for name in WINDOWS_ONLY_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            modules[name] = mock.MagicMock(name=name)
+    if "psutil" in modules:
+        # Caught by main.py, so they must be real exception classes
+        modules["psutil"].NoSuchProcess = type("NoSuchProcess", (Exception,), {})
+        modules["psutil"].AccessDenied = type("AccessDenied", (Exception,), {})
+    if "PIL" in modules:
+        for sub in ("Image", "ImageDraw", "ImageTk"):
+            modules[f"PIL.{sub}"] = getattr(modules["PIL"], sub)
+    return modules
+
+
+def need_main():
+    """
+    Import main.py once, with stand-ins for its Windows-only modules and WinAPI handles
+    where they are missing; skip the case if it still can't load.
+    """
+    global _main_module
+    if _main_module is None:
+        import ctypes
+
+        stand_ins = _stand_in_modules()
+        winapi = {}
+        if not hasattr(ctypes, "windll"):
+            winapi = {"windll": mock.MagicMock(name="windll"), "WINFUNCTYPE": ctypes.CFUNCTYPE}
+        try:
+            with mock.patch.dict(sys.modules, stand_ins), \
+                    mock.patch.multiple(ctypes, create=True, **winapi):
+                import main as m
+        except Exception as e:
+            raise Skip(f"main.py not importable here ({type(e).__name__}: {e})")
+        _main_module = m
+    return _main_module
+
+
+# ===== registry =====
+CASES = []
+
+
+def bench(name: str, params=(None,)):
+    """Register a fixture: a context manager factory taking one param and yielding the callable to time."""
+    def deco(fn):
+        cm = contextlib.contextmanager(fn)
+        for p in params:
+            CASES.append((name if p is None else f"{name}[{p}]", cm, p))
+        return fn
+    return deco
+
+
+# ===== fixtures =====
+class FakeProc:
+    __slots__ = ("pid", "info", "_exe", "_cmdline")
+
+    def __init__(self, pid: int, name: str, exe: str, cmdline: List[str]):
+        self.pid = pid
+        self.info = {"pid": pid, "name": name}
+        self._exe = exe
+        self._cmdline = cmdline
+
+    def name(self):
+        return self.info["name"]
+
+    def exe(self):
+        return self._exe
+
+    def cmdline(self):
+        return self._cmdline
+
+    def terminate(self):
+        pass
+
+    def kill(self):
+        pass
+
+
+def fake_process_table(size: int, redm: bool = True, seed: int = 1) -> List[FakeProc]:
+    rng = random.Random(seed)
+    names = ["svchost.exe", "chrome.exe", "explorer.exe", "Discord.exe", "steam.exe", "conhost.exe", "RuntimeBroker.exe"]
+    table = []
+    for i in range(size):
+        name = rng.choice(names)
+        table.append(FakeProc(1000 + i * 4, name, f"C:\\Windows\\System32\\{name}", [name]))
+    if redm:
+        # Worst case for a linear scan: RedM is last
+        pid = 1000 + size * 4
+        table.append(FakeProc(pid, REDM_PROCESS, f"C:\\RedM\\{REDM_PROCESS}", [REDM_PROCESS]))
+    return table
+
+
+@contextlib.contextmanager
+def patched_psutil(m, table: List[FakeProc]):
+    by_pid = {p.pid: p for p in table}
+
+    def process(pid=None):
+        try:
+            return by_pid[pid]
+        except KeyError:
+            raise m.psutil.NoSuchProcess(pid)
+
+    with mock.patch.object(m.psutil, "process_iter", lambda attrs=None: iter(table)), \
+            mock.patch.object(m.psutil, "pid_exists", lambda pid: pid in by_pid), \
+            mock.patch.object(m.psutil, "Process", process), \
+            mock.patch.object(m.psutil, "wait_procs", lambda procs, timeout=None: (list(procs), [])):
+        yield
+
+
+class TableBackend(MonitorBackend):
+    """Pure-python stand-in for WindowsMonitorBackend over a synthetic process table."""
+
+    def __init__(self, table: List[FakeProc], in_deadwood: bool = True):
+        self.table = table
+        self.by_pid = {p.pid: p for p in table}
+        self.in_deadwood = in_deadwood
+
+    def is_redm_pid(self, pid):
+        p = self.by_pid.get(pid)
+        return p is not None and p.info["name"].lower() == REDM_PROCESS.lower()
+
+    def find_redm_pid(self):
+        for p in self.table:
+            if (p.info.get("name") or "").lower() == REDM_PROCESS.lower():
+                return p.pid
+        return None
+
+    def title_contains(self, pid, substring):
+        return self.in_deadwood
+
+    def ask_announce(self, nickname):
+        return True
+
+    def ask_late_confirmation(self, nickname):
+        return True
+
+    def send_message(self, content):
+        pass
+
+
+class StubWebhookServer:
+    """Local HTTP endpoint standing in for Discord, with configurable latency and error rate."""
+
+    def __init__(self, latency_sec: float = 0.0, error_rate: float = 0.0, seed: int = 1):
+        self.latency_sec = latency_sec
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                stub.requests += 1
+                if stub.latency_sec:
+                    time.sleep(stub.latency_sec)
+                status = 500 if stub.rng.random() < stub.error_rate else 204
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/api/webhooks/bench"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@contextlib.contextmanager
+def temp_appdata(m):
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        with mock.patch.object(m, "APPDATA_DIR", d), \
+                mock.patch.object(m, "LOG_PATH", d / "log.txt"), \
+                mock.patch.object(m, "CONFIG_PATH", d / "config.json"):
+            yield d
+
+
+# ===== cases: main.py =====
+@bench("is_process_running", params=PROCESS_TABLE_SIZES)
+def _is_process_running(size):
+    m = need_main()
+    with patched_psutil(m, fake_process_table(size)):
+        yield lambda: m.is_process_running(REDM_PROCESS)
+
+
+@bench("find_redm_pid", params=PROCESS_TABLE_SIZES)
+def _find_redm_pid(size):
+    m = need_main()
+    backend = m.WindowsMonitorBackend(mock.NonCallableMock(spec=m.MonitorRuntime))  # find_redm_pid never uses it
+    with patched_psutil(m, fake_process_table(size)):
+        yield backend.find_redm_pid
+
+
+@bench("any_window_title_contains_for_pid", params=WINDOW_TABLE_SIZES)
+def _window_title_scan(size):
+    m = need_main()
+    redm_pid = 4242
+    # hwnd -> (pid, visible, title); RedM's window is last so the scan visits every window.
+    # Handles start at 1: ctypes hands HWND 0 (NULL) to the callback as None.
+    windows = {1 + i: (1000 + i, i % 3 != 0, f"Window {i}") for i in range(size)}
+    windows[1 + size] = (redm_pid, True, "RedM - Deadwood County")
+
+    def enum_windows(proc, lparam):
+        for hwnd in windows:
+            if not proc(hwnd, lparam):
+                break
+        return True
+
+    def get_pid(hwnd, ref):
+        ref._obj.value = windows[hwnd][0]
+        return 1
+
+    def get_text(hwnd, buf, n):
+        buf.value = windows[hwnd][2][: n - 1]
+        return len(buf.value)
+
+    with mock.patch.object(m, "EnumWindows", enum_windows), \
+            mock.patch.object(m, "IsWindowVisible", lambda hwnd: windows[hwnd][1]), \
+            mock.patch.object(m, "GetWindowThreadProcessId", get_pid), \
+            mock.patch.object(m, "GetWindowTextLengthW", lambda hwnd: len(windows[hwnd][2])), \
+            mock.patch.object(m, "GetWindowTextW", get_text):
+        yield lambda: m.any_window_title_contains_for_pid(redm_pid, "Deadwood County")
+
+
+@bench("enforce_single_latest_instance", params=PROCESS_TABLE_SIZES)
+def _enforce_single_latest_instance(size):
+    m = need_main()
+    table = fake_process_table(size, redm=False)
+    my_exe = "C:\\Games\\DeadwoodPresenceChecker.exe"
+    with patched_psutil(m, table), \
+            mock.patch.object(sys, "frozen", True, create=True), \
+            mock.patch.object(m, "_current_exe_path", lambda: my_exe), \
+            mock.patch.object(m, "_get_exe_mtime", lambda path: 1.0), \
+            mock.patch.object(m, "_get_file_version_string", lambda path, key: ""):
+        yield m.enforce_single_latest_instance
+
+
+@bench("load_config")
+def _load_config(_):
+    m = need_main()
+    with temp_appdata(m):
+        m.save_config(m.load_config())
+        yield m.load_config
+
+
+@bench("save_config")
+def _save_config(_):
+    m = need_main()
+    with temp_appdata(m):
+        cfg = m.load_config()
+        yield lambda: m.save_config(cfg)
+
+
+@bench("log")
+def _log(_):
+    m = need_main()
+    with temp_appdata(m):
+        yield lambda: m.log("Webhook: sending:  :inbox_tray: **Ezekiel** is around.")
+
+
+@bench("send_webhook_message", params=("ok", "latency=20ms", "errors=50%"))
+def _send_webhook_message(mode):
+    m = need_main()
+    latency = 0.02 if mode == "latency=20ms" else 0.0
+    error_rate = 0.5 if mode == "errors=50%" else 0.0
+    loop = asyncio.new_event_loop()  # one loop for all iterations: time the send, not loop setup
+    try:
+        with temp_appdata(m), StubWebhookServer(latency, error_rate) as stub, \
+                mock.patch.object(m, "WEBHOOK_URL", stub.url):
+            def send():
+                try:
+                    loop.run_until_complete(m.send_webhook_message(" :inbox_tray: **Ezekiel** is around."))
+                except Exception:
+                    pass
+            yield send
+    finally:
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+
+# ===== cases: platform independent =====
+@bench("presence_tick_idle", params=PROCESS_TABLE_SIZES)
+def _presence_tick_idle(size):
+    # RedM not running: every tick is a full process table scan
+    monitor = PresenceMonitor(TableBackend(fake_process_table(size, redm=False)))
+    yield lambda: monitor.tick("Ezekiel", False)
+
+
+@bench("presence_tick_running")
+def _presence_tick_running(_):
+    # RedM running past grace, pid cached, in Deadwood, already announced
+    t = [0.0]
+    monitor = PresenceMonitor(TableBackend(fake_process_table(1000)), clock=lambda: t[0])
+    monitor.tick("Ezekiel", True)
+
+    def tick():
+        t[0] += 3.0
+        monitor.tick("Ezekiel", True)
+    for _ in range(50):
+        tick()
+    yield tick
+
+
+@bench("status_feed_publish")
+def _status_feed_publish(_):
+    # Per-tick cost of feeding the live panel: snapshot + coalescing put
+    monitor = PresenceMonitor(TableBackend(fake_process_table(1000)), clock=lambda: 100.0)
+    monitor.tick("Ezekiel", True)
+    feed = StatusFeed()
+
+    def publish():
+        snapshot = monitor.snapshot()
+        snapshot["webhook_queue"] = 0
+        feed.put("monitor", snapshot)
+    yield publish
+
+
+@bench("citizenfx_tail_1gb")
+def _citizenfx_tail(_):
+    # A sparse 1 GB log: the per-tick cost must not depend on the file size
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "CitizenFX_log_bench.log"
+        with open(path, "wb") as f:
+            f.truncate(1024 ** 3)
+        tailer = LogTailer(str(path), state_path=Path(d) / "tail.json")
+        signal = CitizenFxLogSignal(tailer, ["Deadwood County"])
+        line = b"[  52828] [b1491_GTAProce]             MainThrd/ streaming: some noise line\n" * 20
+
+        def tick():
+            with open(path, "ab") as f:
+                f.write(line)
+            signal.poll(1234, 0.0)
+        yield tick
+
+
+@bench("server_probe_refresh", params=(1000, 10000))
+def _server_probe(size):
+    table = synthetic_connections(size, seed=2)
+    probe = ServerProbeSignal(["203.0.113.7:30120"], refresh_sec=0, connections_fn=lambda pid: table,
+                              resolve_fn=lambda host: [host])
+    now = [0.0]
+
+    def tick():
+        now[0] += 3.0
+        probe.poll(1234, now[0])
+    yield tick
+
+
+@bench("history_record")
+def _history_record(_):
+    with tempfile.TemporaryDirectory() as d:
+        history = SessionHistory(Path(d) / "history.sqlite3").start()
+        event = {"kind": "deadwood_enter", "ts": time.time(), "nickname": "Ezekiel"}
+        try:
+            yield lambda: history.record(event)
+        finally:
+            history.close()
+
+
+# ===== runner =====
+def measure(fn: Callable[[], None]) -> dict:
+    fn()  # warm-up
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= ROUND_TARGET_SEC or number >= 1_000_000:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(ROUND_TARGET_SEC / elapsed) + 1))
+
+    per_op = [elapsed / number]
+    for _ in range(ROUNDS - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_op.append((time.perf_counter() - t0) / number)
+    return {"median_us": statistics.median(per_op) * 1e6, "min_us": min(per_op) * 1e6, "number": number}
+
+
+def load_baseline(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("cases", {})
+    except Exception:
+        return {}
+
+
+def run(args) -> int:
+    baseline = {} if args.save else load_baseline(args.baseline)
+    results = {}
+    regressions = []
+
+    print(f"{'case':<44} {'median':>12} {'baseline':>12} {'change':>8}")
+    for name, factory, param in CASES:
+        if args.k and not any(k in name for k in args.k):
+            continue
+        try:
+            with factory(param) as fn:
+                res = measure(fn)
+        except Skip as e:
+            print(f"{name:<44} {'skipped':>12}  {e}")
+            continue
+
+        results[name] = res
+        base = baseline.get(name, {}).get("median_us")
+        if base:
+            change = res["median_us"] / base - 1.0
+            flag = "  REGRESSION" if change > args.tolerance else ""
+            if flag:
+                regressions.append(name)
+            print(f"{name:<44} {res['median_us']:10.2f}us {base:10.2f}us {change:+7.0%}{flag}")
+        else:
+            print(f"{name:<44} {res['median_us']:10.2f}us {'-':>12}")
+
+    if args.save:
+        merged = load_baseline(args.baseline)
+        merged.update(results)
+        args.baseline.write_text(json.dumps({
+            "machine": {"python": sys.version.split()[0], "platform": platform.platform(),
+                        "processor": platform.processor(), "saved": time.strftime("%Y-%m-%d %H:%M:%S")},
+            "cases": merged,
+        }, indent=2), encoding="utf-8")
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Deadwood Presence Checker benchmarks")
+    parser.add_argument("--save", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("-k", action="append", default=[], help="only run cases containing this text")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
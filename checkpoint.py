@@ -0,0 +1,150 @@
+"""
+Crash-safe, append-only session checkpoint.
+
+After every tick the monitor's session state is offered to SessionCheckpoint.save().
+A compact JSON line is appended only when a durable field changed (RedM pid, announce /
+decision latches, ...), and it is flushed to the OS right away so a crash or kill of
+the process loses nothing. fsync (the expensive part) is batched: at most once per
+FSYNC_INTERVAL_SEC, or immediately after a session event such as an announcement.
+The file is compacted to its last record once it grows past COMPACT_BYTES.
+
+On startup, load() returns the last intact record and PresenceMonitor.resume()
+reconciles it against the live RedM process.
+
+save() runs on the monitor runtime's observer thread and close() on its event loop, so
+writing is serialised by a lock.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from presence import SessionState
+
+
+FSYNC_INTERVAL_SEC = 5.0
+COMPACT_BYTES = 256 * 1024
+
+# Fields that define the session; per-tick counters are left out so they don't cause writes
+DURABLE_FIELDS = (
+    "was_running",
+    "presence_announced",
+    "presence_decided",
+    "was_in_deadwood",
+    "first_seen_running_ts",
+    "late_popup_shown",
+    "redm_pid",
+    "redm_create_time",
+    "closing",
+)
+
+
+class SessionCheckpoint:
+    def __init__(self, path: Path, fsync_interval: float = FSYNC_INTERVAL_SEC,
+                 compact_bytes: int = COMPACT_BYTES, clock=time.time):
+        self.path = Path(path)
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self.clock = clock
+
+        self._f = None
+        self._lock = threading.Lock()
+        self._last_key = None
+        self._last_fsync = 0.0
+        self._unsynced = False
+        self._urgent = False
+        self.writes = 0
+        self.fsyncs = 0
+
+    # ----- reading -----
+    def load(self) -> Optional[Tuple[SessionState, str, float]]:
+        """(state, nickname, saved_at) from the last intact record, or None."""
+        try:
+            data = self.path.read_bytes()
+        except OSError:
+            return None
+
+        # A crash mid-write can leave a torn last line; walk back to the newest valid one
+        for raw in reversed(data.splitlines()):
+            try:
+                rec = json.loads(raw)
+                return SessionState.from_dict(rec["s"]), rec.get("n") or "", float(rec["t"])
+            except Exception:
+                continue
+        return None
+
+    # ----- writing -----
+    def record_event(self, event: dict) -> None:
+        """Session events are fsynced on the next save(); the runtime calls this on the observer thread."""
+        self._urgent = True
+
+    def _open(self):
+        if self._f is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = open(self.path, "ab")
+        return self._f
+
+    def save(self, state: SessionState, nickname: str) -> None:
+        with self._lock:
+            self._save(state, nickname)
+
+    def _save(self, state: SessionState, nickname: str) -> None:
+        key = tuple(getattr(state, name) for name in DURABLE_FIELDS) + (nickname,)
+        now = self.clock()
+        try:
+            if key != self._last_key:
+                self._last_key = key
+                record = {"t": round(now, 3), "n": nickname, "s": {n: getattr(state, n) for n in DURABLE_FIELDS}}
+                f = self._open()
+                f.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+                f.flush()  # in the OS page cache: survives a crash or kill of this process
+                self.writes += 1
+                self._unsynced = True
+
+            if self._unsynced and (self._urgent or (now - self._last_fsync) >= self.fsync_interval):
+                self._sync(now)
+
+            if self._f is not None and self._f.tell() > self.compact_bytes:
+                self._compact(state, nickname, now)
+        except OSError:
+            # Never let checkpointing break monitoring; try again on the next change
+            self._close_file()
+            self._last_key = None
+
+    def _sync(self, now: float) -> None:
+        os.fsync(self._f.fileno())
+        self._last_fsync = now
+        self._unsynced = False
+        self._urgent = False
+        self.fsyncs += 1
+
+    def _compact(self, state: SessionState, nickname: str, now: float) -> None:
+        record = {"t": round(now, 3), "n": nickname, "s": {n: getattr(state, n) for n in DURABLE_FIELDS}}
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._close_file()
+        os.replace(tmp, self.path)
+        self._last_fsync = now
+        self._unsynced = False
+
+    def _close_file(self) -> None:
+        if self._f is not None:
+            try:
+                self._f.close()
+            except OSError:
+                pass
+            self._f = None
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                if self._f is not None and self._unsynced:
+                    self._sync(self.clock())
+            except OSError:
+                pass
+            self._close_file()
@@ -0,0 +1,293 @@
+"""
+Incremental CitizenFX client log tailer.
+
+RedM's window title is sometimes wrong (that's why the late-confirmation popup exists),
+but the client log records every server connect. This module follows the newest
+CitizenFX log file, reads only the bytes appended since the last poll (bounded per
+poll, so the cost per tick stays constant no matter how big the file is), persists
+the byte offset across restarts and survives rotation and truncation.
+
+Parsed lines become PresenceEvents; CitizenFxLogSignal turns them into a confidence
+value for PresenceMonitor.
+"""
+import glob
+import json
+import os
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from presence import PresenceSignal
+
+
+MAX_BYTES_PER_POLL = 256 * 1024   # upper bound on work per tick
+BACKFILL_BYTES = 64 * 1024        # on attaching to a file, look back at most this far for a connect
+RESCAN_INTERVAL_SEC = 10.0        # how often to look for a newer log file
+PERSIST_INTERVAL_SEC = 30.0       # how often the byte offset is written to disk
+FINGERPRINT_BYTES = 256           # head of file used to detect in-place rotation
+
+# Lines look like:
+# [    52828] [b1491_GTAProce]             MainThrd/ Connecting to: 12.34.56.78:30120
+CONNECT_RE = re.compile(r"Connecting to(?: server)?:?\s+(?P<target>[^\s\"']+)", re.IGNORECASE)
+CONNECTED_RE = re.compile(r"Received connectOK", re.IGNORECASE)
+HOSTNAME_RE = re.compile(r"(?:server name|sv_hostname|hostname)\s*[:=]?\s*\"?(?P<name>[^\"\r\n]+)", re.IGNORECASE)
+SESSION_RE = re.compile(
+    r"\b(?:join(?:ed|ing)|host(?:ed|ing)) (?:a |the )?(?:network |game )?session\b", re.IGNORECASE
+)
+DISCONNECT_RE = re.compile(
+    r"\b(?:disconnected|disconnecting|connection (?:lost|closed|timed out)|dropped from server)\b", re.IGNORECASE
+)
+
+
+@dataclass
+class PresenceEvent:
+    kind: str     # "connecting" | "connected" | "hostname" | "session" | "disconnected"
+    detail: str
+    ts: float
+
+
+def parse_line(line: str, now: float) -> Optional[PresenceEvent]:
+    # Cheapest checks first: most log lines are none of these
+    m = CONNECT_RE.search(line)
+    if m:
+        return PresenceEvent("connecting", m.group("target"), now)
+    if CONNECTED_RE.search(line):
+        return PresenceEvent("connected", "", now)
+    if DISCONNECT_RE.search(line):
+        return PresenceEvent("disconnected", "", now)
+    m = HOSTNAME_RE.search(line)
+    if m:
+        return PresenceEvent("hostname", m.group("name").strip(), now)
+    if SESSION_RE.search(line):
+        return PresenceEvent("session", "", now)
+    return None
+
+
+class LogTailer:
+    """
+    Follows the newest file matching `pattern` (a path or a glob).
+    poll() returns the complete lines appended since the previous poll.
+    """
+
+    def __init__(
+        self,
+        pattern: str,
+        state_path: Optional[Path] = None,
+        max_bytes_per_poll: int = MAX_BYTES_PER_POLL,
+        clock=time.monotonic,
+    ):
+        self.pattern = pattern
+        self.state_path = state_path
+        self.max_bytes_per_poll = max_bytes_per_poll
+        self.clock = clock
+
+        self.path: Optional[str] = None
+        self.fingerprint: Optional[int] = None
+        self.offset = 0
+        self._pending_attach = False  # set on file switch
+
+        self._last_rescan = float("-inf")
+        self._last_persist = float("-inf")
+        self._dirty = False
+
+        self._load_state()
+
+    # ----- persisted offset -----
+    def _load_state(self) -> None:
+        if self.state_path is None:
+            return
+        try:
+            data = json.loads(Path(self.state_path).read_text(encoding="utf-8"))
+            self.path = data.get("path") or None
+            self.fingerprint = data.get("fingerprint")
+            self.offset = int(data.get("offset", 0))
+        except Exception:
+            self.path, self.fingerprint, self.offset = None, None, 0
+
+    def save_state(self, force: bool = False) -> None:
+        if self.state_path is None or not self._dirty:
+            return
+        now = self.clock()
+        if not force and (now - self._last_persist) < PERSIST_INTERVAL_SEC:
+            return
+        self._last_persist = now
+        try:
+            state_path = Path(self.state_path)
+            state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = state_path.with_suffix(state_path.suffix + ".tmp")
+            tmp.write_text(
+                json.dumps({"path": self.path, "fingerprint": self.fingerprint, "offset": self.offset}),
+                encoding="utf-8",
+            )
+            os.replace(tmp, state_path)
+            self._dirty = False
+        except Exception:
+            pass
+
+    # ----- file selection -----
+    def _newest_file(self) -> Optional[str]:
+        if not glob.has_magic(self.pattern):
+            return self.pattern if os.path.exists(self.pattern) else None
+        newest, newest_mtime = None, -1.0
+        for path in glob.iglob(self.pattern):
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if mtime > newest_mtime:
+                newest, newest_mtime = path, mtime
+        return newest
+
+    @staticmethod
+    def _fingerprint(f) -> Optional[int]:
+        f.seek(0)
+        head = f.read(FINGERPRINT_BYTES)
+        if len(head) < FINGERPRINT_BYTES:
+            return None  # too short to tell apart yet
+        return zlib.crc32(head)
+
+    def _attach(self, path: str, f, size: int) -> None:
+        """Switch to `path`, reading at most its last BACKFILL_BYTES: a rotation we witnessed is
+        still small (read whole), a file that grew while we weren't looking (first run, saved
+        state pointing at an older file) isn't replayed from the start at MAX_BYTES_PER_POLL a tick."""
+        self.offset = max(0, size - BACKFILL_BYTES)
+        if self.offset:
+            f.seek(self.offset - 1)
+            f.readline()  # start at a line boundary
+            self.offset = f.tell()
+        self.path = path
+        self.fingerprint = self._fingerprint(f)
+        self._dirty = True
+
+    # ----- reading -----
+    def poll(self) -> List[str]:
+        now = self.clock()
+        if self.path is None or (now - self._last_rescan) >= RESCAN_INTERVAL_SEC:
+            self._last_rescan = now
+            newest = self._newest_file()
+            if newest is not None and newest != self.path:
+                self._pending_attach = True
+                self.path = newest
+
+        if self.path is None:
+            return []
+
+        try:
+            with open(self.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+
+                if self._pending_attach:
+                    self._attach(self.path, f, size)
+                    self._pending_attach = False
+                elif size < self.offset:
+                    # Truncated in place
+                    self._attach(self.path, f, size)
+                else:
+                    fp = self._fingerprint(f)
+                    if self.fingerprint is None:
+                        self.fingerprint = fp
+                    elif fp is not None and fp != self.fingerprint:
+                        # Same name, different file (rotated in place)
+                        self._attach(self.path, f, size)
+
+                if size <= self.offset:
+                    return []
+
+                f.seek(self.offset)
+                chunk = f.read(min(self.max_bytes_per_poll, size - self.offset))
+        except OSError:
+            return []
+
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            if len(chunk) >= self.max_bytes_per_poll:
+                # A single line longer than the poll budget: skip it rather than stall
+                self.offset += len(chunk)
+                self._dirty = True
+            return []
+
+        consumed = chunk[: end + 1]
+        self.offset += len(consumed)
+        self._dirty = True
+        self.save_state()
+        return consumed.decode("utf-8", errors="replace").splitlines()
+
+
+class CitizenFxLogSignal(PresenceSignal):
+    """
+    Presence evidence from the CitizenFX log: connected to (or in a session on) a server
+    matching one of `servers` (hostnames, ip:port or server name substrings).
+
+    A server name only counts when it is the first one logged for the current connect,
+    before connectOK (the joined server's own info). Names showing up anywhere else,
+    e.g. a server list mentioning a matching name while joining some other server, are
+    ignored; the next connect starts over.
+    """
+
+    name = "citizenfx_log"
+
+    def __init__(self, tailer: LogTailer, servers: List[str]):
+        self.tailer = tailer
+        self.servers = [s.lower() for s in servers if s]
+        self.pid: Optional[int] = None
+        self.target_matches = False
+        self.connecting = False          # a connect is in progress (hostname may still arrive)
+        self.hostname: Optional[str] = None
+        self.connected = False
+        self.in_session = False
+        self.last_event: Optional[PresenceEvent] = None
+
+    def _matches(self, text: str) -> bool:
+        low = text.lower()
+        return any(s in low for s in self.servers)
+
+    def _reset(self) -> None:
+        self.target_matches = False
+        self.connecting = False
+        self.hostname = None
+        self.connected = False
+        self.in_session = False
+
+    def feed(self, event: PresenceEvent) -> None:
+        self.last_event = event
+        if event.kind == "connecting":
+            self._reset()
+            self.connecting = True
+            self.target_matches = self._matches(event.detail)
+        elif event.kind == "hostname":
+            if self.connecting and self.hostname is None:
+                self.hostname = event.detail
+                if self._matches(event.detail):
+                    self.target_matches = True
+        elif event.kind == "connected":
+            self.connecting = False
+            self.connected = True
+        elif event.kind == "session":
+            self.in_session = True
+        elif event.kind == "disconnected":
+            self._reset()
+
+    def poll(self, pid: int, now: float) -> float:
+        if pid != self.pid:
+            # New RedM process: whatever we knew belongs to the previous session
+            self.pid = pid
+            self._reset()
+
+        for line in self.tailer.poll():
+            event = parse_line(line, now)
+            if event is not None:
+                self.feed(event)
+
+        if not self.target_matches:
+            return 0.0
+        if self.in_session:
+            return 1.0
+        if self.connected:
+            return 0.9
+        return 0.3
+
+    def close(self) -> None:
+        self.tailer.save_state(force=True)
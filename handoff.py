@@ -0,0 +1,304 @@
+"""
+Zero-downtime upgrade hand-off.
+
+The running instance listens on a localhost socket and publishes its port plus a
+random token in HANDOFF file (inside the user's APPDATA folder, so only this user
+can read it). A newer build that is about to replace it connects, proves it read
+the file, and receives the old instance's live state (monitor session, webhook
+outbox, tray state) as JSON. Once the new instance acknowledges, the old one
+exits; if the ack never comes, the old one simply resumes monitoring.
+
+The server is an asyncio service (async start() / close()) on the monitor runtime's
+event loop, so it costs no thread of its own; request_handoff() is plain blocking
+sockets, since the new instance asks before anything else is running.
+
+Protocol (one JSON object per line):
+    new -> old  {"op": "handoff", "token": ..., "pid": ...}
+    old -> new  {"ok": true, "payload": {...}}        or {"ok": false, "error": ...}
+    new -> old  {"op": "ack"}
+
+    python handoff.py --selftest      # end-to-end check with two real processes
+"""
+import asyncio
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+
+PROTOCOL_VERSION = 1
+CONNECT_TIMEOUT_SEC = 2.0
+HANDOFF_TIMEOUT_SEC = 10.0   # old instance may need a moment to stop its worker
+ACK_TIMEOUT_SEC = 5.0
+MAX_MESSAGE_BYTES = 4 * 1024 * 1024
+
+
+def _send_json(sock: socket.socket, obj: dict) -> None:
+    sock.sendall(json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n")
+
+
+def _recv_json(sock: socket.socket, buf: bytearray) -> dict:
+    while b"\n" not in buf:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("peer closed the connection")
+        buf.extend(chunk)
+        if len(buf) > MAX_MESSAGE_BYTES:
+            raise ValueError("hand-off message too large")
+    line, _, rest = bytes(buf).partition(b"\n")
+    buf[:] = rest
+    return json.loads(line)
+
+
+async def _read_json(reader: asyncio.StreamReader, timeout: float) -> dict:
+    line = await asyncio.wait_for(reader.readline(), timeout)
+    if not line.endswith(b"\n"):
+        raise ConnectionError("peer closed the connection")
+    return json.loads(line)
+
+
+async def _write_json(writer: asyncio.StreamWriter, obj: dict) -> None:
+    writer.write(json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+class HandoffServer:
+    """
+    Runs in the instance that may be replaced, as a service on its event loop.
+    - await freeze() must stop monitoring and return the JSON-serialisable state.
+    - on_handed_off() is called after the new instance acknowledged (exit now).
+    - on_aborted() is called if the hand-off fell through after freeze() (resume monitoring).
+    Both callbacks run on the loop thread.
+    """
+
+    def __init__(self, info_path: Path, freeze: Callable[[], Awaitable[dict]], on_handed_off: Callable[[], None],
+                 on_aborted: Callable[[], None], log_fn: Callable[[str], None] = lambda msg: None):
+        self.info_path = Path(info_path)
+        self.freeze = freeze
+        self.on_handed_off = on_handed_off
+        self.on_aborted = on_aborted
+        self.log_fn = log_fn
+        self.token = secrets.token_hex(16)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._busy: Optional[asyncio.Lock] = None
+        self._done = False
+
+    async def start(self) -> None:
+        self._busy = asyncio.Lock()  # one hand-off at a time
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0, limit=MAX_MESSAGE_BYTES)
+        port = self._server.sockets[0].getsockname()[1]
+
+        self.info_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.info_path.with_suffix(self.info_path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"pid": os.getpid(), "port": port, "token": self.token,
+                                   "v": PROTOCOL_VERSION}), encoding="utf-8")
+        os.replace(tmp, self.info_path)
+
+    async def close(self) -> None:
+        self._done = True
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        # Only remove the file if it still describes us (a newer instance may have replaced it)
+        try:
+            info = json.loads(self.info_path.read_text(encoding="utf-8"))
+            if info.get("pid") == os.getpid():
+                self.info_path.unlink()
+        except Exception:
+            pass
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            async with self._busy:
+                if not self._done and await self._handoff(reader, writer):
+                    await self.close()
+                    self.on_handed_off()
+        finally:
+            writer.close()
+
+    async def _handoff(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        frozen = False
+        try:
+            req = await _read_json(reader, CONNECT_TIMEOUT_SEC)
+            if req.get("op") != "handoff" or not secrets.compare_digest(str(req.get("token", "")), self.token):
+                await _write_json(writer, {"ok": False, "error": "bad request"})
+                return False
+
+            self.log_fn(f"Handoff: requested by pid {req.get('pid')}")
+            frozen = True
+            payload = await self.freeze()
+            await _write_json(writer, {"ok": True, "v": PROTOCOL_VERSION, "payload": payload})
+
+            if (await _read_json(reader, ACK_TIMEOUT_SEC)).get("op") == "ack":
+                self.log_fn("Handoff: acknowledged, handing over")
+                return True
+            raise ValueError("unexpected reply instead of ack")
+        except Exception as e:
+            self.log_fn(f"Handoff: aborted: {e!r}")
+            if frozen:
+                self.on_aborted()
+            return False
+
+
+def request_handoff(info_path: Path, timeout: float = HANDOFF_TIMEOUT_SEC) -> Optional[dict]:
+    """Ask the running instance for its state. Returns the payload, or None if there was nobody to ask."""
+    try:
+        info = json.loads(Path(info_path).read_text(encoding="utf-8"))
+        port = int(info["port"])
+        token = str(info["token"])
+    except Exception:
+        return None
+
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=CONNECT_TIMEOUT_SEC) as sock:
+            sock.settimeout(timeout)
+            buf = bytearray()
+            _send_json(sock, {"op": "handoff", "token": token, "pid": os.getpid()})
+            reply = _recv_json(sock, buf)
+            if not reply.get("ok"):
+                return None
+            _send_json(sock, {"op": "ack"})
+            return reply.get("payload") or {}
+    except (OSError, ValueError):
+        return None
+
+
+# ===== end-to-end self test (two processes) =====
+def _selftest_old(info_path: str) -> int:
+    """Child process: a running 'old build' with a live monitor session and a pending message."""
+    from presence import MonitorBackend, PresenceMonitor
+    from outbox import WebhookOutbox
+
+    class Backend(MonitorBackend):
+        def is_redm_pid(self, pid):
+            return pid == 4242
+
+        def find_redm_pid(self):
+            return 4242
+
+        def process_create_time(self, pid):
+            return 1234.5
+
+        def title_contains(self, pid, substring):
+            return True
+
+        def ask_announce(self, nickname):
+            return True
+
+        def ask_late_confirmation(self, nickname):
+            return True
+
+        def send_message(self, content):
+            outbox.send_message(content)
+
+    async def never_delivers(content):
+        raise ConnectionError("webhook unreachable in selftest")
+
+    outbox = WebhookOutbox(never_delivers)  # not started: messages stay pending
+    monitor = PresenceMonitor(Backend(), grace_sec=0, required_hits=1)
+
+    async def worker():
+        while True:
+            monitor.tick("Selftest", always_notify=True)
+            await asyncio.sleep(0.05)
+
+    async def main() -> int:
+        done = asyncio.Event()
+        task = asyncio.create_task(worker())
+
+        async def freeze():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return {"monitor": monitor.state.to_dict(), "nickname": "Selftest", "saved_at": time.time(),
+                    "outbox": outbox.take_pending(), "tray": {"hidden": True}, "monitoring": True}
+
+        server = HandoffServer(Path(info_path), freeze, on_handed_off=done.set, on_aborted=lambda: None)
+        await server.start()
+        try:
+            await asyncio.wait_for(done.wait(), 30)
+            return 0
+        except asyncio.TimeoutError:
+            return 3
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def _selftest() -> int:
+    from presence import MonitorBackend, PresenceMonitor, SessionState
+
+    with tempfile.TemporaryDirectory() as d:
+        info_path = Path(d) / "handoff.json"
+        old = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--selftest-old", str(info_path)])
+        try:
+            deadline = time.monotonic() + 10
+            while not info_path.exists() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            time.sleep(0.3)  # let the old monitor announce
+
+            t0 = time.perf_counter()
+            payload = request_handoff(info_path)
+            handoff_ms = (time.perf_counter() - t0) * 1000
+            assert payload is not None, "no payload from old instance"
+
+            rc = old.wait(timeout=10)
+            assert rc == 0, f"old instance exited with {rc}"
+            assert not info_path.exists(), "old instance left its handoff file behind"
+
+            saved = SessionState.from_dict(payload["monitor"])
+            assert saved.redm_pid == 4242 and saved.presence_announced, f"unexpected state {saved}"
+            assert [m["content"] for m in payload["outbox"]] == [" :inbox_tray: **Selftest** is around."]
+
+            class Backend(MonitorBackend):
+                asked = 0
+
+                def is_redm_pid(self, pid):
+                    return pid == 4242
+
+                def find_redm_pid(self):
+                    return 4242
+
+                def process_create_time(self, pid):
+                    return 1234.5
+
+                def title_contains(self, pid, substring):
+                    return True
+
+                def ask_announce(self, nickname):
+                    Backend.asked += 1
+                    return True
+
+                def ask_late_confirmation(self, nickname):
+                    Backend.asked += 1
+                    return True
+
+                def send_message(self, content):
+                    raise AssertionError(f"new instance announced again: {content}")
+
+            new = PresenceMonitor(Backend(), grace_sec=60, required_hits=1)
+            outcome = new.resume(saved, payload["nickname"], payload["saved_at"])
+            assert outcome == "resumed", outcome
+            for _ in range(5):
+                new.tick("Selftest", always_notify=False)
+            assert Backend.asked == 0, "new instance prompted again"
+        finally:
+            if old.poll() is None:
+                old.kill()
+
+    print(f"handoff selftest OK ({handoff_ms:.1f} ms from request to payload)")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--selftest-old":
+        sys.exit(_selftest_old(sys.argv[2]))
+    if len(sys.argv) == 2 and sys.argv[1] == "--selftest":
+        sys.exit(_selftest())
+    print(__doc__)
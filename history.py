@@ -0,0 +1,297 @@
+"""
+Session history stored in an embedded SQLite database.
+
+PresenceMonitor events (RedM start, Deadwood enter, decision, announce, close) are
+queued without blocking the tick and written by a background thread in batches,
+one transaction per batch, with the database in WAL mode so the UI / CLI can read
+while the writer works.
+
+Sessions still open when the owning instance starts its writer (start(close_orphans=True),
+once it won the single-instance check) or sees a new RedM start were cut short (crash,
+kill, hand-off) and are ended at their last event; a "resume" event for the same RedM
+process reopens the latest one, so a resumed session keeps counting. Any other process
+(--stats, --profile, an instance about to exit) leaves open sessions alone.
+
+    python history.py                  # hours per week + average time to announce
+    python history.py --weeks 12 --nickname Ezekiel
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+DEFAULT_DB_PATH = Path(os.environ.get("APPDATA", str(Path.home()))) / "Deadwood Presence Checker" / "history.sqlite3"
+
+BATCH_SIZE = 200          # max events per transaction
+FLUSH_INTERVAL_SEC = 2.0  # max time an event waits in the queue
+QUEUE_MAX = 10_000        # events beyond this are dropped (and counted) rather than blocking
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id           INTEGER PRIMARY KEY,
+    nickname     TEXT NOT NULL,
+    redm_pid     INTEGER,
+    started_at   REAL NOT NULL,
+    deadwood_at  REAL,
+    announced_at REAL,
+    closed_at    REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id         INTEGER PRIMARY KEY,
+    session_id INTEGER REFERENCES sessions(id),
+    ts         REAL NOT NULL,
+    kind       TEXT NOT NULL,
+    nickname   TEXT,
+    detail     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions(started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_nickname ON sessions(nickname, started_at);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+CREATE INDEX IF NOT EXISTS idx_events_nickname ON events(nickname, ts);
+"""
+
+_STOP = object()
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(db_path), timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SessionHistory:
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL_SEC):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=QUEUE_MAX)
+        self.dropped = 0
+        self.written = 0
+        self._thread: Optional[threading.Thread] = None
+        self._session_id: Optional[int] = None  # writer thread only
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = _connect(self.db_path)
+        try:
+            conn.executescript(SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ----- writing -----
+    def start(self, close_orphans: bool = False) -> "SessionHistory":
+        """close_orphans: only for the instance that owns the database (the one still running)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, args=(close_orphans,), name="history-writer",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, event: dict) -> None:
+        """PresenceMonitor listener. Never blocks the caller."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _writer(self, close_orphans: bool) -> None:
+        conn = _connect(self.db_path)
+        try:
+            if close_orphans:
+                try:
+                    with conn:
+                        self._close_orphans(conn)
+                except sqlite3.Error:
+                    pass
+            stop = False
+            while not stop:
+                try:
+                    first = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                batch = []
+                item = first
+                while True:
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    try:
+                        with conn:
+                            for event in batch:
+                                self._apply(conn, event)
+                        self.written += len(batch)
+                    except sqlite3.Error:
+                        self.dropped += len(batch)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _close_orphans(conn: sqlite3.Connection) -> int:
+        """End every open session at its last event (not at "now")."""
+        cur = conn.execute(
+            "UPDATE sessions SET closed_at = COALESCE("
+            "(SELECT MAX(ts) FROM events WHERE session_id = sessions.id), started_at) "
+            "WHERE closed_at IS NULL"
+        )
+        return cur.rowcount
+
+    @staticmethod
+    def _resumable_session_id(conn: sqlite3.Connection, pid) -> Optional[int]:
+        """The latest session if it belongs to `pid` and never saw a close event."""
+        row = conn.execute(
+            "SELECT id, redm_pid FROM sessions ORDER BY started_at DESC LIMIT 1"
+        ).fetchone()
+        if row is None or pid is None or row[1] != pid:
+            return None
+        closed = conn.execute(
+            "SELECT 1 FROM events WHERE session_id = ? AND kind = 'close' LIMIT 1", (row[0],)
+        ).fetchone()
+        return None if closed else row[0]
+
+    def _apply(self, conn: sqlite3.Connection, event: dict) -> None:
+        kind = event.get("kind", "")
+        ts = float(event.get("ts") or time.time())
+        nickname = event.get("nickname")
+        detail = {k: v for k, v in event.items() if k not in ("kind", "ts", "nickname")}
+
+        if kind == "redm_start":
+            # A session still open here was cut short by a crash; end it at its last event
+            self._close_orphans(conn)
+            cur = conn.execute(
+                "INSERT INTO sessions (nickname, redm_pid, started_at) VALUES (?, ?, ?)",
+                (nickname or "", detail.get("pid"), ts),
+            )
+            self._session_id = cur.lastrowid
+        elif kind == "resume":
+            # Same RedM process as before the restart: continue its session
+            session_id = self._resumable_session_id(conn, detail.get("pid"))
+            if session_id is not None:
+                conn.execute("UPDATE sessions SET closed_at = NULL WHERE id = ?", (session_id,))
+            else:
+                session_id = conn.execute(
+                    "INSERT INTO sessions (nickname, redm_pid, started_at) VALUES (?, ?, ?)",
+                    (nickname or "", detail.get("pid"), ts),
+                ).lastrowid
+            self._session_id = session_id
+        elif self._session_id is not None:
+            if kind == "deadwood_enter":
+                conn.execute(
+                    "UPDATE sessions SET deadwood_at = COALESCE(deadwood_at, ?) WHERE id = ?",
+                    (ts, self._session_id),
+                )
+            elif kind == "announce":
+                conn.execute(
+                    "UPDATE sessions SET announced_at = COALESCE(announced_at, ?) WHERE id = ?",
+                    (ts, self._session_id),
+                )
+            elif kind == "close":
+                conn.execute("UPDATE sessions SET closed_at = ? WHERE id = ?", (ts, self._session_id))
+
+        conn.execute(
+            "INSERT INTO events (session_id, ts, kind, nickname, detail) VALUES (?, ?, ?, ?, ?)",
+            (self._session_id, ts, kind, nickname, json.dumps(detail) if detail else None),
+        )
+        if kind == "close":
+            self._session_id = None
+
+    # ----- queries -----
+    def _reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=5)
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def hours_per_week(self, weeks: int = 8, nickname: Optional[str] = None,
+                       now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        [(week starting 'YYYY-mm-dd', hours in game)], oldest first. The live session counts up
+        to now; a session that began before the window counts from the window's start.
+        """
+        now = time.time() if now is None else now
+        since = now - weeks * 7 * 24 * 3600
+        sql = (
+            "SELECT date(MAX(started_at, :since), 'unixepoch', 'localtime', '-6 days', 'weekday 1') AS week, "
+            "SUM(MIN(COALESCE(closed_at, :now), :now) - MAX(started_at, :since)) / 3600.0 "
+            "FROM sessions WHERE COALESCE(closed_at, :now) > :since AND started_at < :now"
+        )
+        params: dict = {"now": now, "since": since}
+        if nickname:
+            sql += " AND nickname = :nickname"
+            params["nickname"] = nickname
+        sql += " GROUP BY week ORDER BY week"
+        conn = self._reader()
+        try:
+            return [(week, round(hours or 0.0, 2)) for week, hours in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def avg_time_to_announce(self, nickname: Optional[str] = None, since: Optional[float] = None) -> Optional[float]:
+        """Average seconds from RedM start to the announcement, over announced sessions."""
+        sql = "SELECT AVG(announced_at - started_at) FROM sessions WHERE announced_at IS NOT NULL"
+        params: list = []
+        if nickname:
+            sql += " AND nickname = ?"
+            params.append(nickname)
+        if since is not None:
+            sql += " AND started_at >= ?"
+            params.append(since)
+        conn = self._reader()
+        try:
+            row = conn.execute(sql, params).fetchone()
+            return row[0] if row and row[0] is not None else None
+        finally:
+            conn.close()
+
+    def summary(self, nickname: Optional[str] = None, weeks: int = 8) -> str:
+        lines = []
+        rows = self.hours_per_week(weeks=weeks, nickname=nickname)
+        if rows:
+            lines.append("Hours in RedM per week:")
+            for week, hours in rows:
+                lines.append(f"  {week}  {hours:6.1f} h")
+        else:
+            lines.append(f"No sessions recorded in the last {weeks} weeks.")
+
+        avg = self.avg_time_to_announce(nickname=nickname)
+        if avg is not None:
+            lines.append(f"Average time from RedM start to announce: {avg / 60:.1f} min")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deadwood session history stats")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH)
+    parser.add_argument("--weeks", type=int, default=8)
+    parser.add_argument("--nickname", default=None)
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        raise SystemExit(f"No history yet at {args.db}")
+    print(SessionHistory(args.db).summary(nickname=args.nickname, weeks=args.weeks))
@@ -0,0 +1,103 @@
+"""
+Launch cache.
+
+Every launch used to repeat the same Windows work: reading version info from the EXE
+of every running process (enforce_single_latest_instance) and enumerating / rewriting
+the Run key (cleanup_old_startup_entries). Those answers only change when a different
+build starts, so they are remembered here, keyed by our own EXE path, mtime and
+version:
+
+- hit: the Run key cleanup is skipped (this build already did it) and only processes
+  named like one of our known EXEs are probed;
+- miss (new build, moved EXE, first run, unreadable cache): everything is done the
+  long way and the cache is rewritten.
+
+"Is this EXE our app" verdicts are kept per EXE path + mtime on both paths, since a
+file's version resources can't change without its mtime changing.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+
+CACHE_VERSION = 1
+MAX_EXE_VERDICTS = 512
+
+
+class LaunchCache:
+    def __init__(self, path: Path, exe_path: str, exe_mtime: float, version: str):
+        self.path = Path(path)
+        self.key = {
+            "v": CACHE_VERSION,
+            "exe": os.path.normcase(os.path.abspath(exe_path)),
+            "mtime": exe_mtime,
+            "version": version,
+        }
+        self.hit = False
+        self.startup_cleaned = False
+        self.verdicts: Dict[str, list] = {}  # normcased EXE path -> [mtime, is our app]
+        self.our_exe_names = set()           # lower-cased base names of EXEs that are our app
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            verdicts = data.get("exes") or {}
+            names = data.get("names") or []
+        except Exception:
+            return
+        if isinstance(verdicts, dict):
+            self.verdicts = {
+                exe: v for exe, v in verdicts.items()
+                if isinstance(v, list) and len(v) == 2 and isinstance(v[0], (int, float))
+            }
+        if isinstance(names, list):
+            self.our_exe_names = {str(n).lower() for n in names}
+        if data.get("key") == self.key:
+            self.hit = True
+            self.startup_cleaned = bool(data.get("startup_cleaned"))
+
+    def exe_verdict(self, exe_path: str, mtime: float) -> Optional[bool]:
+        """Cached "is this our app" for exe_path, None if unknown or the file changed."""
+        v = self.verdicts.get(os.path.normcase(exe_path))
+        if v is not None and v[0] == mtime:
+            return bool(v[1])
+        return None
+
+    def remember_exe(self, exe_path: str, mtime: float, ours: bool) -> None:
+        exe = os.path.normcase(exe_path)
+        if self.verdicts.get(exe) == [mtime, bool(ours)]:
+            return
+        self.verdicts.pop(exe, None)
+        self.verdicts[exe] = [mtime, bool(ours)]
+        while len(self.verdicts) > MAX_EXE_VERDICTS:
+            del self.verdicts[next(iter(self.verdicts))]  # oldest first (insertion order)
+        if ours:
+            self.our_exe_names.add(os.path.basename(exe_path).lower())
+        self._dirty = True
+
+    def mark_startup_cleaned(self) -> None:
+        if not self.startup_cleaned:
+            self.startup_cleaned = True
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the cache if anything changed (or the key did). Never raises."""
+        if self.hit and not self._dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text(json.dumps({
+                "key": self.key,
+                "startup_cleaned": self.startup_cleaned,
+                "names": sorted(self.our_exe_names),
+                "exes": self.verdicts,
+            }), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self.hit = True
+            self._dirty = False
+        except Exception:
+            pass
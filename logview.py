@@ -0,0 +1,238 @@
+"""
+Indexed log viewer for log.txt.
+
+log.txt can reach hundreds of MB after months in the tray. LogIndex memory-maps it
+and keeps a sparse index of the "[YYYY-mm-dd HH:MM:SS]" prefix every INDEX_STEP_BYTES,
+so finding the start of a time range is a binary search plus a short scan, and
+results are streamed entry by entry without reading the whole file. The timestamp is
+fixed-width, so it is compared as bytes and never parsed on the hot path.
+query_slices() streams the same results in slices of bounded scan size, for callers
+(the Tk viewer) that must get control back even while a filter matches nothing.
+
+    python logview.py --day tuesday -c Webhook -g FAILED
+    python logview.py --since 12h -c Startup
+    python logview.py --since "2026-10-01 08:00" --until 2026-10-02 --limit 50
+"""
+import argparse
+import bisect
+import datetime as dt
+import mmap
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+
+DEFAULT_LOG_PATH = Path(os.environ.get("APPDATA", str(Path.home()))) / "Deadwood Presence Checker" / "log.txt"
+
+INDEX_STEP_BYTES = 1024 * 1024   # one index point per MB
+SLICE_BYTES = 64 * 1024          # bytes scanned per query_slices() slice
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+TS_LEN = 19                      # len("2026-10-13 21:04:55")
+PREFIX_LEN = TS_LEN + 3          # "[" + ts + "] "
+
+_TS_LINE = re.compile(rb"\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\] ")
+_RELATIVE = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhdw])$", re.IGNORECASE)
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_UNIT_SEC = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+class LogEntry(NamedTuple):
+    ts: str
+    category: str
+    text: str       # message, including continuation lines (tracebacks)
+    offset: int
+
+
+def entry_category(message: str) -> str:
+    """'Webhook: sent OK' -> 'Webhook', 'Startup repaired. ...' -> 'Startup', 'Application starting' -> 'Application'."""
+    word = message.split(None, 1)[0] if message.strip() else ""
+    return word.rstrip(":.,")
+
+
+def parse_time(text: str, now: Optional[dt.datetime] = None) -> dt.datetime:
+    """
+    Accepts 'YYYY-mm-dd[ HH:MM[:SS]]', relative '30m' / '12h' / '7d' / '2w' (ago),
+    'today', 'yesterday' and weekday names (the most recent one before today).
+    """
+    now = now or dt.datetime.now()
+    t = text.strip().lower()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if t == "now":
+        return now
+    if t == "today":
+        return today
+    if t == "yesterday":
+        return today - dt.timedelta(days=1)
+    if t.startswith("last "):
+        t = t[5:]
+    if t in _WEEKDAYS:
+        back = (now.weekday() - _WEEKDAYS.index(t)) % 7 or 7
+        return today - dt.timedelta(days=back)
+
+    m = _RELATIVE.match(t)
+    if m:
+        return now - dt.timedelta(seconds=float(m.group(1)) * _UNIT_SEC[m.group(2).lower()])
+
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return dt.datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"can't understand time {text!r}")
+
+
+def _ts_bytes(when: dt.datetime) -> bytes:
+    return when.strftime(TS_FORMAT).encode("ascii")
+
+
+class LogIndex:
+    def __init__(self, path: Path = DEFAULT_LOG_PATH, step: int = INDEX_STEP_BYTES):
+        self.path = Path(path)
+        self.step = step
+        self._f = open(self.path, "rb")
+        self.size = os.fstat(self._f.fileno()).st_size
+        # mmap can't map an empty file
+        self.mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self._index_ts: List[bytes] = []
+        self._index_off: List[int] = []
+        self._build_index()
+
+    def close(self) -> None:
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----- index -----
+    def _next_entry_start(self, pos: int) -> int:
+        """First offset >= pos where a timestamped line begins (self.size if none)."""
+        mm, size = self.mm, self.size
+        if pos > 0 and mm[pos - 1:pos] != b"\n":
+            nl = mm.find(b"\n", pos)
+            pos = size if nl < 0 else nl + 1
+        while pos < size:
+            if _TS_LINE.match(mm, pos):
+                return pos
+            nl = mm.find(b"\n", pos)
+            pos = size if nl < 0 else nl + 1
+        return size
+
+    def _build_index(self) -> None:
+        for pos in range(0, self.size, self.step):
+            off = self._next_entry_start(pos)
+            if off >= self.size:
+                break
+            if self._index_off and off <= self._index_off[-1]:
+                continue
+            self._index_off.append(off)
+            self._index_ts.append(self.mm[off + 1:off + 1 + TS_LEN])
+
+    def seek(self, when: Optional[dt.datetime]) -> int:
+        """Offset of the first entry at or after `when`."""
+        if when is None or not self._index_off:
+            return self._next_entry_start(0) if self.size else 0
+        target = _ts_bytes(when)
+        i = bisect.bisect_left(self._index_ts, target)
+        # Start from the last index point strictly before the target and scan forward
+        pos = self._index_off[i - 1] if i > 0 else self._next_entry_start(0)
+        mm, size = self.mm, self.size
+        while pos < size:
+            if mm[pos + 1:pos + 1 + TS_LEN] >= target:
+                return pos
+            pos = self._next_entry_start(pos + 1)
+        return size
+
+    # ----- query -----
+    def entries(self, start: int = 0) -> Iterator[LogEntry]:
+        mm, size = self.mm, self.size
+        pos = start
+        while pos < size:
+            end = self._next_entry_start(pos + 1)
+            raw = mm[pos:end]
+            text = raw[PREFIX_LEN:].decode("utf-8", errors="replace").rstrip("\r\n")
+            yield LogEntry(raw[1:1 + TS_LEN].decode("ascii"), entry_category(text), text, pos)
+            pos = end
+
+    def query(self, since: Optional[dt.datetime] = None, until: Optional[dt.datetime] = None,
+              categories: Sequence[str] = (), grep: Optional[str] = None) -> Iterator[LogEntry]:
+        for entries in self.query_slices(since, until, categories, grep, slice_bytes=0):
+            yield from entries
+
+    def query_slices(self, since: Optional[dt.datetime] = None, until: Optional[dt.datetime] = None,
+                     categories: Sequence[str] = (), grep: Optional[str] = None,
+                     slice_bytes: int = SLICE_BYTES) -> Iterator[List[LogEntry]]:
+        """
+        Same results as query(), as lists covering at most ~slice_bytes of scanned log
+        each (slices may be empty). slice_bytes=0 yields one entry at a time.
+        """
+        until_b = _ts_bytes(until).decode("ascii") if until is not None else None
+        cats = {c.lower() for c in categories if c}
+        needle = grep.lower() if grep else None
+        start = self.seek(since)
+        limit = start + slice_bytes
+        matched: List[LogEntry] = []
+        for entry in self.entries(start):
+            if until_b is not None and entry.ts >= until_b:
+                break
+            if (not cats or entry.category.lower() in cats) and (not needle or needle in entry.text.lower()):
+                matched.append(entry)
+                if not slice_bytes:
+                    yield matched
+                    matched = []
+                    continue
+            if slice_bytes and entry.offset >= limit:
+                yield matched
+                matched = []
+                limit = entry.offset + slice_bytes
+        if matched:
+            yield matched
+
+
+def resolve_range(since: Optional[str], until: Optional[str], day: Optional[str],
+                  now: Optional[dt.datetime] = None):
+    """CLI/UI strings -> (since, until) datetimes. --day covers that whole calendar day."""
+    if day:
+        start = parse_time(day, now).replace(hour=0, minute=0, second=0, microsecond=0)
+        return start, start + dt.timedelta(days=1)
+    return (parse_time(since, now) if since else None), (parse_time(until, now) if until else None)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Query the Deadwood Presence Checker log")
+    parser.add_argument("--log", type=Path, default=DEFAULT_LOG_PATH)
+    parser.add_argument("--since", help="YYYY-mm-dd[ HH:MM[:SS]], 12h, 7d, yesterday, tuesday, ...")
+    parser.add_argument("--until", help="same formats as --since (exclusive)")
+    parser.add_argument("--day", help="a whole day, e.g. 2026-10-13, yesterday, tuesday")
+    parser.add_argument("-c", "--category", action="append", default=[], help="Webhook, Startup, Handoff, ...")
+    parser.add_argument("-g", "--grep", help="case-insensitive text the entry must contain")
+    parser.add_argument("--limit", type=int, default=0, help="stop after N entries")
+    args = parser.parse_args(argv)
+
+    try:
+        since, until = resolve_range(args.since, args.until, args.day)
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.log.exists():
+        print(f"No log at {args.log}", file=sys.stderr)
+        return 1
+
+    shown = 0
+    with LogIndex(args.log) as idx:
+        for entry in idx.query(since, until, args.category, args.grep):
+            print(f"[{entry.ts}] {entry.text}")
+            shown += 1
+            if args.limit and shown >= args.limit:
+                break
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
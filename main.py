@@ -1,8 +1,19 @@
+import asyncio
 import os
 import sys
 import json
 import time
 import threading
+import argparse
+import contextlib
+import cProfile
+import io
+import marshal
+import platform
+import pstats
+import tempfile
+import tracemalloc
+import zipfile
 from pathlib import Path
 import tkinter as tk
 from tkinter import messagebox
@@ -10,13 +21,27 @@ import webbrowser
 import psutil
 import requests
 import traceback
-from typing import Optional
+from typing import List, Optional, Tuple
 from PIL import Image, ImageDraw, ImageTk
 import pystray
 import winreg
 import ctypes
 from ctypes import wintypes
 
+from presence import MonitorBackend, PresenceMonitor, SessionState
+from citizenfx_log import LogTailer, CitizenFxLogSignal
+from server_probe import ServerProbeSignal
+from history import SessionHistory
+from checkpoint import SessionCheckpoint
+from outbox import WebhookOutbox
+from runtime import MonitorRuntime, UiBridge
+from aggregator import AggregatorReporter
+from status_stream import StatusStream, DEFAULT_PORT as STATUS_STREAM_DEFAULT_PORT, default_pipe_path
+from tick_watchdog import STALL_SEC as WATCHDOG_STALL_SEC, TICK_SLO_MS
+from handoff import HandoffServer, request_handoff
+from launch_cache import LaunchCache
+import logview
+
 
 # ====== BACKEND CONFIG ======
 PROCESS_NAME = "RedM_GTAProcess.exe"
@@ -36,6 +61,39 @@ RUN_KEY_NAME = "DeadwoodPresenceChecker"
 APPDATA_DIR = Path(os.environ.get("APPDATA", str(Path.home()))) / APP_NAME
 CONFIG_PATH = APPDATA_DIR / "config.json"
 LOG_PATH = APPDATA_DIR / "log.txt"
+LOG_QUERY_PATH = APPDATA_DIR / "log_query.txt"  # --logs output when there is no console
+PROFILE_DIR = APPDATA_DIR / "profiles"
+CITIZENFX_TAIL_STATE_PATH = APPDATA_DIR / "citizenfx_tail.json"
+HISTORY_DB_PATH = APPDATA_DIR / "history.sqlite3"
+CHECKPOINT_PATH = APPDATA_DIR / "session.checkpoint"
+HANDOFF_INFO_PATH = APPDATA_DIR / "handoff.json"
+LAUNCH_CACHE_PATH = APPDATA_DIR / "launch_cache.json"
+
+# RedM client logs (newest file is the current session)
+CITIZENFX_LOG_GLOB = str(
+    Path(os.environ.get("LOCALAPPDATA", str(Path.home()))) / "RedM" / "RedM.app" / "logs" / "CitizenFX_log_*.log"
+)
+
+LOG_VIEWER_MAX_ENTRIES = 5000   # entries shown per query in the built-in viewer
+LOG_VIEWER_CHUNK = 200          # entries rendered per UI slice, so the window stays responsive
+LOG_VIEWER_SLICE_SEC = 0.03     # ...and at most this long scanning per slice (selective filters)
+LOG_VIEWER_CATEGORIES = ["All", "Webhook", "Startup", "Application", "Handoff", "Checkpoint",
+                         "History", "CitizenFX", "Profile", "Exiting"]
+
+LIVE_PANEL_REFRESH_MS = 500    # live panel / tray tooltip redraw rate, independent of how fast the monitor ticks
+LIVE_PANEL_FIELDS = [
+    ("redm", "RedM"),
+    ("uptime", "Running for"),
+    ("grace", "Grace period"),
+    ("hits", "Deadwood hits"),
+    ("decision", "Decision"),
+    ("scan", "Last title scan"),
+    ("queue", "Webhook queue"),
+    ("ticks", "Tick latency"),
+]
+
+PROFILE_DEFAULT_ITERATIONS = 12   # monitor loop passes recorded by --profile
+PROFILE_SNAPSHOT_EVERY = 4        # tracemalloc snapshot every N passes
 
 
 # ===== WinAPI: enumerate visible windows and read titles =====
@@ -149,10 +207,17 @@ def _get_file_version_string(exe_path: str, key: str) -> str:
     except Exception:
         return ""
 
-def ask_user_late_confirmation(nickname: str) -> bool:
-    temp = tk.Tk()
+def _prompt_parent(parent: Optional[tk.Misc]):
+    # Hidden topmost window so the prompt shows above the game.
+    # With the app running it's a Toplevel of the main window; standalone it needs its own Tk.
+    temp = tk.Toplevel(parent) if parent is not None else tk.Tk()
     temp.withdraw()
     temp.attributes("-topmost", True)
+    return temp
+
+
+def ask_user_late_confirmation(nickname: str, parent: Optional[tk.Misc] = None) -> bool:
+    temp = _prompt_parent(parent)
 
     msg = (
         f'Did you wake up in Deadwood County as "{nickname}"?\n\n'
@@ -222,14 +287,23 @@ def is_process_running(proc_name: str) -> bool:
     return False
 
 
-def send_webhook_message(content: str) -> None:
+async def send_webhook_message(content: str) -> None:
+    # Runs on the monitor runtime's event loop (WebhookOutbox); the blocking POST goes to a
+    # worker thread. Raises so the outbox retries, with retry_after from a 429's Retry-After.
     log(f"Webhook: sending: {content}")
     try:
-        r = requests.post(WEBHOOK_URL, json={"content": content}, timeout=10)
-        r.raise_for_status()
+        r = await asyncio.to_thread(requests.post, WEBHOOK_URL, json={"content": content}, timeout=10)
+        try:
+            r.raise_for_status()
+        except requests.HTTPError as e:
+            try:
+                e.retry_after = float(r.headers["Retry-After"])
+            except (KeyError, ValueError):
+                e.retry_after = None
+            raise
         log(f"Webhook: sent OK (status={r.status_code})")
     except Exception as e:
-        log(f"Webhook: FAILED: {e}\n{traceback.format_exc()}")
+        log(f"Webhook: FAILED: {e!r}")
         raise
 
 
@@ -275,54 +349,89 @@ def _safe_proc_cmdline(p: psutil.Process) -> str:
         return ""
 
 
-def enforce_single_latest_instance(app_tag: str = "DeadwoodPresenceChecker") -> bool:
-    """Ensure only the newest build stays running.
+def open_launch_cache() -> LaunchCache:
+    exe = _current_exe_path()
+    return LaunchCache(LAUNCH_CACHE_PATH, exe, _get_exe_mtime(exe), get_app_version_display())
 
-    If multiple instances are detected, the instance whose EXE path has the newest
-    modified time (mtime) remains and older ones are terminated.
 
-    Returns True if THIS instance should continue, False if it should exit.
-    """
-    # IMPORTANT:
-    # Only enforce "latest instance wins" for *frozen* (PyInstaller) builds.
-    # When running as a .py (e.g., inside PyCharm), sys.executable is python.exe
-    # and killing "other instances" would terminate unrelated Python processes.
-    if not getattr(sys, "frozen", False):
-        return True
+def _is_our_app_cached(exe: str, cache: Optional[LaunchCache]) -> bool:
+    if cache is None:
+        return _exe_looks_like_our_app(exe)
+    mtime = _get_exe_mtime(exe)
+    ours = cache.exe_verdict(exe, mtime)
+    if ours is None:
+        ours = _exe_looks_like_our_app(exe)
+        cache.remember_exe(exe, mtime, ours)
+    return ours
+
+
+def find_other_instances(app_tag: str = "DeadwoodPresenceChecker",
+                         cache: Optional[LaunchCache] = None) -> List[Tuple[psutil.Process, str]]:
+    """(process, exe path) of other running instances of this app. Read-only.
 
+    With a launch cache hit (same build as last time) only processes named like one of
+    our known EXEs are probed; otherwise every process is, and version info verdicts
+    come from the cache where the EXE hasn't changed.
+    """
     my_pid = os.getpid()
     my_exe = _current_exe_path()
     my_mtime = _get_exe_mtime(my_exe)
 
     my_base = os.path.basename(my_exe).lower()
     candidates = []
+    known_names = ({my_base} | cache.our_exe_names) if (cache is not None and cache.hit) else None
+    if cache is not None:
+        cache.remember_exe(my_exe, my_mtime, True)
 
     for p in psutil.process_iter(["pid", "name"]):
         try:
             if p.info["pid"] == my_pid:
                 continue
+            if known_names is not None and (p.info.get("name") or "").lower() not in known_names:
+                continue  # fast path: nothing but our own builds is worth opening
 
             exe = _safe_proc_exe(p)
             if not exe:
                 continue
 
             exe_base = os.path.basename(exe).lower()
-            cmd = _safe_proc_cmdline(p).lower()
 
             # Candidate match:
             # - same filename (old behavior), OR
             # - version-info says it's our app (works even if filenames are different), OR
             # - contains tag in cmdline (fallback)
-            if exe_base == my_base or _exe_looks_like_our_app(exe) or (app_tag.lower() in cmd):
+            if (exe_base == my_base or _is_our_app_cached(exe, cache)
+                    or app_tag.lower() in _safe_proc_cmdline(p).lower()):
                 candidates.append((p, exe))
         except Exception:
             continue
+    return candidates
+
+
+def enforce_single_latest_instance(app_tag: str = "DeadwoodPresenceChecker", on_newest=None,
+                                   cache: Optional[LaunchCache] = None) -> bool:
+    """Ensure only the newest build stays running.
+
+    If multiple instances are detected, the instance whose EXE path has the newest
+    modified time (mtime) remains and older ones are terminated. on_newest() is called
+    right before that (upgrade hand-off), so older instances get a chance to exit cleanly.
+
+    Returns True if THIS instance should continue, False if it should exit.
+    """
+    # IMPORTANT:
+    # Only enforce "latest instance wins" for *frozen* (PyInstaller) builds.
+    # When running as a .py (e.g., inside PyCharm), sys.executable is python.exe
+    # and killing "other instances" would terminate unrelated Python processes.
+    if not getattr(sys, "frozen", False):
+        return True
 
+    candidates = find_other_instances(app_tag, cache)
     if not candidates:
         return True
 
+    my_exe = _current_exe_path()
     newest_exe = my_exe
-    newest_mtime = my_mtime
+    newest_mtime = _get_exe_mtime(my_exe)
     for _, exe in candidates:
         mt = _get_exe_mtime(exe)
         if mt > newest_mtime:
@@ -333,15 +442,24 @@ def enforce_single_latest_instance(app_tag: str = "DeadwoodPresenceChecker") ->
     if os.path.abspath(newest_exe).lower() != os.path.abspath(my_exe).lower():
         return False
 
-    # I am the newest: terminate other candidates
-    for p, _exe in candidates:
+    # I am the newest: take over live state, then terminate other candidates
+    procs = [p for p, _ in candidates]
+    if on_newest is not None:
+        try:
+            if on_newest():
+                # An instance that handed over exits by itself; only stragglers get terminated
+                _gone, procs = psutil.wait_procs(procs, timeout=3)
+        except Exception as e:
+            log(f"Handoff: failed: {e}")
+
+    for p in procs:
         try:
             p.terminate()
         except Exception:
             continue
 
     # Give them a moment, then force kill if needed
-    gone, alive = psutil.wait_procs([p for p, _ in candidates], timeout=2)
+    gone, alive = psutil.wait_procs(procs, timeout=2)
     for p in alive:
         try:
             p.kill()
@@ -367,14 +485,15 @@ def get_startup_command_current() -> Optional[str]:
         return None
 
 
-def cleanup_old_startup_entries(contains_text: str = APP_NAME):
-    """Best-effort cleanup of older Run entries (if previous builds used different value names)."""
+def cleanup_old_startup_entries(contains_text: str = APP_NAME, dry_run: bool = False) -> bool:
+    """Best-effort cleanup of older Run entries (if previous builds used different value names).
+    dry_run only enumerates (--profile). Returns False if the Run key couldn't be read."""
     try:
         with winreg.OpenKey(
             winreg.HKEY_CURRENT_USER,
             r"Software\Microsoft\Windows\CurrentVersion\Run",
             0,
-            winreg.KEY_READ | winreg.KEY_SET_VALUE,
+            winreg.KEY_READ if dry_run else winreg.KEY_READ | winreg.KEY_SET_VALUE,
         ) as key:
             i = 0
             to_delete = []
@@ -391,14 +510,20 @@ def cleanup_old_startup_entries(contains_text: str = APP_NAME):
                 except OSError:
                     break
 
+            if dry_run:
+                if to_delete:
+                    log(f"Startup: would remove old Run value(s) {to_delete}")
+                return True
             for name in to_delete:
                 try:
                     winreg.DeleteValue(key, name)
                     log(f"Startup: removed old Run value '{name}'")
                 except Exception as e:
                     log(f"Startup: failed to delete '{name}': {e}")
+        return True
     except Exception as e:
         log(f"Startup: cleanup failed: {e}")
+        return False
 
 def resource_path(relative_path: str) -> str:
     """
@@ -432,6 +557,17 @@ def load_config() -> dict:
             "run_minimized": False,
             "start_monitoring_automatically": False,
             "always_notify": False,
+            "citizenfx_log_signal": False,
+            "deadwood_servers": ["Deadwood County"],
+            "deadwood_server_endpoints": [],
+            "status_stream": False,
+            "status_stream_port": STATUS_STREAM_DEFAULT_PORT,
+            "status_stream_pipe": True,
+            "status_stream_origins": [],
+            "aggregator_url": "",
+            "aggregator_token": "",
+            "tick_slo_ms": TICK_SLO_MS,
+            "watchdog_stall_sec": WATCHDOG_STALL_SEC,
         }
     try:
         cfg = json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
@@ -444,6 +580,20 @@ def load_config() -> dict:
     cfg.setdefault("run_minimized", False)
     cfg.setdefault("start_monitoring_automatically", False)
     cfg.setdefault("always_notify", False)
+    # Opt-in: server names in the log are a weaker signal. Renamed from citizenfx_log_detection,
+    # which used to default to on and got saved into every config.json that way.
+    cfg.pop("citizenfx_log_detection", None)
+    cfg.setdefault("citizenfx_log_signal", False)
+    cfg.setdefault("deadwood_servers", ["Deadwood County"])
+    cfg.setdefault("deadwood_server_endpoints", [])  # "host:port" entries; empty disables the probe
+    cfg.setdefault("status_stream", False)  # localhost SSE / WebSocket / named pipe feed for overlays and bots
+    cfg.setdefault("status_stream_port", STATUS_STREAM_DEFAULT_PORT)  # 0 = pipe only
+    cfg.setdefault("status_stream_pipe", True)
+    cfg.setdefault("status_stream_origins", [])  # browser pages besides file:// allowed to subscribe
+    cfg.setdefault("aggregator_url", "")  # group aggregator (aggregator.py); set = report there, not to Discord
+    cfg.setdefault("aggregator_token", "")
+    cfg.setdefault("tick_slo_ms", TICK_SLO_MS)  # ticks slower than this are logged with their slowest stage
+    cfg.setdefault("watchdog_stall_sec", WATCHDOG_STALL_SEC)  # a tick this late is a hang: restart the observer
     return cfg
 
 
@@ -485,32 +635,185 @@ def set_run_at_startup(enabled: bool) -> None:
                 pass
 
 
-def is_startup_enabled() -> bool:
-    try:
-        with winreg.OpenKey(
-            winreg.HKEY_CURRENT_USER,
-            r"Software\Microsoft\Windows\CurrentVersion\Run",
-            0,
-            winreg.KEY_READ,
-        ) as key:
-            winreg.QueryValueEx(key, RUN_KEY_NAME)
-            return True
-    except FileNotFoundError:
-        return False
-    except OSError:
-        return False
-
-
-def ask_user_to_announce(nickname: str) -> bool:
-    temp = tk.Tk()
-    temp.withdraw()
-    temp.attributes("-topmost", True)
+def ask_user_to_announce(nickname: str, parent: Optional[tk.Misc] = None) -> bool:
+    temp = _prompt_parent(parent)
     msg = f'Seems like you are waking up as "{nickname}" in Deadwood.\nDo you wanna let people know?'
     res = messagebox.askyesno("Deadwood Presence", msg, parent=temp)
     temp.destroy()
     return res
 
 
+class WindowsMonitorBackend(MonitorBackend):
+    """
+    PresenceMonitor backend for the real app: psutil, WinAPI window titles, Tk prompts, webhook.
+    Runs on the monitor runtime's observer thread; prompts and webhooks never block it.
+    """
+
+    def __init__(self, runtime: MonitorRuntime, direct_webhook: bool = True):
+        self.runtime = runtime
+        self.direct_webhook = direct_webhook
+
+    def is_redm_pid(self, pid: int) -> bool:
+        if not psutil.pid_exists(pid):
+            return False
+        try:
+            return (psutil.Process(pid).name() or "").lower() == PROCESS_NAME.lower()
+        except Exception:
+            return False
+
+    def find_redm_pid(self) -> Optional[int]:
+        for p in psutil.process_iter(["pid", "name"]):
+            try:
+                if (p.info.get("name") or "").lower() == PROCESS_NAME.lower():
+                    return int(p.info["pid"])
+            except Exception:
+                continue
+        return None
+
+    def process_create_time(self, pid: int) -> Optional[float]:
+        try:
+            return psutil.Process(pid).create_time()
+        except Exception:
+            return None
+
+    def title_contains(self, pid: int, substring: str) -> bool:
+        return any_window_title_contains_for_pid(pid, substring)
+
+    def ask_announce(self, nickname: str):
+        # Shown on the Tk thread; the answer comes back through PresenceMonitor.answer_prompt()
+        return self.runtime.request_prompt("announce", nickname)
+
+    def ask_late_confirmation(self, nickname: str):
+        return self.runtime.request_prompt("late", nickname)
+
+    def send_message(self, content: str) -> None:
+        if not self.direct_webhook:
+            # The group aggregator posts for everyone (AggregatorReporter listens to the same events)
+            log(f"Webhook: left to the aggregator: {content}")
+            return
+        # Queued; the outbox task does the network I/O and retries
+        self.runtime.outbox.send_message(content)
+
+
+class ProfileMonitorBackend(WindowsMonitorBackend):
+    """Real observations, but no prompts and no webhooks: --profile must never announce anyone."""
+
+    def ask_announce(self, nickname: str):
+        return False
+
+    def ask_late_confirmation(self, nickname: str):
+        return False
+
+    def send_message(self, content: str) -> None:
+        log(f"Profile: not sending: {content}")
+
+
+def build_presence_signals(cfg: dict) -> list:
+    """Extra Deadwood signals next to the window title matcher, as enabled in config."""
+    signals = []
+    if cfg.get("citizenfx_log_signal", False):
+        try:
+            tailer = LogTailer(CITIZENFX_LOG_GLOB, state_path=CITIZENFX_TAIL_STATE_PATH)
+            signals.append(CitizenFxLogSignal(tailer, list(cfg.get("deadwood_servers") or [])))
+        except Exception as e:
+            log(f"CitizenFX log: disabled: {e}")
+
+    endpoints = list(cfg.get("deadwood_server_endpoints") or [])
+    if endpoints:
+        signals.append(ServerProbeSignal(endpoints))
+    return signals
+
+
+def build_status_stream(cfg: dict) -> Optional[StatusStream]:
+    if not cfg.get("status_stream", False):
+        return None
+    return StatusStream(
+        port=int(cfg.get("status_stream_port") or 0),
+        pipe_path=default_pipe_path() if cfg.get("status_stream_pipe", True) else None,
+        allowed_origins=cfg.get("status_stream_origins") or (),
+        log_fn=log,
+    )
+
+
+def _format_duration(sec: float) -> str:
+    sec = int(max(0, sec))
+    h, rem = divmod(sec, 3600)
+    m, s = divmod(rem, 60)
+    if h:
+        return f"{h}h {m:02d}m"
+    return f"{m}m {s:02d}s" if m else f"{s}s"
+
+
+def format_live_status(snap: Optional[dict], now: float) -> dict:
+    """PresenceMonitor snapshot (via the runtime's StatusFeed) -> text per LIVE_PANEL_FIELDS key."""
+    texts = {key: "-" for key, _ in LIVE_PANEL_FIELDS}
+    if snap is None:
+        texts["redm"] = "not monitoring"
+        return texts
+
+    if snap["pid"] is None:
+        texts["redm"] = "not running"
+    else:
+        texts["redm"] = f"running (PID {snap['pid']})"
+        if snap["first_seen"] is not None:
+            running_for = now - snap["first_seen"]
+            texts["uptime"] = _format_duration(running_for)
+            grace_left = snap["grace_sec"] - running_for
+            texts["grace"] = f"{_format_duration(grace_left)} left" if grace_left > 0 else "over, watching titles"
+
+    hits = f"{snap['deadwood_hits']} / {snap['required_hits']}"
+    if snap["in_deadwood"]:
+        hits += " (in Deadwood)"
+    if snap["closed_hits"]:
+        hits += f", closing {snap['closed_hits']} / {snap['closed_required']}"
+    texts["hits"] = hits
+
+    if snap["prompt_pending"]:
+        texts["decision"] = "waiting for your answer"
+    elif snap["announced"]:
+        texts["decision"] = "announced"
+    elif snap["decided"]:
+        texts["decision"] = "not announcing"
+    elif snap["pid"] is not None:
+        texts["decision"] = "undecided"
+
+    if snap["title_scan_sec"] is not None:
+        texts["scan"] = f"{snap['title_scan_sec'] * 1000:.1f} ms"
+    texts["queue"] = f"{snap['webhook_queue']} pending" if snap["webhook_queue"] else "empty"
+
+    ticks = snap["ticks"]
+    if _tick_overdue(snap, now):
+        texts["ticks"] = f"no tick for {_format_duration(now - snap['ts'])}, watchdog pending"
+    elif ticks["ticks"]:
+        texts["ticks"] = f"p95 {ticks['p95_ms']:.1f} ms (SLO {ticks['slo_ms']} ms)"
+        if ticks["restarts"]:
+            texts["ticks"] += f", {ticks['restarts']} restart(s)"
+    return texts
+
+
+def _tick_overdue(snap: dict, now: float) -> bool:
+    """The runtime stopped publishing (a hang the watchdog hasn't caught yet, or a dead loop)."""
+    return now - snap["ts"] > snap["next_tick_sec"] + snap["stall_sec"] + 1
+
+
+def format_tray_title(snap: Optional[dict], now: float) -> str:
+    if snap is None:
+        detail = "not monitoring"
+    elif snap["pid"] is None:
+        detail = "waiting for RedM"
+    elif snap["in_deadwood"] or snap["announced"]:
+        detail = f"in Deadwood (PID {snap['pid']})"
+    elif snap["first_seen"] is not None and now - snap["first_seen"] < snap["grace_sec"]:
+        detail = f"RedM starting, grace {_format_duration(snap['grace_sec'] - (now - snap['first_seen']))}"
+    else:
+        detail = f"RedM running (PID {snap['pid']})"
+    if snap is not None and _tick_overdue(snap, now):
+        detail += ", monitor not responding"
+    if snap is not None and snap["webhook_queue"]:
+        detail += f", {snap['webhook_queue']} webhook(s) queued"
+    return f"{APP_NAME} - {detail}"[:127]  # Windows tooltip limit
+
+
 def create_tray_icon_image() -> Image.Image:
     size = 64
     img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
@@ -522,7 +825,10 @@ def create_tray_icon_image() -> Image.Image:
 
 
 class DeadwoodApp:
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, handoff: Optional[dict] = None, profile: bool = False):
+        # profile=True (--profile): next to a running instance, so nothing that would clash with
+        # it, write its data or talk to others (hand-off server, status stream, aggregator,
+        # auto-monitoring, session history, Run key repair)
         self.root = root
         self.root.title(APP_NAME)
         self.root.resizable(False, False)
@@ -530,21 +836,70 @@ class DeadwoodApp:
         self.cfg = load_config()
 
         # If user wants startup enabled, ensure the registry points to THIS version/exe path
-        # (important when users replace the exe during updates).
+        # (important when users replace the exe during updates). The Run key is read once here;
+        # --profile only reads it, the repair is the running instance's business.
+        startup_state = False
         if self.cfg.get("run_at_startup", False):
-            try:
-                desired = get_startup_command()
-                current = get_startup_command_current()
-                if current != desired:
-                    set_run_at_startup(True)
-                    log(f"Startup repaired. Old: {current!r} New: {desired!r}")
-            except Exception as e:
-                log(f"Startup repair failed: {e}")
+            current = get_startup_command_current()
+            startup_state = current is not None
+            if not profile:
+                try:
+                    desired = get_startup_command()
+                    if current != desired:
+                        set_run_at_startup(True)
+                        startup_state = True
+                        log(f"Startup repaired. Old: {current!r} New: {desired!r}")
+                except Exception as e:
+                    log(f"Startup repair failed: {e}")
 
-        # Monitoring state
+        # Monitoring state: detection, deadlines and webhooks all run on the runtime's event loop
         self.monitoring = False
-        self.stop_event = threading.Event()
-        self.worker_thread = None
+        self.resume_payload = handoff  # live state handed over by the previous build (consumed once)
+        self._handoff_outbox = []
+        self.outbox = WebhookOutbox(send_webhook_message, log)
+        if handoff is not None:
+            self.outbox.put_back(handoff.get("outbox") or [])
+        self.status_stream = build_status_stream(self.cfg)
+        aggregator_url = str(self.cfg.get("aggregator_url") or "").strip()
+        self.reporter = (
+            AggregatorReporter(aggregator_url, str(self.cfg.get("aggregator_token") or ""), log_fn=log)
+            if aggregator_url else None
+        )
+        self.ui_bridge = UiBridge(root, log_fn=log).start()
+
+        # Let a newer build take over our live state instead of just killing us
+        self.handoff_server = None
+        if getattr(sys, "frozen", False) and not profile:
+            self.handoff_server = HandoffServer(
+                HANDOFF_INFO_PATH,
+                freeze=self.freeze_for_handoff,
+                on_handed_off=lambda: self.ui_bridge.call(self.exit_after_handoff),
+                on_aborted=lambda: self.ui_bridge.call(self.resume_after_aborted_handoff),
+                log_fn=log,
+            )
+
+        self.runtime = MonitorRuntime(
+            self.outbox,
+            ui=self.ui_bridge,
+            show_prompt=self.show_prompt,
+            # Closed in reverse order: the hand-off server goes first
+            services=[s for s in (self.status_stream, self.reporter, self.handoff_server)
+                      if s is not None and not profile],
+            log_fn=log,
+            tick_slo_sec=max(1, int(self.cfg.get("tick_slo_ms") or TICK_SLO_MS)) / 1000.0,
+            stall_sec=max(2.0, float(self.cfg.get("watchdog_stall_sec") or WATCHDOG_STALL_SEC)),
+        )
+        self.runtime.start()
+
+        # Session history (write-behind SQLite); the app works fine without it. --profile leaves
+        # the database alone: the running instance's open session is not ours to close.
+        self.history = None
+        if not profile:
+            try:
+                # main() only gets here after winning the single-instance check: open sessions are ours
+                self.history = SessionHistory(HISTORY_DB_PATH).start(close_orphans=True)
+            except Exception as e:
+                log(f"History: disabled: {e}")
 
         # Tray
         self.tray_icon = None
@@ -555,27 +910,28 @@ class DeadwoodApp:
         self.nickname_var = tk.StringVar(value=self.cfg.get("nickname", "Ezekiel"))
         self.run_minimized_var = tk.BooleanVar(value=bool(self.cfg.get("run_minimized", False)))
 
-        startup_state = is_startup_enabled() if self.cfg.get("run_at_startup") else False
         self.run_startup_var = tk.BooleanVar(value=startup_state)
 
         self.auto_monitor_var = tk.BooleanVar(value=bool(self.cfg.get("start_monitoring_automatically", False)))
         self.always_notify_var = tk.BooleanVar(value=bool(self.cfg.get("always_notify", False)))
 
         self.status_var = tk.StringVar(value=f"Status: Idle (watching {PROCESS_NAME})")
+        self.live_vars = {key: tk.StringVar(value="-") for key, _ in LIVE_PANEL_FIELDS}
+        self.live_snapshot = None
+        self._tray_title = None
         self.build_ui()
-
-        # Apply startup if config wants it but registry differs
-        if self.cfg.get("run_at_startup", False) and not startup_state:
-            try:
-                set_run_at_startup(True)
-                self.run_startup_var.set(True)
-            except Exception:
-                self.run_startup_var.set(False)
+        self.root.after(LIVE_PANEL_REFRESH_MS, self.refresh_live_panel)
+        self.push_settings()
+        self.nickname_var.trace_add("write", lambda *_: self.push_settings())
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
+        if handoff is not None:
+            # Continue exactly where the previous build stopped (its outbox was queued above)
+            if handoff.get("monitoring"):
+                self.start_monitoring(minimize=bool((handoff.get("tray") or {}).get("hidden")))
         # Auto start monitoring if enabled
-        if self.auto_monitor_var.get():
+        elif self.auto_monitor_var.get() and not profile:
             self.start_monitoring(minimize=self.run_minimized_var.get())
 
     def build_ui(self):
@@ -621,8 +977,14 @@ class DeadwoodApp:
 
         tk.Label(frame, textvariable=self.status_var).grid(row=5, column=0, columnspan=2, sticky="w", pady=(10, 0))
 
+        live = tk.LabelFrame(frame, text="Live", padx=8, pady=4)
+        live.grid(row=6, column=0, columnspan=2, sticky="we", pady=(8, 0))
+        for i, (key, label) in enumerate(LIVE_PANEL_FIELDS):
+            tk.Label(live, text=label, fg="gray").grid(row=i, column=0, sticky="w")
+            tk.Label(live, textvariable=self.live_vars[key]).grid(row=i, column=1, sticky="w", padx=(8, 0))
+
         btns = tk.Frame(frame)
-        btns.grid(row=6, column=0, columnspan=2, sticky="w", pady=(12, 0))
+        btns.grid(row=7, column=0, columnspan=2, sticky="w", pady=(12, 0))
 
         self.btn_start = tk.Button(btns, text="Start monitoring", command=lambda: self.start_monitoring(minimize=False))
         self.btn_start.pack(side="left")
@@ -637,17 +999,23 @@ class DeadwoodApp:
         self.btn_stop = tk.Button(btns, text="Stop", command=self.stop_monitoring, state="disabled")
         self.btn_stop.pack(side="left", padx=(8, 0))
 
+        self.btn_history = tk.Button(btns, text="History", command=self.show_history)
+        self.btn_history.pack(side="left", padx=(8, 0))
+
+        self.btn_logs = tk.Button(btns, text="Logs", command=self.open_log_viewer)
+        self.btn_logs.pack(side="left", padx=(8, 0))
+
         tk.Label(
             frame,
             text="- When minimized, use the tray icon menu to show / stop / exit.",
             fg="gray",
-        ).grid(row=7, column=0, columnspan=2, sticky="w", pady=(10, 0))
+        ).grid(row=8, column=0, columnspan=2, sticky="w", pady=(10, 0))
 
         tk.Label(
             frame,
             text="- Closing this window will hide the app to system tray menu.",
             fg="gray",
-        ).grid(row=8, column=0, columnspan=2, sticky="w")
+        ).grid(row=9, column=0, columnspan=2, sticky="w")
 
         def open_github(event=None):
             webbrowser.open_new("https://github.com/berat-c/deadwood-checker")
@@ -662,18 +1030,154 @@ class DeadwoodApp:
         link.bind("<Button-1>", open_github)
         link.bind("<Enter>", lambda e: link.config(font=("Segoe UI", 9, "underline")))
         link.bind("<Leave>", lambda e: link.config(font=("Segoe UI", 9)))
-        link.grid(row=9, column=0, columnspan=2, sticky="w", pady=(0, 4))
+        link.grid(row=10, column=0, columnspan=2, sticky="w", pady=(0, 4))
 
         tk.Label(
             frame,
             text=get_app_version_display(),
             fg="gray",
             font=("Segoe UI", 8),
-        ).grid(row=10, column=0, columnspan=2, sticky="w", pady=(0, 4))
+        ).grid(row=11, column=0, columnspan=2, sticky="w", pady=(0, 4))
 
     def set_status(self, text: str):
         self.status_var.set(text)
 
+    def refresh_live_panel(self):
+        # Newest snapshot only (StatusFeed coalesces); countdowns are recomputed here so they
+        # keep moving between monitor ticks without asking the runtime for anything
+        update = self.runtime.status_feed.take()
+        if "monitor" in update:
+            self.live_snapshot = update["monitor"]
+        snap = self.live_snapshot if self.monitoring else None
+        now = time.time()
+
+        if not self.is_hidden_to_tray:
+            for key, text in format_live_status(snap, now).items():
+                var = self.live_vars[key]
+                if var.get() != text:
+                    var.set(text)
+
+        title = format_tray_title(snap, now)
+        if self.tray_icon is not None and title != self._tray_title:
+            self._tray_title = title
+            try:
+                self.tray_icon.title = title
+            except Exception:
+                pass
+
+        self.root.after(LIVE_PANEL_REFRESH_MS, self.refresh_live_panel)
+
+    def open_log_viewer(self):
+        win = tk.Toplevel(self.root)
+        win.title(f"{APP_NAME} - Log")
+
+        filters = tk.Frame(win, padx=8, pady=8)
+        filters.pack(fill="x")
+
+        day_var = tk.StringVar(value="today")
+        category_var = tk.StringVar(value="All")
+        grep_var = tk.StringVar(value="")
+        info_var = tk.StringVar(value="")
+
+        tk.Label(filters, text="Day:").pack(side="left")
+        tk.Entry(filters, textvariable=day_var, width=12).pack(side="left", padx=(4, 8))
+        tk.Label(filters, text="Category:").pack(side="left")
+        tk.OptionMenu(filters, category_var, *LOG_VIEWER_CATEGORIES).pack(side="left", padx=(4, 8))
+        tk.Label(filters, text="Contains:").pack(side="left")
+        tk.Entry(filters, textvariable=grep_var, width=16).pack(side="left", padx=(4, 8))
+
+        body = tk.Frame(win)
+        body.pack(fill="both", expand=True)
+        text = tk.Text(body, width=110, height=30, wrap="none", font=("Consolas", 9))
+        scroll = tk.Scrollbar(body, command=text.yview)
+        text.configure(yscrollcommand=scroll.set)
+        scroll.pack(side="right", fill="y")
+        text.pack(side="left", fill="both", expand=True)
+
+        tk.Label(win, textvariable=info_var, fg="gray", anchor="w").pack(fill="x", padx=8, pady=(0, 6))
+
+        state = {"index": None, "results": None, "shown": 0, "started": 0.0}
+
+        def finish():
+            if state["index"] is not None:
+                state["index"].close()
+                state["index"] = None
+            state["results"] = None
+
+        def render_chunk():
+            results = state["results"]
+            if results is None:
+                return
+            lines = []
+            done = False
+            slice_end = time.perf_counter() + LOG_VIEWER_SLICE_SEC
+            while len(lines) < LOG_VIEWER_CHUNK and time.perf_counter() < slice_end:
+                entries = next(results, None)
+                if entries is None:
+                    done = True
+                    break
+                room = LOG_VIEWER_MAX_ENTRIES - state["shown"]
+                lines.extend(f"[{entry.ts}] {entry.text}\n" for entry in entries[:room])
+                state["shown"] += min(len(entries), room)
+                if state["shown"] >= LOG_VIEWER_MAX_ENTRIES:
+                    done = True
+                    break
+            if lines:
+                text.insert("end", "".join(lines))
+
+            elapsed = time.perf_counter() - state["started"]
+            if not done:
+                info_var.set(f"{state['shown']} entries so far...")
+                win.after(1, render_chunk)
+                return
+
+            more = " (limit reached, narrow the filter)" if state["shown"] >= LOG_VIEWER_MAX_ENTRIES else ""
+            info_var.set(f"{state['shown']} entries in {elapsed * 1000:.0f} ms{more}")
+            finish()
+
+        def search():
+            finish()
+            text.delete("1.0", "end")
+            try:
+                since, until = logview.resolve_range(None, None, day_var.get().strip() or "today")
+            except ValueError as e:
+                info_var.set(str(e))
+                return
+            if not LOG_PATH.exists():
+                info_var.set(f"No log at {LOG_PATH}")
+                return
+
+            category = category_var.get()
+            try:
+                state["index"] = logview.LogIndex(LOG_PATH)
+                state["results"] = state["index"].query_slices(
+                    since, until, [] if category == "All" else [category], grep_var.get().strip() or None
+                )
+            except Exception as e:
+                finish()
+                info_var.set(f"Couldn't read log: {e}")
+                return
+            state["shown"] = 0
+            state["started"] = time.perf_counter()
+            render_chunk()
+
+        tk.Button(filters, text="Search", command=search).pack(side="left")
+        win.bind("<Return>", lambda e: search())
+        win.protocol("WM_DELETE_WINDOW", lambda: (finish(), win.destroy()))
+        search()
+
+    def show_history(self):
+        if self.history is None:
+            messagebox.showinfo("History", "Session history is not available.", parent=self.root)
+            return
+        nickname = self.nickname_var.get().strip() or None
+        try:
+            text = self.history.summary(nickname=nickname)
+        except Exception as e:
+            log(f"History: query failed: {e}")
+            text = f"Couldn't read history:\n{e}"
+        messagebox.showinfo(f"History - {nickname or 'all characters'}", text, parent=self.root)
+
     def persist_config(self):
         self.cfg["nickname"] = self.nickname_var.get().strip() or "Ezekiel"
         self.cfg["run_at_startup"] = bool(self.run_startup_var.get())
@@ -681,6 +1185,16 @@ class DeadwoodApp:
         self.cfg["start_monitoring_automatically"] = bool(self.auto_monitor_var.get())
         self.cfg["always_notify"] = bool(self.always_notify_var.get())
         save_config(self.cfg)
+        self.push_settings()
+
+    def push_settings(self):
+        self.runtime.configure(self.nickname_var.get().strip() or "Ezekiel", bool(self.always_notify_var.get()))
+
+    def show_prompt(self, kind: str, nickname: str) -> bool:
+        # Runs on the Tk thread (via UiBridge) while the monitor keeps ticking
+        if kind == "late":
+            return ask_user_late_confirmation(nickname, parent=self.root)
+        return ask_user_to_announce(nickname, parent=self.root)
 
     def on_toggle_any_setting(self):
         self.persist_config()
@@ -711,7 +1225,6 @@ class DeadwoodApp:
         self.persist_config()
 
         self.monitoring = True
-        self.stop_event.clear()
 
         self.btn_start.config(state="disabled")
         self.btn_start_min.config(state="disabled")
@@ -719,8 +1232,8 @@ class DeadwoodApp:
 
         self.set_status(f"Status: Monitoring for RedM")
 
-        self.worker_thread = threading.Thread(target=self.monitor_loop, daemon=True)
-        self.worker_thread.start()
+        monitor, checkpoint, saved = self.new_session()
+        self.runtime.start_session(monitor, checkpoint, saved)
 
         if minimize:
             self.minimize_to_tray()
@@ -728,8 +1241,11 @@ class DeadwoodApp:
     def stop_monitoring(self):
         if not self.monitoring:
             return
-        self.stop_event.set()
         self.monitoring = False
+        try:
+            self.runtime.stop_session()
+        except Exception as e:
+            log(f"Runtime: stopping monitoring failed: {e}")
 
         self.btn_start.config(state="normal")
         self.btn_start_min.config(state="normal")
@@ -737,192 +1253,31 @@ class DeadwoodApp:
 
         self.set_status("Status: Stopped")
 
-    def monitor_loop(self):
-        was_running = False
-
-        presence_announced = False
-        presence_decided = False  # latched yes/no for this session (until confirmed close)
-
-        deadwood_hits = 0
-        was_in_deadwood = False   # for edge detection (enter event)
-
-        first_seen_running_ts = None
-
-        # NEW: require multiple consecutive "not running" checks before treating as closed
-        closed_hits = 0
-        CLOSED_REQUIRED_HITS = 3
-
-        LATE_CONFIRM_SEC = 240
-        late_popup_shown = False
-
-        last_title_scan_ts = 0.0
-        TITLE_SCAN_MIN_INTERVAL = 3.0  # seconds
-        redm_pid = None  # cache PID to avoid scanning all processes every loop
-        closing = False  # NEW: latched when RedM transitions from running -> not running
-
-
-        while not self.stop_event.is_set():
-            nickname = (self.nickname_var.get().strip() or "Ezekiel")
-            always_notify = bool(self.always_notify_var.get())
-
-            running = False
-
-            # Fast path: check cached PID
-            if redm_pid is not None:
-                if psutil.pid_exists(redm_pid):
-                    try:
-                        p = psutil.Process(redm_pid)
-                        if (p.name() or "").lower() == PROCESS_NAME.lower():
-                            running = True
-                        else:
-                            redm_pid = None
-                    except Exception:
-                        redm_pid = None
-                else:
-                    redm_pid = None
-
-            # Slow path: only scan all processes if PID not cached
-            if redm_pid is None:
-                for p in psutil.process_iter(["pid", "name"]):
-                    try:
-                        if (p.info.get("name") or "").lower() == PROCESS_NAME.lower():
-                            redm_pid = int(p.info["pid"])
-                            running = True
-                            break
-                    except Exception:
-                        continue
-
-            now = time.time()
-            if running and not was_running:
-                first_seen_running_ts = now
-
-                # NEW: new RedM session -> allow asking again
-                presence_decided = False
-                presence_announced = False
-                deadwood_hits = 0
-                was_in_deadwood = False
-                late_popup_shown = False
-
-            sleep_for = CHECK_IDLE_SEC
-            in_deadwood_raw = False
-
-
-            # Only after grace: check if any window title contains "Deadwood County"
-            if running and first_seen_running_ts is not None:
-                if (now - first_seen_running_ts) >= GRACE_AFTER_PROCESS_START_SEC:
-                    if (now - last_title_scan_ts) >= TITLE_SCAN_MIN_INTERVAL:
-                        last_title_scan_ts = now
-                        try:
-                            if redm_pid is not None:
-                                in_deadwood_raw = any_window_title_contains_for_pid(redm_pid, "Deadwood County")
-                            else:
-                                in_deadwood_raw = False
-                        except Exception:
-                            in_deadwood_raw = False
-
-            if running and in_deadwood_raw:
-                deadwood_hits += 1
-                sleep_for = CHECK_ACTIVE_SEC
-            else:
-                deadwood_hits = 0
-
-            in_deadwood_now = (deadwood_hits >= REQUIRED_HITS)
-
-            # Enter Deadwood (stable) -> fire only on ENTER edge
-            entered_deadwood = in_deadwood_now and not was_in_deadwood
-
-            # Late confirmation fallback:
-            # If RedM has been running for 5 full minutes and we still have no decision,
-            # show a one-time popup due to RedM title bug.
-            if (
-                    running
-                    and first_seen_running_ts is not None
-                    and not presence_decided
-                    and not late_popup_shown
-                    and not always_notify
-            ):
-                if (now - first_seen_running_ts) >= LATE_CONFIRM_SEC:
-                    try:
-                        yes = ask_user_late_confirmation(nickname)
-
-                        # Latch the decision (Yes or No) so we never ask again
-                        presence_decided = True
-                        late_popup_shown = True
-
-                        # If they say Yes, send the webhook
-                        if yes and not presence_announced:
-                            try:
-                                send_webhook_message(f" :inbox_tray: **{nickname}** is around.")
-                                presence_announced = True
-                            except Exception:
-                                pass
-
-                    except Exception:
-                        # If popup fails, allow retry later
-                        pass
-
-            if entered_deadwood and not presence_decided:
-                # 1) Get decision and latch immediately (YES or NO)
-                if always_notify:
-                    yes = True
-                    presence_decided = True
-                else:
-                    try:
-                        yes = ask_user_to_announce(nickname)  # True/False
-                        presence_decided = True  # latch YES or NO for this session
-                    except Exception:
-                        # popup failed -> no decision made, allow retry on next enter
-                        yes = None
-
-                # 2) If YES, attempt webhook; webhook failure must NOT cause re-asking
-                if yes is True and not presence_announced:
-                    try:
-                        send_webhook_message(f" :inbox_tray: **{nickname}** is around.")
-                        presence_announced = True
-                    except Exception:
-                        pass
-
-            # Confirmed game closed (avoid flicker)
-            if running:
-                closing = False
-                closed_hits = 0
-            else:
-                if was_running:
-                    closing = True
-                    closed_hits = 0
-
-                if closing:
-                    closed_hits += 1
-
-            if closing and closed_hits >= CLOSED_REQUIRED_HITS:
-                # RedM is REALLY closed
-                if presence_announced:
-                    try:
-                        send_webhook_message(f" :bed: **{nickname}** went to bed.")
-                    except Exception:
-                        pass
-
-                # Reset session state ONLY on confirmed close
-                presence_decided = False
-                presence_announced = False
-                deadwood_hits = 0
-                was_in_deadwood = False
-                late_popup_shown = False
-                first_seen_running_ts = None
-                last_title_scan_ts = 0.0
-                redm_pid = None
-
-                closing = False
-                closed_hits = 0
-
-            was_running = running
-            was_in_deadwood = in_deadwood_now
-
-            # Sleep in small chunks so Stop is responsive
-            waited = 0.0
-            while waited < sleep_for and not self.stop_event.is_set():
-                time.sleep(0.5)
-                waited += 0.5
+    def new_session(self):
+        """PresenceMonitor + checkpoint for one monitoring run, plus the interrupted session to resume (if any)."""
+        monitor = PresenceMonitor(
+            WindowsMonitorBackend(self.runtime, direct_webhook=self.reporter is None),
+            check_idle_sec=CHECK_IDLE_SEC,
+            check_active_sec=CHECK_ACTIVE_SEC,
+            required_hits=REQUIRED_HITS,
+            grace_sec=GRACE_AFTER_PROCESS_START_SEC,
+            signals=build_presence_signals(self.cfg),
+            listeners=[self.history.record] if self.history is not None else [],
+        )
+        if self.status_stream is not None:
+            monitor.listeners.append(self.status_stream.record)
+        if self.reporter is not None:
+            monitor.listeners.append(self.reporter.record)
+
+        # Pick up a session a hand-off / crash / update / kill interrupted instead of starting over
+        checkpoint = SessionCheckpoint(CHECKPOINT_PATH)
+        handoff, self.resume_payload = self.resume_payload, None
+        if handoff is not None and handoff.get("monitor"):
+            saved = (SessionState.from_dict(handoff["monitor"]), handoff.get("nickname") or "",
+                     float(handoff.get("saved_at") or time.time()))
+        else:
+            saved = checkpoint.load()
+        return monitor, checkpoint, saved
 
     # ===== Tray behavior =====
     def ensure_tray(self):
@@ -974,9 +1329,51 @@ class DeadwoodApp:
         self.root.attributes("-topmost", True)
         self.root.after(200, lambda: self.root.attributes("-topmost", False))
 
-    def exit_app(self):
+    # ===== Upgrade hand-off (the server runs on the monitor runtime's loop) =====
+    async def freeze_for_handoff(self) -> dict:
+        # monitoring / is_hidden_to_tray belong to the Tk thread: read them there, before freezing
+        loop = asyncio.get_running_loop()
+        snapshot = loop.create_future()
+
+        def take_snapshot():
+            flags = (self.monitoring, self.is_hidden_to_tray)
+            loop.call_soon_threadsafe(lambda: snapshot.done() or snapshot.set_result(flags))
+
+        self.ui_bridge.call(take_snapshot)
+        was_monitoring, hidden = await asyncio.wait_for(snapshot, 2)
+        state, self._handoff_outbox = await asyncio.wait_for(self.runtime.freeze_on_loop(), 3)
+
+        return {
+            "version": get_app_version_display(),
+            "monitoring": was_monitoring,
+            "monitor": state if was_monitoring else None,
+            "nickname": self.runtime.nickname or "Ezekiel",  # not on the Tk thread: no Tk variables
+            "saved_at": time.time(),
+            "outbox": self._handoff_outbox,
+            "tray": {"hidden": hidden},
+        }
+
+    def resume_after_aborted_handoff(self):
+        log("Handoff: new instance didn't take over, resuming")
+        self.runtime.thaw(self._handoff_outbox)
+        self._handoff_outbox = []
+        if self.monitoring:
+            # Session was stopped by freeze_for_handoff; the checkpoint brings it back
+            self.monitoring = False
+            self.start_monitoring(minimize=self.is_hidden_to_tray)
+
+    def shutdown_services(self):
+        # Hand-off server -> session -> outbox drain -> loop exit, in that order
+        self.runtime.shutdown()
+        if self.history is not None:
+            self.history.close()
+
+    def exit_after_handoff(self):
+        # The new instance owns config.json now; writing ours would undo its changes
+        self.exit_app(persist=False)
+
+    def exit_app(self, persist: bool = True):
         try:
-            self.stop_event.set()
             self.monitoring = False
         finally:
             if self.tray_icon is not None:
@@ -984,7 +1381,9 @@ class DeadwoodApp:
                     self.tray_icon.stop()
                 except Exception:
                     pass
-            self.persist_config()
+            if persist:
+                self.persist_config()
+            self.shutdown_services()
             self.root.destroy()
 
     def on_close(self):
@@ -992,20 +1391,301 @@ class DeadwoodApp:
         self.minimize_to_tray()
 
 
+# ===== --profile: startup + monitor loop profiling bundle =====
+def _profile_environment(phase_times: dict, iterations_done: int) -> dict:
+    cfg = load_config()
+    cfg.pop("nickname", None)  # bundle is meant to be shared; keep it anonymous
+    cfg.pop("aggregator_token", None)
+    env = {
+        "app_version": get_app_version_display(),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "executable": _current_exe_path(),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "psutil": getattr(psutil, "__version__", "?"),
+        "requests": getattr(requests, "__version__", "?"),
+        "config": cfg,
+        "phase_seconds": phase_times,
+        "monitor_iterations": iterations_done,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    try:
+        vm = psutil.virtual_memory()
+        env["memory_total_mb"] = round(vm.total / (1024 * 1024))
+        env["memory_available_mb"] = round(vm.available / (1024 * 1024))
+        env["process_count"] = len(psutil.pids())
+        env["redm_running"] = is_process_running(PROCESS_NAME)
+    except Exception as e:
+        env["psutil_error"] = str(e)
+    return env
+
+
+def _profile_stats_text(profiler: cProfile.Profile) -> str:
+    out = io.StringIO()
+    for sort_key in ("cumulative", "tottime"):
+        out.write(f"===== sorted by {sort_key} =====\n")
+        stats = pstats.Stats(profiler, stream=out)
+        stats.strip_dirs().sort_stats(sort_key).print_stats(60)
+    return out.getvalue()
+
+
+def _profile_allocations_text(snapshots: list) -> str:
+    """Top allocation growth between consecutive snapshots, then first -> last."""
+    out = io.StringIO()
+    pairs = list(zip(snapshots, snapshots[1:]))
+    if len(snapshots) > 2:
+        pairs.append((snapshots[0], snapshots[-1]))
+
+    for (label_a, snap_a), (label_b, snap_b) in pairs:
+        out.write(f"===== {label_a} -> {label_b} =====\n")
+        for stat in snap_b.compare_to(snap_a, "lineno")[:25]:
+            out.write(f"{stat}\n")
+        out.write("\n")
+
+    if snapshots:
+        label, snap = snapshots[-1]
+        out.write(f"===== largest live allocations at {label} =====\n")
+        for stat in snap.statistics("lineno")[:25]:
+            out.write(f"{stat}\n")
+    return out.getvalue()
+
+
+def run_profile_mode(iterations: int = PROFILE_DEFAULT_ITERATIONS) -> Optional[Path]:
+    """
+    Runs startup and `iterations` monitor loop passes under cProfile + tracemalloc and
+    writes a single zip bundle to %APPDATA%\\Deadwood Presence Checker\\profiles.
+    Returns the bundle path (None if it couldn't be written).
+    """
+    log(f"Profile: starting ({iterations} monitor iterations)")
+    tracemalloc.start(25)
+    snapshots = [("start", tracemalloc.take_snapshot())]
+    profiler = cProfile.Profile()
+    phase_times = {}
+    iterations_done = 0
+
+    def timed(name, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            phase_times[name] = round(time.perf_counter() - t0, 6)
+
+    def on_iteration(n):
+        # Runs on the runtime's loop thread, the profiler is on the observer thread
+        nonlocal iterations_done
+        iterations_done = n
+        if n % PROFILE_SNAPSHOT_EVERY == 0:
+            snapshots.append((f"iteration {n}", tracemalloc.take_snapshot()))
+
+    root = None
+    app = None
+    scratch = tempfile.TemporaryDirectory(prefix="deadwood-profile-")
+    try:
+        # The running instance (if any) is only looked up, never replaced or terminated
+        others = timed("find_other_instances", find_other_instances)
+        log(f"Profile: {len(others)} other instance(s) running, left alone")
+        timed("cleanup_old_startup_entries", cleanup_old_startup_entries, dry_run=True)
+
+        root = tk.Tk()
+        root.withdraw()
+        app = timed("DeadwoodApp.__init__", DeadwoodApp, root, profile=True)
+        snapshots.append(("after startup", tracemalloc.take_snapshot()))
+
+        # A session of `iterations` ticks with the real observations and signals, but a backend
+        # that never prompts or posts, and a throwaway checkpoint (the real one belongs to the
+        # running instance). cProfile is per thread, so the profiler is switched on inside the
+        # runtime's observer thread, where the ticks run.
+        monitor = PresenceMonitor(
+            ProfileMonitorBackend(app.runtime, direct_webhook=False),
+            check_idle_sec=CHECK_IDLE_SEC,
+            check_active_sec=CHECK_ACTIVE_SEC,
+            required_hits=REQUIRED_HITS,
+            grace_sec=GRACE_AFTER_PROCESS_START_SEC,
+            signals=build_presence_signals(app.cfg),
+        )
+        checkpoint = SessionCheckpoint(Path(scratch.name) / "session.checkpoint")
+        t0 = time.perf_counter()
+        app.runtime.run_on_observer(profiler.enable, timeout=5)
+        try:
+            app.runtime.start_session(
+                monitor, checkpoint, None, max_ticks=iterations, on_tick=on_iteration
+            ).result(timeout=iterations * (CHECK_IDLE_SEC + 5) + 60)
+        finally:
+            app.runtime.run_on_observer(profiler.disable, timeout=5)
+            phase_times["monitor_loop"] = round(time.perf_counter() - t0, 6)
+        if snapshots[-1][0] != f"iteration {iterations_done}":
+            snapshots.append((f"iteration {iterations_done}", tracemalloc.take_snapshot()))
+    except Exception as e:
+        log(f"Profile: run failed: {e}\n{traceback.format_exc()}")
+    finally:
+        tracemalloc.stop()
+        if app is not None:
+            app.shutdown_services()
+        if root is not None:
+            try:
+                root.destroy()
+            except Exception:
+                pass
+        scratch.cleanup()
+
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        bundle = PROFILE_DIR / f"profile-{time.strftime('%Y%m%d-%H%M%S')}.zip"
+        profiler.create_stats()
+        env = _profile_environment(phase_times, iterations_done)
+
+        with zipfile.ZipFile(bundle, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("profile.pstats", marshal.dumps(profiler.stats))
+            zf.writestr("profile.txt", _profile_stats_text(profiler))
+            zf.writestr("allocations.txt", _profile_allocations_text(snapshots))
+            zf.writestr("environment.json", json.dumps(env, indent=2, ensure_ascii=False))
+
+        log(f"Profile: bundle written to {bundle}")
+        return bundle
+    except Exception as e:
+        log(f"Profile: failed to write bundle: {e}\n{traceback.format_exc()}")
+        return None
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog=APP_NAME)
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile startup and the monitor loop, then write a bundle for bug reports",
+    )
+    parser.add_argument(
+        "--logs",
+        nargs=argparse.REMAINDER,
+        help="query log.txt and exit; the rest of the command line goes to the log viewer "
+             "(e.g. --logs --day tuesday -c Webhook -g FAILED)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print session history stats (hours per week, time to announce) and exit",
+    )
+    parser.add_argument(
+        "--profile-iterations",
+        type=int,
+        default=PROFILE_DEFAULT_ITERATIONS,
+        help="monitor loop passes to record in --profile mode",
+    )
+    # Unknown args are ignored so older Run entries / shortcuts never break startup
+    args, _unknown = parser.parse_known_args(argv)
+    return args
+
+
+def show_message(title: str, text: str):
+    try:
+        temp = tk.Tk()
+        temp.withdraw()
+        messagebox.showinfo(f"{APP_NAME} - {title}", text)
+        temp.destroy()
+    except Exception:
+        print(text)
+
+
+def run_log_query(query_args: List[str]) -> int:
+    """--logs: print the matches, or in the windowed build (no console) write them to a file and open it."""
+    argv = ["--log", str(LOG_PATH)] + query_args
+    if sys.stdout is not None:
+        return logview.main(argv)
+
+    LOG_QUERY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOG_QUERY_PATH, "w", encoding="utf-8") as out, \
+            contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        try:
+            rc = logview.main(argv)
+        except SystemExit as e:  # argparse usage errors
+            rc = e.code if isinstance(e.code, int) else 2
+        empty = out.tell() == 0
+    if rc != 0:
+        show_message("Logs", LOG_QUERY_PATH.read_text(encoding="utf-8").strip() or "Log query failed")
+    elif empty:
+        show_message("Logs", "No log entries match.")
+    else:
+        try:
+            os.startfile(str(LOG_QUERY_PATH))
+        except Exception as e:
+            show_message("Logs", f"Results written to {LOG_QUERY_PATH} (couldn't open it: {e})")
+    return rc
+
+
 def main():
+    args = parse_args()
+
+    if args.logs is not None:
+        sys.exit(run_log_query(args.logs))
+
+    if args.stats:
+        # Windowed build: there is no console to print to
+        if HISTORY_DB_PATH.exists():
+            text = SessionHistory(HISTORY_DB_PATH).summary()
+        else:
+            text = f"No history yet at {HISTORY_DB_PATH}"
+        show_message("Stats", text)
+        return
+
+    if args.profile:
+        bundle = run_profile_mode(max(1, args.profile_iterations))
+        try:
+            temp = tk.Tk()
+            temp.withdraw()
+            if bundle is not None:
+                messagebox.showinfo(APP_NAME, f"Profile saved to:\n{bundle}\n\nPlease attach it to your bug report.")
+            else:
+                messagebox.showerror(APP_NAME, f"Profiling failed, see:\n{LOG_PATH}")
+            temp.destroy()
+        except Exception:
+            pass
+        return
+
     log("Application starting")
+    launch_started = time.perf_counter()
+    phases = {}
+
+    def timed(name, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            phases[name] = time.perf_counter() - t0
+
+    # Same build as last launch -> skip the Run key cleanup and most process probes
+    cache = timed("launch cache", open_launch_cache)
+
+    # Ensure only the newest version stays running (when packaged as an .exe).
+    # Before older instances are stopped, ask the running one to hand over its live state.
+    handoff_payload = None
+
+    def take_over():
+        nonlocal handoff_payload
+        handoff_payload = request_handoff(HANDOFF_INFO_PATH)
+        if handoff_payload is not None:
+            log(f"Handoff: received live state from {handoff_payload.get('version', '?')}")
+        return handoff_payload is not None
 
-    # Ensure only the newest version stays running (when packaged as an .exe)
-    if not enforce_single_latest_instance():
+    if not timed("instances", enforce_single_latest_instance, on_newest=take_over, cache=cache):
+        cache.save()
         log("Exiting: a newer version is already running")
         return
 
     # Best-effort cleanup for old startup entries (if previous builds used different value names)
-    cleanup_old_startup_entries()
+    if not (cache.hit and cache.startup_cleaned):
+        if timed("run key cleanup", cleanup_old_startup_entries):
+            cache.mark_startup_cleaned()
+    was_hit = cache.hit
+    cache.save()
 
-    root = tk.Tk()
+    root = timed("tk", tk.Tk)
     set_window_icon(root)   # 👈 THIS sets the feather icon
-    app = DeadwoodApp(root)
+    app = timed("app", DeadwoodApp, root, handoff=handoff_payload)
+    log(f"Launch: ready in {(time.perf_counter() - launch_started) * 1000:.0f} ms "
+        f"(cache {'hit' if was_hit else 'miss'}; "
+        + ", ".join(f"{name} {sec * 1000:.0f} ms" for name, sec in phases.items()) + ")")
     root.mainloop()
 
 
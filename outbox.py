@@ -0,0 +1,158 @@
+"""
+Webhook outbox.
+
+The monitor hands messages to the outbox instead of calling the webhook itself, so
+a slow or failing Discord never stalls a tick. A task on the monitor runtime's event
+loop delivers them in order and retries failures with backoff (honouring Retry-After).
+Pending messages can be taken out (and put back) as plain data, which is what the
+upgrade hand-off transfers to the new build. A message that is never delivered (outbox
+full, or out of attempts) is reported to on_dropped, so the sender can stop assuming
+it went out.
+
+All methods are meant to be called on the event loop thread (or before the loop
+runs); other threads go through MonitorRuntime.call().
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional
+
+
+MAX_PENDING = 100
+MAX_ATTEMPTS = 5
+RETRY_BASE_SEC = 2.0
+RETRY_MAX_SEC = 60.0
+
+
+class WebhookOutbox:
+    def __init__(self, send_fn: Callable[[str], Awaitable[None]], log_fn: Callable[[str], None] = lambda msg: None,
+                 max_pending: int = MAX_PENDING, max_attempts: int = MAX_ATTEMPTS,
+                 on_dropped: Callable[[str], None] = lambda content: None):
+        self.send_fn = send_fn
+        self.log_fn = log_fn
+        self.on_dropped = on_dropped
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+
+        self._pending = deque()  # dicts: {"content", "attempts", "queued_at"}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sending_since: Optional[float] = None  # time.monotonic() of the send in flight (for the watchdog)
+        self.sent = 0
+        self.failed = 0
+
+    def start(self) -> "WebhookOutbox":
+        """Start the sender task on the running loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="webhook-outbox")
+            self._notify()
+        return self
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+            if self._pending:
+                self._idle.clear()
+            else:
+                self._idle.set()
+
+    def send_message(self, content: str) -> None:
+        """Queue a message. Never blocks on the network."""
+        if len(self._pending) >= self.max_pending:
+            dropped = self._pending.popleft()
+            self.failed += 1
+            self.log_fn(f"Webhook: outbox full, dropped: {dropped['content']}")
+            self._dropped(dropped)
+        self._pending.append({"content": content, "attempts": 0, "queued_at": time.time()})
+        self._notify()
+
+    def _dropped(self, item: dict) -> None:
+        try:
+            self.on_dropped(item["content"])
+        except Exception as e:
+            self.log_fn(f"Webhook: on_dropped failed: {e}")
+
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def take_pending(self) -> List[dict]:
+        """Remove and return everything not delivered yet (for the upgrade hand-off)."""
+        items = list(self._pending)
+        self._pending.clear()
+        self._notify()
+        return items
+
+    def put_back(self, items: List[dict]) -> None:
+        """Queue messages taken from another outbox (or returned after an aborted hand-off), in order."""
+        for item in reversed(items or []):
+            if isinstance(item, dict) and item.get("content"):
+                self._pending.appendleft({
+                    "content": str(item["content"]),
+                    "attempts": int(item.get("attempts", 0)),
+                    "queued_at": float(item.get("queued_at", time.time())),
+                })
+        self._notify()
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Try to deliver what's queued within timeout, then stop the sender."""
+        if self._task is not None and self._pending:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.log_fn(f"Webhook: {len(self._pending)} message(s) still queued at shutdown")
+        await self.stop()
+
+    async def stop(self) -> None:
+        """Stop the sender without draining; an in-flight send is cancelled and stays queued."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._wakeup = None
+        self._idle = None
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            item = self._pending[0]
+
+            retry_after = None
+            self.sending_since = time.monotonic()
+            try:
+                await self.send_fn(item["content"])
+                ok = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                ok = False
+                retry_after = getattr(e, "retry_after", None)
+            finally:
+                self.sending_since = None
+
+            # take_pending() may have emptied the queue meanwhile
+            if not (self._pending and self._pending[0] is item):
+                continue
+            if ok:
+                self._pending.popleft()
+                self.sent += 1
+                continue
+
+            item["attempts"] += 1
+            if item["attempts"] >= self.max_attempts:
+                self._pending.popleft()
+                self.failed += 1
+                self.log_fn(f"Webhook: giving up after {item['attempts']} attempts: {item['content']}")
+                self._dropped(item)
+                continue
+            delay = min(RETRY_MAX_SEC, retry_after or RETRY_BASE_SEC * (2 ** (item["attempts"] - 1)))
+            await asyncio.sleep(delay)
@@ -0,0 +1,453 @@
+"""
+Deadwood presence state machine.
+
+This is the session logic that used to live inline in DeadwoodApp.monitor_loop.
+It has no psutil / WinAPI / Tk dependencies: everything it needs from the outside
+world goes through a MonitorBackend, so the app, the soak harness and any other
+driver all run the exact same code.
+"""
+import time
+from dataclasses import dataclass, asdict, fields
+from typing import Optional, Callable, List
+
+
+DEADWOOD_TITLE = "Deadwood County"
+
+CLOSED_REQUIRED_HITS = 3        # consecutive "not running" checks before treating RedM as closed
+LATE_CONFIRM_SEC = 240          # ask anyway after this long without a decision (RedM title bug)
+TITLE_SCAN_MIN_INTERVAL = 3.0   # seconds between window title scans
+SIGNAL_CONFIDENCE_THRESHOLD = 0.75  # extra signals count as a Deadwood hit at/above this
+
+RESUME_CREATE_TIME_TOLERANCE = 1.0   # seconds; same pid + create_time == same RedM process
+RESUME_BED_MAX_AGE_SEC = 12 * 60 * 60  # don't send a stale "went to bed" for ancient sessions
+
+# ask_* may return this instead of an answer: the prompt is showing and the answer
+# comes back later through PresenceMonitor.answer_prompt() (non-blocking UIs)
+PROMPT_PENDING = "pending"
+
+ANNOUNCE_MESSAGE = " :inbox_tray: **{nickname}** is around."
+BED_MESSAGE = " :bed: **{nickname}** went to bed."
+
+
+class MonitorBackend:
+    """
+    Everything PresenceMonitor needs from the outside world.
+    The real implementation lives in main.py; soak.py provides simulated ones.
+    """
+
+    def is_redm_pid(self, pid: int) -> bool:
+        """True if pid is still alive and is RedM. Must not raise."""
+        raise NotImplementedError
+
+    def find_redm_pid(self) -> Optional[int]:
+        """Full process scan. Returns RedM's pid or None. Must not raise."""
+        raise NotImplementedError
+
+    def process_create_time(self, pid: int) -> Optional[float]:
+        """Creation time of pid (to tell a reused pid apart), None if unknown. Must not raise."""
+        return None
+
+    def title_contains(self, pid: int, substring: str) -> bool:
+        raise NotImplementedError
+
+    def ask_announce(self, nickname: str):
+        """True / False, or PROMPT_PENDING if the answer is delivered later via answer_prompt()."""
+        raise NotImplementedError
+
+    def ask_late_confirmation(self, nickname: str):
+        """Same contract as ask_announce()."""
+        raise NotImplementedError
+
+    def send_message(self, content: str) -> None:
+        raise NotImplementedError
+
+
+class PresenceSignal:
+    """
+    Extra Deadwood evidence next to the window title matcher (CitizenFX log, server probe, ...).
+    poll() is called every tick while RedM runs, also during the grace period so signals can
+    follow the connect sequence; it returns a confidence between 0.0 and 1.0.
+    """
+
+    name = "signal"
+
+    def poll(self, pid: int, now: float) -> float:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Called when monitoring stops (flush persisted state etc.)."""
+
+
+@dataclass
+class SessionState:
+    was_running: bool = False
+
+    presence_announced: bool = False
+    presence_decided: bool = False  # latched yes/no for this session (until confirmed close)
+
+    deadwood_hits: int = 0
+    was_in_deadwood: bool = False   # for edge detection (enter event)
+
+    first_seen_running_ts: Optional[float] = None
+
+    # require multiple consecutive "not running" checks before treating as closed
+    closed_hits: int = 0
+    closing: bool = False           # latched when RedM transitions from running -> not running
+
+    late_popup_shown: bool = False
+    prompt_pending: Optional[str] = None  # "announce" / "late" while a non-blocking prompt is open
+
+    last_title_scan_ts: float = 0.0
+    redm_pid: Optional[int] = None  # cache PID to avoid scanning all processes every loop
+    redm_create_time: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionState":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in known})
+
+
+class PresenceMonitor:
+    """
+    One instance per monitoring run. Call tick() once per loop iteration; it returns
+    how long the caller should sleep before the next tick.
+    """
+
+    def __init__(
+        self,
+        backend: MonitorBackend,
+        check_idle_sec: float = 5,
+        check_active_sec: float = 3,
+        required_hits: int = 2,
+        grace_sec: float = 60,
+        clock: Callable[[], float] = time.time,
+        state: Optional[SessionState] = None,
+        signals: Optional[List[PresenceSignal]] = None,
+        listeners: Optional[List[Callable[[dict], None]]] = None,
+    ):
+        self.backend = backend
+        self.check_idle_sec = check_idle_sec
+        self.check_active_sec = check_active_sec
+        self.required_hits = required_hits
+        self.grace_sec = grace_sec
+        self.clock = clock
+        self.state = state if state is not None else SessionState()
+        self.signals = list(signals or [])
+        self.signal_confidence = {}  # last confidence per signal name
+        self.last_title_scan_sec: Optional[float] = None  # wall time of the last title scan (for status displays)
+        # What tick() is doing right now and how long each stage took in the last tick (for the watchdog)
+        self.stage = "idle"
+        self.stage_started = time.perf_counter()
+        self.stage_times = {}
+        # Session events ({"kind", "ts", "nickname", ...}) for history, status feeds etc.
+        self.listeners = list(listeners or [])
+
+    def _enter_stage(self, name: str) -> None:
+        now = time.perf_counter()
+        if self.stage != "idle":
+            self.stage_times[self.stage] = self.stage_times.get(self.stage, 0.0) + (now - self.stage_started)
+        self.stage = name
+        self.stage_started = now
+
+    def _emit(self, kind: str, ts: float, nickname: str, **data) -> None:
+        event = {"kind": kind, "ts": ts, "nickname": nickname, **data}
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception:
+                pass
+
+    def _announce(self, nickname: str, now: float) -> None:
+        # webhook failure must NOT cause re-asking; presence_decided is latched by the caller.
+        # presence_announced means "handed to the backend": a queued message that is dropped
+        # later comes back through message_dropped().
+        st = self.state
+        if st.presence_announced:
+            return
+        self._enter_stage("webhook")
+        try:
+            self.backend.send_message(ANNOUNCE_MESSAGE.format(nickname=nickname))
+            st.presence_announced = True
+            self._emit("announce", now, nickname)
+        except Exception:
+            self._emit("announce_failed", now, nickname)
+        self._enter_stage("state")
+
+    def _reset_session(self) -> None:
+        st = self.state
+        st.presence_decided = False
+        st.presence_announced = False
+        st.deadwood_hits = 0
+        st.was_in_deadwood = False
+        st.late_popup_shown = False
+        st.prompt_pending = None  # an answer arriving for an ended session is ignored
+
+    def _decide(self, kind: str, yes: bool, nickname: str, now: float) -> None:
+        # Latch the decision (Yes or No) so we never ask again this session
+        st = self.state
+        st.presence_decided = True
+        if kind == "late":
+            st.late_popup_shown = True
+        self._emit("decision", now, nickname, answer=bool(yes), late=(kind == "late"))
+        if yes:
+            self._announce(nickname, now)
+
+    def _ask(self, kind: str, nickname: str, now: float) -> None:
+        ask = self.backend.ask_late_confirmation if kind == "late" else self.backend.ask_announce
+        self._enter_stage("prompt")
+        try:
+            answer = ask(nickname)
+        except Exception:
+            # popup failed -> no decision made, allow retry (next enter / next tick for late)
+            return
+        finally:
+            self._enter_stage("state")
+        if answer == PROMPT_PENDING:
+            self.state.prompt_pending = kind
+            return
+        self._decide(kind, bool(answer), nickname, now)
+
+    def answer_prompt(self, kind: str, answer: Optional[bool], nickname: str) -> bool:
+        """
+        Deliver the answer to a prompt that returned PROMPT_PENDING. answer=None means the
+        prompt failed (asked again later). Returns False if the prompt is stale: the session
+        it was asked for has ended meanwhile.
+        """
+        st = self.state
+        if st.prompt_pending != kind:
+            return False
+        st.prompt_pending = None
+        if answer is not None:
+            self._decide(kind, bool(answer), nickname, self.clock())
+        return True
+
+    def message_dropped(self, content: str, nickname: str) -> bool:
+        """
+        The backend gave up on delivering `content`. If it was this session's announcement,
+        the session counts as not announced (so no "went to bed" follows) and is not asked
+        again. Returns True if the state changed.
+        """
+        st = self.state
+        if not st.presence_announced or content != ANNOUNCE_MESSAGE.format(nickname=nickname):
+            return False
+        st.presence_announced = False
+        self._emit("announce_failed", self.clock(), nickname, dropped=True)
+        return True
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        Earliest pending session deadline (grace end, late confirmation), so an event-driven
+        driver can wake exactly then instead of up to a full check interval later.
+        """
+        st = self.state
+        if st.first_seen_running_ts is None or st.presence_decided or st.prompt_pending:
+            return None
+        now = self.clock()
+        candidates = [st.first_seen_running_ts + self.grace_sec, st.first_seen_running_ts + LATE_CONFIRM_SEC]
+        upcoming = [t for t in candidates if t > now]
+        return min(upcoming) if upcoming else None
+
+    def _poll_signals(self, pid: int, now: float) -> bool:
+        hit = False
+        for signal in self.signals:
+            try:
+                confidence = float(signal.poll(pid, now))
+            except Exception:
+                confidence = 0.0
+            self.signal_confidence[signal.name] = confidence
+            if confidence >= SIGNAL_CONFIDENCE_THRESHOLD:
+                hit = True
+        return hit
+
+    def _update_running(self) -> bool:
+        st = self.state
+
+        # Fast path: check cached PID
+        if st.redm_pid is not None and not self.backend.is_redm_pid(st.redm_pid):
+            st.redm_pid = None
+
+        # Slow path: only scan all processes if PID not cached
+        if st.redm_pid is None:
+            st.redm_pid = self.backend.find_redm_pid()
+            st.redm_create_time = (
+                self.backend.process_create_time(st.redm_pid) if st.redm_pid is not None else None
+            )
+
+        return st.redm_pid is not None
+
+    def resume(self, saved: SessionState, nickname: str, saved_at: float) -> str:
+        """
+        Reconcile a checkpointed session with what is running now (after a crash, update
+        or restart). Returns "resumed" when the same RedM process is still alive (no grace
+        period, no second prompt), "ended" when it went away while we were down (sends the
+        "went to bed" message if it had been announced), or "fresh" if there was nothing to resume.
+        """
+        if saved.redm_pid is None or not saved.was_running:
+            return "fresh"
+
+        now = self.clock()
+        same_process = self.backend.is_redm_pid(saved.redm_pid)
+        if same_process and saved.redm_create_time is not None:
+            current = self.backend.process_create_time(saved.redm_pid)
+            same_process = current is not None and abs(current - saved.redm_create_time) <= RESUME_CREATE_TIME_TOLERANCE
+
+        if same_process:
+            st = SessionState.from_dict(saved.to_dict())
+            st.closing = False
+            st.closed_hits = 0
+            # Still counted as in Deadwood until a title scan says otherwise (no leave/enter flap)
+            st.deadwood_hits = self.required_hits if st.was_in_deadwood else 0
+            st.last_title_scan_ts = 0.0
+            st.prompt_pending = None  # the dialog didn't survive the restart; ask again if still undecided
+            self.state = st
+            self._emit("resume", now, nickname, pid=st.redm_pid, in_deadwood=st.was_in_deadwood,
+                       announced=st.presence_announced)
+            return "resumed"
+
+        self._emit("close", now, nickname, announced=saved.presence_announced, resumed=True)
+        if saved.presence_announced and (now - saved_at) <= RESUME_BED_MAX_AGE_SEC:
+            try:
+                self.backend.send_message(BED_MESSAGE.format(nickname=nickname))
+            except Exception:
+                pass
+        return "ended"
+
+    def snapshot(self) -> dict:
+        """Plain-data view of the current session for status displays (cheap, safe to send across threads)."""
+        st = self.state
+        return {
+            "pid": st.redm_pid if st.was_running else None,
+            "first_seen": st.first_seen_running_ts,
+            "grace_sec": self.grace_sec,
+            "deadwood_hits": st.deadwood_hits,
+            "required_hits": self.required_hits,
+            "in_deadwood": st.was_in_deadwood,
+            "closed_hits": st.closed_hits if st.closing else 0,
+            "closed_required": CLOSED_REQUIRED_HITS,
+            "decided": st.presence_decided,
+            "announced": st.presence_announced,
+            "prompt_pending": st.prompt_pending,
+            "title_scan_sec": self.last_title_scan_sec,
+            "signals": dict(self.signal_confidence),
+        }
+
+    def stop(self, nickname: str) -> None:
+        """The driver stopped ticking (Stop button, exit, hand-off); tells listeners the feed ends here."""
+        self._emit("stop", self.clock(), nickname)
+
+    def tick(self, nickname: str, always_notify: bool) -> float:
+        st = self.state
+        self.stage_times = {}
+        self._enter_stage("process_lookup")
+        running = self._update_running()
+        self._enter_stage("state")
+
+        now = self.clock()
+        if running and not st.was_running:
+            st.first_seen_running_ts = now
+            # new RedM session -> allow asking again
+            self._reset_session()
+            self._emit("redm_start", now, nickname, pid=st.redm_pid)
+
+        sleep_for = self.check_idle_sec
+        in_deadwood_raw = False
+
+        signal_hit = False
+        if running and self.signals:
+            self._enter_stage("signals")
+            signal_hit = self._poll_signals(st.redm_pid, now)
+            self._enter_stage("state")
+
+        # Only after grace: check if any window title contains "Deadwood County" (or a signal agrees)
+        if running and st.first_seen_running_ts is not None:
+            if (now - st.first_seen_running_ts) >= self.grace_sec:
+                in_deadwood_raw = signal_hit
+                if (now - st.last_title_scan_ts) >= TITLE_SCAN_MIN_INTERVAL:
+                    st.last_title_scan_ts = now
+                    self._enter_stage("title_scan")
+                    scan_started = self.stage_started
+                    try:
+                        if st.redm_pid is not None and self.backend.title_contains(st.redm_pid, DEADWOOD_TITLE):
+                            in_deadwood_raw = True
+                    except Exception:
+                        pass
+                    self._enter_stage("state")
+                    self.last_title_scan_sec = self.stage_started - scan_started
+
+        if running and in_deadwood_raw:
+            st.deadwood_hits += 1
+            sleep_for = self.check_active_sec
+        else:
+            st.deadwood_hits = 0
+
+        in_deadwood_now = st.deadwood_hits >= self.required_hits
+
+        # Enter Deadwood (stable) -> fire only on ENTER edge
+        entered_deadwood = in_deadwood_now and not st.was_in_deadwood
+        if entered_deadwood:
+            self._emit("deadwood_enter", now, nickname)
+        elif running and st.was_in_deadwood and not in_deadwood_now:
+            self._emit("deadwood_leave", now, nickname)
+
+        # Late confirmation fallback:
+        # If RedM has been running for LATE_CONFIRM_SEC and we still have no decision,
+        # show a one-time popup due to RedM title bug.
+        if (
+                running
+                and st.first_seen_running_ts is not None
+                and not st.presence_decided
+                and not st.late_popup_shown
+                and not st.prompt_pending
+                and not always_notify
+                and (now - st.first_seen_running_ts) >= LATE_CONFIRM_SEC
+        ):
+            self._ask("late", nickname, now)
+
+        if entered_deadwood and not st.presence_decided and not st.prompt_pending:
+            # Get decision and latch immediately (YES or NO); if YES, attempt webhook
+            if always_notify:
+                self._decide("announce", True, nickname, now)
+            else:
+                self._ask("announce", nickname, now)
+
+        # Confirmed game closed (avoid flicker)
+        if running:
+            st.closing = False
+            st.closed_hits = 0
+        else:
+            if st.was_running:
+                st.closing = True
+                st.closed_hits = 0
+
+            if st.closing:
+                st.closed_hits += 1
+
+        if st.closing and st.closed_hits >= CLOSED_REQUIRED_HITS:
+            # RedM is REALLY closed
+            self._emit("close", now, nickname, announced=st.presence_announced)
+            if st.presence_announced:
+                self._enter_stage("webhook")
+                try:
+                    self.backend.send_message(BED_MESSAGE.format(nickname=nickname))
+                except Exception:
+                    pass
+                self._enter_stage("state")
+
+            # Reset session state ONLY on confirmed close
+            self._reset_session()
+            st.first_seen_running_ts = None
+            st.last_title_scan_ts = 0.0
+            st.redm_pid = None
+            st.redm_create_time = None
+
+            st.closing = False
+            st.closed_hits = 0
+
+        st.was_running = running
+        st.was_in_deadwood = in_deadwood_now
+
+        self._enter_stage("idle")
+        return sleep_for
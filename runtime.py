@@ -0,0 +1,739 @@
+"""
+Asyncio runtime for monitoring.
+
+One event loop thread owns the session: every deadline (grace end, late confirmation,
+title scan interval, close hysteresis all fall out of when the next tick is scheduled,
+and next_deadline() wakes the loop exactly at grace / late-confirm instead of up to a
+full check interval later), webhook delivery (WebhookOutbox task; the requests call
+itself runs in asyncio.to_thread(), on a pool of IO_WORKERS threads) and the loop-side services. Nothing on it blocks on
+the network, the disk or the user.
+
+Everything blocking inside a tick (psutil, EnumWindows / GetWindowText, which can hang
+on a hung window, signal file reads, the checkpoint write and its fsync) runs on one
+observer thread. The loop
+waits for each tick with a stall timeout (the watchdog): a tick slower than the SLO is
+logged with its slowest stage, and one that doesn't finish at all is abandoned, with
+the stage it was stuck in recorded in TickStats. A new observer generation then takes
+over from the state after the last completed tick. The old thread can't be killed, so
+whatever it does when (if) it returns is dropped: its backend, signal and listener
+calls all check the generation first. Recovery is bounded: ticking resumes after a
+backoff that doubles while stalls keep coming, a stalled title scan or signal poll is
+skipped for that RedM process until a later probe answers, and once
+MAX_ABANDONED_OBSERVERS hung threads are still alive no further ones are started (the
+runtime waits for the current one instead). Side effects (webhooks, listeners) are handed
+to the loop, so loop-owned objects are still only touched on the loop.
+
+The Tk thread stays the only thread touching Tk. The runtime reaches it through
+UiBridge, a thread-safe queue drained by root.after(); prompts run there as ordinary
+modal dialogs and their answers come back with loop.call_soon_threadsafe() into
+PresenceMonitor.answer_prompt(). The Tk side reaches the runtime with call() / run().
+Live status goes the other way through StatusFeed, which only ever holds the newest
+snapshot, so a busy or hidden UI can't make the loop wait or pile up memory.
+
+Other loop-side services (status stream, aggregator reporter, hand-off server) are
+objects with async start() / close(), started after the outbox and closed after the
+session, in reverse order.
+
+Shutdown is deterministic: shutdown() stops the session task (checkpoint fsynced,
+signals closed), closes the services, drains the outbox within a timeout, then ends
+the loop and joins its thread.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import queue
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from outbox import WebhookOutbox
+from presence import PROMPT_PENDING, MonitorBackend, PresenceMonitor, PresenceSignal, SessionState
+from tick_watchdog import (MAX_ABANDONED_OBSERVERS, RESTART_BACKOFF_MAX_SEC, RESTART_BACKOFF_SEC,
+                           SKIPPABLE_STAGES, STAGE_SKIP_MAX_SEC, STAGE_SKIP_SEC, STALL_SEC, TICK_SLO_MS,
+                           TickStats)
+
+
+UI_POLL_MS = 50                 # how often the Tk thread drains runtime -> UI calls
+START_TIMEOUT_SEC = 5.0
+OUTBOX_DRAIN_SEC = 5.0          # shutdown waits this long for queued webhooks
+WATCH_INTERVAL_SEC = 1.0        # how often the watchdog looks at the webhook sender
+IO_WORKERS = 2                  # the loop's to_thread() pool (webhook and aggregator requests)
+
+
+class UiBridge:
+    """
+    Runtime -> Tk. call() may be used from any thread; the callable runs on the Tk
+    thread on the next root.after() poll (immediately when already on the Tk thread).
+    """
+
+    def __init__(self, root, poll_ms: int = UI_POLL_MS, log_fn: Callable[[str], None] = lambda msg: None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.log_fn = log_fn
+        self._queue = queue.SimpleQueue()
+        self._ui_thread = threading.get_ident()
+        self._after_id = None
+        self._closed = False
+
+    def start(self) -> "UiBridge":
+        if self._after_id is None and not self._closed:
+            self._after_id = self.root.after(self.poll_ms, self._drain)
+        return self
+
+    def call(self, fn: Callable, *args) -> None:
+        if threading.get_ident() == self._ui_thread:
+            self._run(fn, args)
+        elif not self._closed:
+            self._queue.put((fn, args))
+
+    def _run(self, fn: Callable, args: tuple) -> None:
+        try:
+            fn(*args)
+        except Exception as e:
+            self.log_fn(f"Runtime: UI call {getattr(fn, '__name__', fn)!r} failed: {e}")
+
+    def _drain(self) -> None:
+        self._after_id = None
+        while True:
+            try:
+                fn, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._run(fn, args)
+        if not self._closed:
+            self._after_id = self.root.after(self.poll_ms, self._drain)
+
+    def close(self) -> None:
+        self._closed = True
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+
+class StatusFeed:
+    """
+    Bounded, coalescing runtime -> UI channel: one slot per key, a newer put() replaces
+    what the UI hasn't taken yet. put() never blocks; the UI polls take() at its own
+    (capped) rate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}
+        self.puts = 0
+        self.coalesced = 0  # snapshots replaced before the UI saw them
+
+    def put(self, key: str, value) -> None:
+        with self._lock:
+            if key in self._latest:
+                self.coalesced += 1
+            self._latest[key] = value
+            self.puts += 1
+
+    def take(self) -> dict:
+        with self._lock:
+            latest, self._latest = self._latest, {}
+        return latest
+
+
+class MonitorStalled(Exception):
+    def __init__(self, stage: str, elapsed_sec: float):
+        super().__init__(f"monitor stalled in {stage} for {elapsed_sec:.1f}s")
+        self.stage = stage
+        self.elapsed_sec = elapsed_sec
+
+
+class StaleGeneration(Exception):
+    """Raised into an abandoned observer thread that came back to life."""
+
+
+def _settle(fut: asyncio.Future, ok: bool, result) -> None:
+    if fut.done():
+        return  # abandoned by the watchdog or the session was stopped
+    if ok:
+        fut.set_result(result)
+    else:
+        fut.set_exception(result)
+
+
+class _ObserverThread:
+    """
+    One daemon thread running blocking observation calls in order. A daemon thread
+    rather than an executor, so a call hung forever can't hold up process exit.
+    """
+
+    def __init__(self, name: str):
+        self._jobs = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, loop: asyncio.AbstractEventLoop, fn: Callable) -> asyncio.Future:
+        fut = loop.create_future()
+        self._jobs.put((loop, fut, fn))
+        return fut
+
+    def stop(self) -> None:
+        self._jobs.put(None)  # a hung thread exits when (if) its current call returns
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            loop, fut, fn = job
+            if fut.cancelled():
+                continue  # given up on while queued behind a hung call
+            try:
+                result, ok = fn(), True
+            except BaseException as e:
+                result, ok = e, False
+            try:
+                loop.call_soon_threadsafe(_settle, fut, ok, result)
+            except RuntimeError:
+                return  # loop closed
+
+
+class _GenerationBackend(MonitorBackend):
+    """What one observer generation sees of the real backend."""
+
+    def __init__(self, runtime: "MonitorRuntime", backend: MonitorBackend, generation: int):
+        self.runtime = runtime
+        self.backend = backend
+        self.generation = generation
+
+    def _check(self) -> None:
+        if self.generation != self.runtime.generation:
+            raise StaleGeneration()
+
+    def is_redm_pid(self, pid: int) -> bool:
+        self._check()
+        return self.backend.is_redm_pid(pid)
+
+    def find_redm_pid(self) -> Optional[int]:
+        self._check()
+        return self.backend.find_redm_pid()
+
+    def process_create_time(self, pid: int) -> Optional[float]:
+        self._check()
+        return self.backend.process_create_time(pid)
+
+    def title_contains(self, pid: int, substring: str) -> bool:
+        self._check()
+        if self.runtime._stage_skipped("title_scan", pid):
+            return False
+        found = self.backend.title_contains(pid, substring)
+        self._check()  # a hung call of an abandoned generation returning says nothing about now
+        self.runtime._stage_answered("title_scan")
+        return found
+
+    def ask_announce(self, nickname: str):
+        self._check()
+        return self.backend.ask_announce(nickname)
+
+    def ask_late_confirmation(self, nickname: str):
+        self._check()
+        return self.backend.ask_late_confirmation(nickname)
+
+    def send_message(self, content: str) -> None:
+        self._check()
+        self.runtime._to_loop(self.generation, self.backend.send_message, content)
+
+
+class _GenerationSignal(PresenceSignal):
+    def __init__(self, runtime: "MonitorRuntime", signal: PresenceSignal, generation: int):
+        self.runtime = runtime
+        self.signal = signal
+        self.generation = generation
+        self.name = signal.name
+
+    def poll(self, pid: int, now: float) -> float:
+        if self.generation != self.runtime.generation:
+            raise StaleGeneration()
+        if self.runtime._stage_skipped("signals", pid):
+            return 0.0
+        confidence = self.signal.poll(pid, now)
+        if self.generation != self.runtime.generation:
+            raise StaleGeneration()
+        self.runtime._stage_answered("signals")
+        return confidence
+
+    def close(self) -> None:
+        self.signal.close()
+
+
+class MonitorRuntime:
+    """
+    Owns the event loop thread, the observer thread, the webhook outbox and at most one
+    monitoring session. show_prompt(kind, nickname) -> bool runs on the Tk thread via
+    `ui`; kind is "announce" or "late".
+    """
+
+    def __init__(self, outbox: WebhookOutbox, ui: Optional[UiBridge] = None,
+                 show_prompt: Optional[Callable[[str, str], bool]] = None,
+                 services: Optional[list] = None,
+                 log_fn: Callable[[str], None] = lambda msg: None,
+                 tick_slo_sec: float = TICK_SLO_MS / 1000.0,
+                 stall_sec: float = STALL_SEC):
+        self.outbox = outbox
+        self.outbox.on_dropped = self._webhook_dropped
+        self.services = list(services or [])
+        self.ui = ui
+        self.show_prompt = show_prompt
+        self.log_fn = log_fn
+        self.status_feed = StatusFeed()
+        self.stall_sec = stall_sec
+        self.tick_stats = TickStats(tick_slo_sec, log_fn=log_fn)
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.monitor: Optional[PresenceMonitor] = None
+        self.checkpoint = None
+        self.nickname = ""
+        self.always_notify = False
+        self.generation = 0  # observer generation; bumped per session and per watchdog restart
+
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._session_task: Optional[asyncio.Task] = None
+        self._session_id = 0
+        self._observer: Optional[_ObserverThread] = None
+        self._abandoned = []        # observer threads given up on (may still be hung)
+        self._stalls_in_row = 0     # reset by a completed tick; drives the backoffs
+        self._skipped_stages = {}   # stage -> {"pid", "until" (monotonic)}; touched from the observer
+        self._observe_lock: Optional[asyncio.Lock] = None
+        self._template: Optional[PresenceMonitor] = None  # what the driver passed to start_session()
+        self._last_good: Optional[dict] = None            # session state after the last completed tick
+        self._answer_tasks = set()
+
+    # ===== lifecycle (Tk thread) =====
+    def start(self) -> "MonitorRuntime":
+        if self._thread is not None:
+            return self
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._thread_main, args=(ready,), name="monitor-runtime", daemon=True)
+        self._thread.start()
+        if not ready.wait(START_TIMEOUT_SEC):
+            raise RuntimeError("monitor runtime did not start")
+        return self
+
+    def _thread_main(self, ready: threading.Event) -> None:
+        try:
+            asyncio.run(self._main(ready))
+        except Exception as e:
+            self.log_fn(f"Runtime: event loop crashed: {e}")
+        finally:
+            self.loop = None
+
+    async def _main(self, ready: threading.Event) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.loop.set_default_executor(
+            concurrent.futures.ThreadPoolExecutor(IO_WORKERS, thread_name_prefix="monitor-io"))
+        self._loop_thread_id = threading.get_ident()
+        self._stopping = asyncio.Event()
+        self._observe_lock = asyncio.Lock()
+        self.outbox.start()
+        watch = self.loop.create_task(self._watch_outbox(), name="outbox-watchdog")
+        for service in self.services:
+            try:
+                await service.start()
+            except Exception as e:
+                self.log_fn(f"Runtime: {type(service).__name__} not started: {e}")
+        ready.set()
+
+        await self._stopping.wait()
+        await self._stop_session()
+        watch.cancel()
+        if self._observer is not None:
+            self._observer.stop()
+        t = self.tick_stats.summary()
+        if t["ticks"]:
+            self.log_fn(f"Watchdog: {t['ticks']} ticks, p95 {t['p95_ms']:.1f} ms, max {t['max_ms']:.1f} ms, "
+                        f"{t['slo_breaches']} over the {t['slo_ms']} ms SLO, {t['restarts']} restart(s)")
+        for service in reversed(self.services):
+            try:
+                await service.close()
+            except Exception as e:
+                self.log_fn(f"Runtime: {type(service).__name__} close failed: {e}")
+        await self.outbox.close(timeout=OUTBOX_DRAIN_SEC)
+
+    def shutdown(self, timeout: float = OUTBOX_DRAIN_SEC + 2.0) -> None:
+        """Stop the session, drain the outbox, end the loop and join its thread."""
+        if self._thread is None:
+            return
+        try:
+            self.call(self._stopping.set)
+        except RuntimeError:
+            pass  # loop already gone
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.log_fn("Runtime: event loop did not stop in time")
+        self._thread = None
+        if self.ui is not None:
+            self.ui.close()
+
+    # ===== cross-thread entry points =====
+    def call(self, fn: Callable, *args) -> None:
+        """Run fn(*args) on the loop thread, fire and forget."""
+        if self.loop is None:
+            raise RuntimeError("monitor runtime is not running")
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the loop from another thread and wait for its result."""
+        if self.loop is None:
+            coro.close()
+            raise RuntimeError("monitor runtime is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def configure(self, nickname: str, always_notify: bool) -> None:
+        """Push UI settings to the runtime (the loop never reads Tk variables)."""
+        def apply():
+            self.nickname = nickname
+            self.always_notify = always_notify
+        if self.loop is None:
+            apply()
+        else:
+            self.call(apply)
+
+    def start_session(self, monitor: PresenceMonitor, checkpoint,
+                      saved: Optional[Tuple[SessionState, str, float]] = None,
+                      max_ticks: Optional[int] = None,
+                      on_tick: Optional[Callable[[int], None]] = None) -> concurrent.futures.Future:
+        """
+        Start monitoring; the returned future completes when the session stops.
+        `monitor` is a template: its backend, signals, listeners and timings are used by
+        the observer generations, its state is where the session starts from.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._session(monitor, checkpoint, saved, max_ticks, on_tick), self.loop
+        )
+
+    def stop_session(self, timeout: float = 3.0) -> None:
+        self.run(self._stop_session(), timeout)
+
+    def run_on_observer(self, fn: Callable, timeout: Optional[float] = None):
+        """Run fn() on the observer thread (e.g. to profile ticks) and wait for its result."""
+        return self.run(self._observe(fn), timeout)
+
+    def freeze(self, timeout: float = 3.0) -> Tuple[Optional[dict], list]:
+        """For the upgrade hand-off: stop the session and the sender, return (state, pending messages)."""
+        return self.run(self.freeze_on_loop(), timeout)
+
+    def thaw(self, pending: list) -> None:
+        """Undo freeze() after an aborted hand-off (the session is restarted by the caller)."""
+        def apply():
+            self.outbox.put_back(pending)
+            self.outbox.start()
+        self.call(apply)
+
+    # ===== loop side =====
+    @property
+    def session_running(self) -> bool:
+        return self._session_task is not None and not self._session_task.done()
+
+    async def _session(self, template: PresenceMonitor, checkpoint, saved, max_ticks, on_tick) -> int:
+        await self._stop_session()
+        self.checkpoint = checkpoint
+        self._session_task = asyncio.current_task()
+        self._session_id += 1
+        self._template = template
+        self._last_good = template.state.to_dict()
+        monitor = self._new_generation(template.state)
+        ticks = 0
+        try:
+            if saved is not None:
+                saved_state, saved_nickname, saved_at = saved
+                self._last_good = dict(saved_state.to_dict(), prompt_pending=None)
+                try:
+                    outcome = await self._observe(
+                        functools.partial(monitor.resume, saved_state, saved_nickname or self.nickname, saved_at))
+                    self._last_good = monitor.state.to_dict()
+                    if outcome != "fresh":
+                        self.log_fn(f"Checkpoint: session {outcome} (pid={saved_state.redm_pid}, "
+                                    f"announced={saved_state.presence_announced})")
+                except MonitorStalled:
+                    pass  # the next tick reconciles the saved pid
+                monitor = self.monitor
+
+            while True:
+                started = time.perf_counter()
+                try:
+                    sleep_for = await self._observe(functools.partial(
+                        self._tick, self.generation, monitor, checkpoint, self.nickname, self.always_notify))
+                except MonitorStalled:
+                    monitor = self.monitor  # restarted from the last good state (or still waiting)
+                    await asyncio.sleep(min(RESTART_BACKOFF_MAX_SEC,
+                                            RESTART_BACKOFF_SEC * 2 ** (self._stalls_in_row - 1)))
+                    continue
+                self._stalls_in_row = 0
+                self.tick_stats.record(time.perf_counter() - started, monitor.stage_times)
+                self._last_good = monitor.state.to_dict()
+
+                ticks += 1
+                if on_tick is not None:
+                    on_tick(ticks)
+                if max_ticks is not None and ticks >= max_ticks:
+                    self._publish_status(monitor)
+                    break
+
+                deadline = monitor.next_deadline()
+                if deadline is not None:
+                    sleep_for = min(sleep_for, max(0.0, deadline - monitor.clock()))
+                self._publish_status(monitor, next_tick_sec=sleep_for)
+                await asyncio.sleep(sleep_for)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.log_fn(f"Runtime: monitoring stopped by an error: {e}")
+            raise
+        finally:
+            if self._session_task is asyncio.current_task():
+                self._session_task = None
+            self.monitor.stop(self.nickname)
+            self.generation += 1  # a tick still running on the observer has nothing more to say
+            self.status_feed.put("monitor", None)
+            checkpoint.close()
+            for signal in template.signals:
+                try:
+                    signal.close()
+                except Exception:
+                    pass
+        return ticks
+
+    def _tick(self, generation: int, monitor: PresenceMonitor, checkpoint, nickname: str,
+              always_notify: bool) -> float:
+        """Observer thread: one tick, then the checkpoint write (so its fsync stays off the loop)."""
+        sleep_for = monitor.tick(nickname, always_notify)
+        self._save_checkpoint(generation, monitor, checkpoint, nickname)
+        return sleep_for
+
+    def _save_checkpoint(self, generation: int, monitor: PresenceMonitor, checkpoint, nickname: str) -> None:
+        """Observer thread; an abandoned generation must not write over its successor's state."""
+        if generation != self.generation:
+            raise StaleGeneration()
+        checkpoint.save(monitor.state, nickname)
+
+    def _new_generation(self, state: SessionState) -> PresenceMonitor:
+        """PresenceMonitor for the current session starting from state; earlier generations go stale."""
+        self.generation += 1
+        gen = self.generation
+        t = self._template
+        self.monitor = PresenceMonitor(
+            _GenerationBackend(self, t.backend, gen),
+            check_idle_sec=t.check_idle_sec,
+            check_active_sec=t.check_active_sec,
+            required_hits=t.required_hits,
+            grace_sec=t.grace_sec,
+            clock=t.clock,
+            state=state,
+            signals=[_GenerationSignal(self, signal, gen) for signal in t.signals],
+            # The checkpoint hears about events right away, so the save after this tick fsyncs them
+            listeners=[functools.partial(self._checkpoint_event, gen)]
+                      + [functools.partial(self._to_loop, gen, listener) for listener in t.listeners],
+        )
+        return self.monitor
+
+    def _checkpoint_event(self, generation: int, event: dict) -> None:
+        """Observer thread, before the save that follows the tick or answer that emitted event."""
+        checkpoint = self.checkpoint
+        if generation == self.generation and checkpoint is not None:
+            checkpoint.record_event(event)
+
+    async def _observe(self, fn: Callable):
+        """Run fn() on the observer thread; restart the observer if it doesn't come back in stall_sec."""
+        async with self._observe_lock:
+            if self._observer is None:
+                self._observer = _ObserverThread(f"monitor-observer-{self.generation}")
+            job = self._observer.submit(self.loop, fn)
+            try:
+                return await asyncio.wait_for(asyncio.shield(job), self.stall_sec)
+            except asyncio.TimeoutError:
+                monitor = self.monitor
+                if monitor is not None:
+                    stalled = MonitorStalled(monitor.stage, time.perf_counter() - monitor.stage_started)
+                else:
+                    stalled = MonitorStalled("idle", self.stall_sec)
+                self._recover(stalled)
+                raise stalled
+            finally:
+                if not job.done():
+                    job.cancel()
+
+    def _recover(self, stalled: MonitorStalled) -> None:
+        self._stalls_in_row += 1
+        self._skip_stage(stalled.stage)
+        self._abandoned = [observer for observer in self._abandoned if observer.alive]
+        restart = len(self._abandoned) < MAX_ABANDONED_OBSERVERS
+        self.tick_stats.stall(stalled.stage, stalled.elapsed_sec, self.generation, restarted=restart)
+        if not restart:
+            # Keep this observer (and generation); later calls queue behind the hung one
+            self.log_fn(f"Watchdog: monitor stalled in {stalled.stage} for {stalled.elapsed_sec:.1f}s and "
+                        f"{len(self._abandoned)} earlier observers are still hung; waiting instead of restarting")
+            return
+        self.log_fn(f"Watchdog: monitor stalled in {stalled.stage} for {stalled.elapsed_sec:.1f}s "
+                    f"(observer generation {self.generation}); restarting it from the last completed tick")
+        self._observer.stop()
+        self._abandoned.append(self._observer)
+        self._observer = None  # the next _observe() starts a fresh thread
+        if self.session_running:
+            self._publish_status(self._new_generation(SessionState.from_dict(self._last_good)))
+        else:
+            self.generation += 1
+
+    def _skip_stage(self, stage: str) -> None:
+        monitor = self.monitor
+        pid = monitor.state.redm_pid if monitor is not None else None
+        if stage not in SKIPPABLE_STAGES or pid is None:
+            return
+        skip_sec = min(STAGE_SKIP_MAX_SEC, STAGE_SKIP_SEC * 2 ** (self._stalls_in_row - 1))
+        self._skipped_stages[stage] = {"pid": pid, "until": time.monotonic() + skip_sec}
+        self.log_fn(f"Watchdog: skipping {stage} for pid {pid} for {skip_sec:.0f}s, then probing it again")
+
+    def _stage_skipped(self, stage: str, pid: int) -> bool:
+        """Observer thread: is `stage` still being skipped for `pid`? Past the deadline the call is a probe."""
+        skip = self._skipped_stages.get(stage)
+        return skip is not None and skip["pid"] == pid and time.monotonic() < skip["until"]
+
+    def _stage_answered(self, stage: str) -> None:
+        if self._skipped_stages.pop(stage, None) is not None:
+            self.log_fn(f"Watchdog: {stage} answered again, no longer skipped")
+
+    def _to_loop(self, generation: int, fn: Callable, *args) -> None:
+        """Run a side effect of an observer generation on the loop, unless that generation was abandoned."""
+        def apply():
+            if generation != self.generation:
+                return
+            try:
+                fn(*args)
+            except Exception as e:
+                self.log_fn(f"Runtime: {getattr(fn, '__name__', fn)!r} failed: {e}")
+        if threading.get_ident() == self._loop_thread_id:
+            apply()
+        elif generation == self.generation:
+            try:
+                self.loop.call_soon_threadsafe(apply)
+            except RuntimeError:
+                pass  # loop closed
+
+    async def _watch_outbox(self) -> None:
+        """The webhook sender has its own timeouts; this catches a send that outlives them anyway."""
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL_SEC)
+            since = self.outbox.sending_since
+            if since is None:
+                continue
+            elapsed = time.monotonic() - since
+            if elapsed < self.stall_sec:
+                continue
+            self.tick_stats.stall("webhook", elapsed, self.generation)
+            self.log_fn(f"Watchdog: webhook send stalled for {elapsed:.1f}s; restarting the sender "
+                        f"({self.outbox.depth()} message(s) kept queued)")
+            await self.outbox.stop()
+            self.outbox.start()
+
+    def _publish_status(self, monitor: PresenceMonitor, next_tick_sec: float = 0.0) -> None:
+        snapshot = monitor.snapshot()
+        snapshot["webhook_queue"] = self.outbox.depth()
+        snapshot["ts"] = time.time()
+        snapshot["next_tick_sec"] = next_tick_sec
+        snapshot["stall_sec"] = self.stall_sec
+        snapshot["ticks"] = self.tick_stats.summary()
+        self.status_feed.put("monitor", snapshot)
+
+    async def _stop_session(self) -> None:
+        task = self._session_task
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._session_task = None
+
+    async def freeze_on_loop(self) -> Tuple[Optional[dict], list]:
+        """freeze() for callers already on the loop (the hand-off server service)."""
+        was_running = self.session_running
+        await self._stop_session()
+        await self.outbox.stop()
+        state = self._last_good if was_running else None
+        return state, self.outbox.take_pending()
+
+    # ===== prompts =====
+    def request_prompt(self, kind: str, nickname: str) -> str:
+        """Called by the backend on the observer thread: show the prompt on the Tk thread, answer arrives later."""
+        if self.ui is None or self.show_prompt is None:
+            raise RuntimeError("no UI to ask")
+        self.ui.call(self._prompt_on_ui, self._session_id, kind, nickname)
+        return PROMPT_PENDING
+
+    def _prompt_on_ui(self, session_id: int, kind: str, nickname: str) -> None:
+        try:
+            answer = bool(self.show_prompt(kind, nickname))
+        except Exception as e:
+            self.log_fn(f"Runtime: {kind} prompt failed: {e}")
+            answer = None
+        try:
+            self.call(self._deliver_answer, session_id, kind, answer, nickname)
+        except RuntimeError:
+            pass  # shutting down; the checkpoint still says undecided
+
+    def _deliver_answer(self, session_id: int, kind: str, answer: Optional[bool], nickname: str) -> None:
+        if session_id != self._session_id or not self.session_running:
+            return
+        task = self.loop.create_task(self._apply_answer(session_id, kind, answer, nickname))
+        self._answer_tasks.add(task)
+        task.add_done_callback(self._answer_tasks.discard)
+
+    async def _apply_answer(self, session_id: int, kind: str, answer: Optional[bool], nickname: str) -> None:
+        # on the observer too: answer_prompt() must not run while a tick is half done
+        monitor = self.monitor
+        try:
+            accepted = await self._observe(functools.partial(
+                self._then_save, self.generation, monitor, self.checkpoint, self.nickname,
+                functools.partial(monitor.answer_prompt, kind, answer, nickname)))
+        except (MonitorStalled, StaleGeneration):
+            return
+        if session_id != self._session_id or not self.session_running:
+            return
+        if not accepted:
+            self.log_fn(f"Runtime: ignored {kind} answer for a session that already ended")
+            return
+        self._last_good = monitor.state.to_dict()
+        self._publish_status(monitor)
+
+    def _then_save(self, generation: int, monitor: PresenceMonitor, checkpoint, nickname: str,
+                   fn: Callable[[], bool]) -> bool:
+        """Observer thread: fn() may change the session state; checkpoint it if it did."""
+        changed = fn()
+        if changed:
+            self._save_checkpoint(generation, monitor, checkpoint, nickname)
+        return changed
+
+    def _webhook_dropped(self, content: str) -> None:
+        """Outbox callback (loop thread): an undelivered announcement un-announces the session."""
+        if not self.session_running or self.monitor is None:
+            return
+        task = self.loop.create_task(self._apply_dropped(self._session_id, content))
+        self._answer_tasks.add(task)
+        task.add_done_callback(self._answer_tasks.discard)
+
+    async def _apply_dropped(self, session_id: int, content: str) -> None:
+        monitor = self.monitor
+        try:
+            changed = await self._observe(functools.partial(
+                self._then_save, self.generation, monitor, self.checkpoint, self.nickname,
+                functools.partial(monitor.message_dropped, content, self.nickname)))
+        except (MonitorStalled, StaleGeneration):
+            return
+        if not changed or session_id != self._session_id or not self.session_running:
+            return
+        self.log_fn('Webhook: announcement was never delivered; no "went to bed" will follow')
+        self._last_good = monitor.state.to_dict()
+        self._publish_status(monitor)
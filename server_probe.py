@@ -0,0 +1,266 @@
+"""
+Per-PID remote-endpoint probe.
+
+Maps RedM's own TCP connections to the configured Deadwood server endpoints. Instead
+of a machine-wide psutil.net_connections() on every tick, it asks for RedM's
+connections only and caches the result for a refresh interval. Host names are
+resolved on a much slower schedule, on a short-lived background thread, so a slow
+DNS server never holds up a tick (IP literals need no lookup at all). The outcome is
+a confidence-scored PresenceSignal next to the window title matcher.
+
+Game traffic itself is UDP, but RedM's UDP socket is unconnected: psutil reports it
+with an empty remote address, so it can't be tied to a server and isn't scored.
+
+    python server_probe.py --bench     # cost with thousands of sockets
+"""
+import argparse
+import ipaddress
+import random
+import socket
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from presence import PresenceSignal
+
+
+REFRESH_INTERVAL_SEC = 15.0       # how often RedM's connection table is re-read
+RESOLVE_INTERVAL_SEC = 10 * 60.0  # how often server host names are re-resolved
+
+CONFIDENCE_TCP_EXACT = 0.8        # connection to the server's ip:port
+CONFIDENCE_IP_ONLY = 0.5          # same host, other port
+
+# Shape of the fields we use from psutil's sconn (also used for synthetic tables);
+# like psutil, raddr is () for sockets without a remote address (listening, unconnected UDP)
+Addr = namedtuple("Addr", "ip port")
+Conn = namedtuple("Conn", "type status raddr")
+
+
+def _psutil_connections(pid: int) -> list:
+    import psutil  # only needed for the real lookup
+
+    proc = psutil.Process(pid)
+    if hasattr(proc, "net_connections"):  # psutil >= 6.0
+        return proc.net_connections(kind="inet")
+    return proc.connections(kind="inet")
+
+
+def parse_endpoint(text: str) -> Optional[Tuple[str, Optional[int]]]:
+    """'host', 'host:port', '[v6]:port' -> (host, port or None). Names with spaces are not endpoints."""
+    text = (text or "").strip()
+    if not text or " " in text:
+        return None
+    if text.startswith("["):
+        host, _, rest = text[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif text.count(":") == 1:
+        host, _, port = text.partition(":")
+    else:
+        host, port = text, ""
+    if port and not port.isdigit():
+        return None
+    return host, (int(port) if port else None)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _targets(endpoints: List[Tuple[str, Optional[int]]], resolve: Callable[[str], List[str]],
+             into: Optional[Dict[str, Set[int]]] = None) -> Dict[str, Set[int]]:
+    """ip -> ports configured for it (empty set = any port)."""
+    targets = into if into is not None else {}
+    for host, port in endpoints:
+        for ip in resolve(host):
+            any_port = ip in targets and not targets[ip]
+            ports = targets.setdefault(ip, set())
+            if port is None:
+                ports.clear()
+            elif not any_port:
+                ports.add(port)
+    return targets
+
+
+class ServerProbeSignal(PresenceSignal):
+    name = "server_probe"
+
+    def __init__(
+        self,
+        endpoints: List[str],
+        refresh_sec: float = REFRESH_INTERVAL_SEC,
+        resolve_sec: float = RESOLVE_INTERVAL_SEC,
+        connections_fn: Callable[[int], list] = _psutil_connections,
+        resolve_fn: Callable[[str], List[str]] = None,
+    ):
+        self.endpoints = [ep for ep in (parse_endpoint(e) for e in endpoints) if ep is not None]
+        self.refresh_sec = refresh_sec
+        self.resolve_sec = resolve_sec
+        self.connections_fn = connections_fn
+        self.resolve_fn = resolve_fn or self._resolve
+
+        self._literal = [(h, p) for h, p in self.endpoints if _is_ip(h)]
+        self._names = [(h, p) for h, p in self.endpoints if not _is_ip(h)]
+        # ip -> ports configured for it (empty set = any port); replaced as a whole by the resolver
+        self._targets: Dict[str, Set[int]] = _targets(self._literal, lambda host: [host])
+        self._resolved_at = float("-inf")
+        self._resolver: Optional[threading.Thread] = None
+
+        self._pid: Optional[int] = None
+        self._refreshed_at = float("-inf")
+        self.confidence = 0.0
+        self.matched_endpoint: Optional[str] = None
+        self.last_refresh_sec = 0.0   # duration of the last connection table read
+        self.last_socket_count = 0
+
+    @staticmethod
+    def _resolve(host: str) -> List[str]:
+        try:
+            return sorted({info[4][0] for info in socket.getaddrinfo(host, None)})
+        except OSError:
+            return []
+
+    def _refresh_targets(self, now: float) -> None:
+        """Start re-resolving host names in the background; the current targets stay in use meanwhile."""
+        self._resolved_at = now
+        if not self._names or (self._resolver is not None and self._resolver.is_alive()):
+            return
+        self._resolver = threading.Thread(target=self._resolve_names, name="server-probe-resolve", daemon=True)
+        self._resolver.start()
+
+    def _resolve_names(self) -> None:
+        targets = _targets(self._literal, lambda host: [host])
+        try:
+            self._targets = _targets(self._names, self.resolve_fn, into=targets)
+        except Exception:
+            pass  # keep the previous targets, try again next interval
+
+    def wait_resolved(self, timeout: Optional[float] = None) -> None:
+        """Wait for a background resolution in progress (tests, benchmarks)."""
+        if self._resolver is not None:
+            self._resolver.join(timeout)
+
+    def score(self, connections: list) -> Tuple[float, Optional[str]]:
+        best, best_ep = 0.0, None
+        targets = self._targets
+        for c in connections:
+            raddr = c.raddr
+            if not raddr:
+                continue
+            ports = targets.get(raddr.ip)
+            if ports is None:
+                continue
+            if c.type != socket.SOCK_STREAM or c.status != "ESTABLISHED":
+                continue
+            conf = CONFIDENCE_TCP_EXACT if (not ports or raddr.port in ports) else CONFIDENCE_IP_ONLY
+            if conf > best:
+                best, best_ep = conf, f"{raddr.ip}:{raddr.port}"
+                if best >= CONFIDENCE_TCP_EXACT:
+                    break
+        return best, best_ep
+
+    def poll(self, pid: int, now: float) -> float:
+        if not self.endpoints:
+            return 0.0
+
+        if (now - self._resolved_at) >= self.resolve_sec:
+            self._refresh_targets(now)
+
+        if pid == self._pid and (now - self._refreshed_at) < self.refresh_sec:
+            return self.confidence
+
+        self._pid = pid
+        self._refreshed_at = now
+        t0 = time.perf_counter()
+        try:
+            connections = self.connections_fn(pid)
+        except Exception:
+            connections = []
+        self.confidence, self.matched_endpoint = self.score(connections)
+        self.last_refresh_sec = time.perf_counter() - t0
+        self.last_socket_count = len(connections)
+        return self.confidence
+
+
+# ===== benchmark =====
+def synthetic_connections(count: int, server: Optional[Tuple[str, int]] = None, seed: int = 1) -> list:
+    """
+    A RedM-like socket table as psutil reports it: mostly TCP to CDNs/Discord/etc, some
+    unconnected UDP (empty raddr), optionally a TCP connection to the server.
+    """
+    rng = random.Random(seed)
+    conns = []
+    for _ in range(count):
+        ip = f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        if rng.random() < 0.8:
+            conns.append(Conn(socket.SOCK_STREAM, "ESTABLISHED", Addr(ip, rng.choice((443, 80, 30120)))))
+        else:
+            conns.append(Conn(socket.SOCK_DGRAM, "NONE", ()))
+    if server is not None:
+        conns.insert(rng.randint(0, len(conns)), Conn(socket.SOCK_STREAM, "ESTABLISHED", Addr(*server)))
+    return conns
+
+
+def benchmark(socket_counts=(100, 1000, 5000, 20000), ticks: int = 2000, tick_sec: float = 3.0) -> List[dict]:
+    server = ("203.0.113.7", 30120)
+    results = []
+    for count in socket_counts:
+        table = synthetic_connections(count, server)
+        probe = ServerProbeSignal(
+            [f"{server[0]}:{server[1]}"],
+            connections_fn=lambda pid, t=table: t,
+            resolve_fn=lambda host: [host],
+        )
+
+        # Cold: every call re-reads and scores the full table (what a per-tick lookup would cost)
+        t0 = time.perf_counter()
+        for _ in range(50):
+            probe.score(table)
+        cold = (time.perf_counter() - t0) / 50
+
+        # Cached: realistic ticks, table re-read once per refresh interval
+        now = 0.0
+        t0 = time.perf_counter()
+        for _ in range(ticks):
+            probe.poll(1234, now)
+            now += tick_sec
+        cached = (time.perf_counter() - t0) / ticks
+
+        results.append({"sockets": count, "full_scan_us": cold * 1e6, "per_tick_us": cached * 1e6,
+                        "confidence": probe.confidence})
+    return results
+
+
+def _machine_wide_cost(samples: int = 5) -> Optional[float]:
+    try:
+        import psutil
+    except Exception:
+        return None
+    try:
+        t0 = time.perf_counter()
+        for _ in range(samples):
+            psutil.net_connections(kind="inet")
+        return (time.perf_counter() - t0) / samples
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server identification probe")
+    parser.add_argument("--bench", action="store_true", help="benchmark the probe on synthetic socket tables")
+    parser.add_argument("--sockets", type=int, nargs="*", default=[100, 1000, 5000, 20000])
+    args = parser.parse_args()
+
+    if args.bench:
+        print(f"{'sockets':>8} {'full scan us':>13} {'per tick us':>12} {'confidence':>11}")
+        for r in benchmark(tuple(args.sockets)):
+            print(f"{r['sockets']:8d} {r['full_scan_us']:13.1f} {r['per_tick_us']:12.2f} {r['confidence']:11.2f}")
+        wide = _machine_wide_cost()
+        if wide is not None:
+            print(f"\nfor comparison, psutil.net_connections() on this machine: {wide * 1e3:.1f} ms per call")
+    else:
+        parser.print_help()
@@ -0,0 +1,288 @@
+"""
+Long-run soak harness for the presence monitor.
+
+Drives PresenceMonitor through simulated weeks of RedM sessions on a fake clock and
+fake backends, sampling RSS, live object count, thread count and open handles as it
+goes. Exits non-zero when growth between the warm-up baseline and the end of the run
+goes over the configured thresholds.
+
+    python soak.py                    # 4 simulated weeks, fake backends (any OS)
+    python soak.py --weeks 12 --seed 7
+    python soak.py --native           # Windows: also exercise the real title scan,
+                                      # psutil.Process lookups and Tk interpreters
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import threading
+import time
+from typing import Optional
+
+from presence import MonitorBackend, PresenceMonitor
+
+try:
+    import psutil
+except Exception:  # the harness also runs on bare CI boxes
+    psutil = None
+
+
+DAY_SEC = 24 * 60 * 60
+WEEK_SEC = 7 * DAY_SEC
+
+
+class SimulatedClock:
+    def __init__(self, start: float = 1_700_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class SimulatedRedM(MonitorBackend):
+    """
+    Fake process table + window titles + prompts + webhook, following a random but
+    reproducible schedule of play sessions. Only counters are kept, never histories,
+    so the harness itself stays flat.
+    """
+
+    def __init__(self, clock: SimulatedClock, rng: random.Random):
+        self.clock = clock
+        self.rng = rng
+        self.pid: Optional[int] = None
+        self.next_pid = 4000
+        self.session_end = 0.0
+        self.deadwood_at: Optional[float] = None
+        self.next_start = clock() + rng.uniform(60, 3 * 60 * 60)
+
+        self.sessions = 0
+        self.prompts = 0
+        self.messages = 0
+        self.title_scans = 0
+        self.process_scans = 0
+
+    def advance(self) -> None:
+        now = self.clock()
+        if self.pid is not None and now >= self.session_end:
+            self.pid = None
+            self.next_start = now + self.rng.uniform(20 * 60, 14 * 60 * 60)
+        elif self.pid is None and now >= self.next_start:
+            self.sessions += 1
+            self.next_pid += self.rng.randint(4, 400)
+            self.pid = self.next_pid
+            self.session_end = now + self.rng.uniform(10 * 60, 6 * 60 * 60)
+            # ~1 in 5 sessions hit the RedM title bug and never show "Deadwood County"
+            if self.rng.random() < 0.8:
+                self.deadwood_at = now + self.rng.uniform(90, 20 * 60)
+            else:
+                self.deadwood_at = None
+
+    def _flicker(self) -> bool:
+        # The process table occasionally misses RedM for a single check
+        return self.rng.random() < 0.002
+
+    def is_redm_pid(self, pid: int) -> bool:
+        return self.pid is not None and pid == self.pid and not self._flicker()
+
+    def find_redm_pid(self) -> Optional[int]:
+        self.process_scans += 1
+        if self.pid is None or self._flicker():
+            return None
+        return self.pid
+
+    def title_contains(self, pid: int, substring: str) -> bool:
+        self.title_scans += 1
+        return self.deadwood_at is not None and self.clock() >= self.deadwood_at
+
+    def ask_announce(self, nickname: str) -> bool:
+        self.prompts += 1
+        return self.rng.random() < 0.7
+
+    def ask_late_confirmation(self, nickname: str) -> bool:
+        self.prompts += 1
+        return self.rng.random() < 0.5
+
+    def send_message(self, content: str) -> None:
+        self.messages += 1
+        if self.rng.random() < 0.05:
+            raise RuntimeError("simulated webhook failure")
+
+
+class NativeRedM(SimulatedRedM):
+    """
+    Same schedule as SimulatedRedM, but every call also does the real Windows work the
+    app does per tick (psutil.Process objects, EnumWindows callback + buffers, Tk
+    interpreter per prompt) so leaks in those paths show up in the samples.
+    """
+
+    def __init__(self, clock: SimulatedClock, rng: random.Random):
+        super().__init__(clock, rng)
+        import main as app_main  # Windows only
+        self.app_main = app_main
+        self.my_pid = os.getpid()
+
+    def is_redm_pid(self, pid: int) -> bool:
+        try:
+            psutil.Process(self.my_pid).name()
+        except Exception:
+            pass
+        return super().is_redm_pid(pid)
+
+    def find_redm_pid(self) -> Optional[int]:
+        for p in psutil.process_iter(["pid", "name"]):
+            p.info.get("name")
+        return super().find_redm_pid()
+
+    def title_contains(self, pid: int, substring: str) -> bool:
+        self.app_main.any_window_title_contains_for_pid(self.my_pid, substring)
+        return super().title_contains(pid, substring)
+
+    def _touch_tk(self) -> None:
+        temp = self.app_main.tk.Tk()
+        temp.withdraw()
+        temp.attributes("-topmost", True)
+        temp.destroy()
+
+    def ask_announce(self, nickname: str) -> bool:
+        self._touch_tk()
+        return super().ask_announce(nickname)
+
+    def ask_late_confirmation(self, nickname: str) -> bool:
+        self._touch_tk()
+        return super().ask_late_confirmation(nickname)
+
+
+def _rss_bytes() -> int:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+def _open_handles() -> int:
+    if psutil is not None:
+        proc = psutil.Process()
+        if hasattr(proc, "num_handles"):
+            return proc.num_handles()
+        return proc.num_fds()
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except Exception:
+        return 0
+
+
+def take_sample(sim_seconds: float) -> dict:
+    gc.collect()
+    return {
+        "sim_days": sim_seconds / DAY_SEC,
+        "rss_mb": _rss_bytes() / (1024 * 1024),
+        "objects": len(gc.get_objects()),
+        "threads": threading.active_count(),
+        "handles": _open_handles(),
+    }
+
+
+def check_growth(baseline: dict, final: dict, args) -> list:
+    failures = []
+    rss_growth = final["rss_mb"] - baseline["rss_mb"]
+    if rss_growth > args.max_rss_growth_mb:
+        failures.append(f"RSS grew {rss_growth:.1f} MB (limit {args.max_rss_growth_mb} MB)")
+
+    obj_limit = baseline["objects"] * args.max_object_growth_pct / 100.0
+    obj_growth = final["objects"] - baseline["objects"]
+    if obj_growth > obj_limit:
+        failures.append(f"live objects grew by {obj_growth} (limit {obj_limit:.0f})")
+
+    thread_growth = final["threads"] - baseline["threads"]
+    if thread_growth > args.max_thread_growth:
+        failures.append(f"threads grew by {thread_growth} (limit {args.max_thread_growth})")
+
+    handle_growth = final["handles"] - baseline["handles"]
+    if handle_growth > args.max_handle_growth:
+        failures.append(f"open handles grew by {handle_growth} (limit {args.max_handle_growth})")
+    return failures
+
+
+def run_soak(args) -> int:
+    rng = random.Random(args.seed)
+    clock = SimulatedClock()
+    backend_cls = NativeRedM if args.native else SimulatedRedM
+    backend = backend_cls(clock, rng)
+    monitor = PresenceMonitor(backend, clock=clock)
+
+    start = clock()
+    total = args.weeks * WEEK_SEC
+    warmup = min(DAY_SEC, total / 10)
+    sample_every = args.sample_hours * 60 * 60
+
+    baseline = None
+    samples = []
+    next_sample = start + warmup
+    ticks = 0
+    wall_start = time.perf_counter()
+
+    print(f"{'day':>7} {'rss MB':>9} {'objects':>9} {'threads':>8} {'handles':>8}")
+    while clock() - start < total:
+        backend.advance()
+        sleep_for = monitor.tick("Soak Tester", always_notify=rng.random() < 0.1)
+        clock.advance(sleep_for)
+        ticks += 1
+
+        if clock() >= next_sample:
+            sample = take_sample(clock() - start)
+            if baseline is None:
+                baseline = sample
+            samples.append(sample)
+            print(
+                f"{sample['sim_days']:7.2f} {sample['rss_mb']:9.1f} {sample['objects']:9d} "
+                f"{sample['threads']:8d} {sample['handles']:8d}"
+            )
+            next_sample += sample_every
+
+    final = take_sample(clock() - start)
+    if baseline is None:
+        baseline = final
+
+    wall = time.perf_counter() - wall_start
+    print(
+        f"\n{ticks} ticks over {args.weeks} simulated week(s) in {wall:.1f}s wall: "
+        f"{backend.sessions} sessions, {backend.prompts} prompts, {backend.messages} messages, "
+        f"{backend.title_scans} title scans, {backend.process_scans} process scans"
+    )
+
+    failures = check_growth(baseline, final, args)
+    if failures:
+        print("SOAK FAILED:")
+        for f in failures:
+            print(f"  - {f}")
+        return 1
+
+    print("SOAK OK: memory, objects, threads and handles stayed flat")
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Soak test the Deadwood presence monitor")
+    parser.add_argument("--weeks", type=float, default=4, help="simulated weeks to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sample-hours", type=float, default=12, help="simulated hours between samples")
+    parser.add_argument("--native", action="store_true", help="also run the real Windows per-tick calls")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=8.0)
+    parser.add_argument("--max-object-growth-pct", type=float, default=2.0)
+    parser.add_argument("--max-thread-growth", type=int, default=0)
+    parser.add_argument("--max-handle-growth", type=int, default=8)
+    args = parser.parse_args(argv)
+    if args.native and (sys.platform != "win32" or psutil is None):
+        parser.error("--native needs Windows with psutil installed")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(run_soak(parse_args()))
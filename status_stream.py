@@ -0,0 +1,368 @@
+"""
+Localhost push status stream for overlays and bots.
+
+StatusStream is a PresenceMonitor listener that turns session events into one of
+three states and pushes every change, as compact JSON, to any number of local
+subscribers:
+
+    offline       RedM not running (or monitoring stopped)
+    in_game       RedM running, not in Deadwood
+    in_deadwood   in Deadwood (stable title / signal hit, or presence announced)
+
+    {"seq": 12, "ts": 1760000000.0, "state": "in_deadwood", "nickname": "Ezekiel",
+     "announced": true, "pid": 4242, "event": "announce"}
+
+Transports, all bound to this machine only:
+    GET http://127.0.0.1:PORT/events   server-sent events (EventSource in OBS browser sources)
+    GET ws://127.0.0.1:PORT/ws         WebSocket, one text frame per update
+    GET http://127.0.0.1:PORT/status   current state once, as JSON
+    \\\\.\\pipe\\DeadwoodPresence         named pipe (a Unix socket on other platforms),
+                                       newline-delimited JSON
+
+Browsers may only subscribe from a file:// page (Origin "null"), a page on this
+stream's own host:port, or an origin passed in allowed_origins; requests with any
+other Origin header are refused, so an arbitrary website can't follow the player.
+Clients that send no Origin (OBS, curl, bots) are always served.
+
+Every subscriber gets the current state on connect. It runs on the monitor runtime's
+event loop: publish() only appends to each subscriber's bounded buffer, and each
+subscriber has its own writer task, so a slow consumer loses intermediate updates
+(seq shows the gap) or gets disconnected instead of ever stalling the monitor.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional, Set
+
+
+STATE_OFFLINE = "offline"
+STATE_IN_GAME = "in_game"
+STATE_IN_DEADWOOD = "in_deadwood"
+
+DEFAULT_PORT = 28471
+DEFAULT_PIPE_NAME = "DeadwoodPresence"
+CLIENT_BUFFER = 32          # updates kept per subscriber; older ones are dropped
+MAX_CLIENTS = 256
+KEEPALIVE_SEC = 15.0
+WRITE_TIMEOUT_SEC = 10.0    # a subscriber that can't take a write for this long is dropped
+MAX_REQUEST_BYTES = 8192
+BIND_ATTEMPTS = 3           # the previous build may still be releasing the port after a hand-off
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+
+def default_pipe_path(name: str = DEFAULT_PIPE_NAME) -> str:
+    if sys.platform == "win32":
+        return rf"\\.\pipe\{name}"
+    return os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"{name}.sock")
+
+
+def _ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+class _Subscriber:
+    def __init__(self, kind: str, writer: asyncio.StreamWriter, buffer_size: int):
+        self.kind = kind  # "sse" / "ws" / "pipe"
+        self.writer = writer
+        self.pending = deque(maxlen=buffer_size)
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, data: bytes) -> None:
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(data)
+        self.wakeup.set()
+
+    def encode(self, message: bytes) -> bytes:
+        if self.kind == "sse":
+            return b"data: " + message + b"\n\n"
+        if self.kind == "ws":
+            return _ws_frame(message)
+        return message + b"\n"
+
+    def keepalive(self) -> Optional[bytes]:
+        if self.kind == "sse":
+            return b": ping\n\n"
+        if self.kind == "ws":
+            return _ws_frame(b"", opcode=0x9)
+        return None
+
+
+class StatusStream:
+    def __init__(self, port: int = DEFAULT_PORT, pipe_path: Optional[str] = None,
+                 buffer_size: int = CLIENT_BUFFER, max_clients: int = MAX_CLIENTS,
+                 allowed_origins: Iterable[str] = (),
+                 log_fn: Callable[[str], None] = lambda msg: None, clock=time.time):
+        self.port = port
+        self.allowed_origins = {origin.strip().rstrip("/").lower() for origin in allowed_origins}
+        self.pipe_path = pipe_path
+        self.buffer_size = buffer_size
+        self.max_clients = max_clients
+        self.log_fn = log_fn
+        self.clock = clock
+
+        self.seq = 0
+        self.nickname = ""
+        self.running = False
+        self.in_deadwood = False
+        self.announced = False
+        self.pid = None
+        self.current = self._snapshot("init")
+
+        self._subscribers: Set[_Subscriber] = set()
+        self._servers = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    # ===== state =====
+    @property
+    def state(self) -> str:
+        if not self.running:
+            return STATE_OFFLINE
+        return STATE_IN_DEADWOOD if (self.in_deadwood or self.announced) else STATE_IN_GAME
+
+    def _snapshot(self, event: str) -> dict:
+        return {"seq": self.seq, "ts": round(self.clock(), 3), "state": self.state, "nickname": self.nickname,
+                "announced": self.announced, "pid": self.pid, "event": event}
+
+    def record(self, event: dict) -> None:
+        """PresenceMonitor listener (called on the loop thread)."""
+        kind = event.get("kind")
+        before = (self.state, self.nickname, self.announced, self.pid)
+
+        if kind in ("redm_start", "resume"):
+            self.running = True
+            self.pid = event.get("pid")
+            self.in_deadwood = bool(event.get("in_deadwood", False))
+            self.announced = bool(event.get("announced", False))
+        elif kind == "deadwood_enter":
+            self.in_deadwood = True
+        elif kind == "deadwood_leave":
+            self.in_deadwood = False
+        elif kind == "announce":
+            self.announced = True
+        elif kind in ("close", "stop"):
+            self.running = self.in_deadwood = self.announced = False
+            self.pid = None
+        else:
+            return
+        if event.get("nickname"):
+            self.nickname = event["nickname"]
+
+        if (self.state, self.nickname, self.announced, self.pid) != before:
+            self.seq += 1
+            self.current = self._snapshot(kind)
+            self.publish(self.current)
+
+    def publish(self, message: dict) -> None:
+        data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+        for sub in self._subscribers:
+            sub.push(data)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    # ===== servers =====
+    async def start(self) -> None:
+        if self.port:
+            for attempt in range(BIND_ATTEMPTS):
+                try:
+                    self._servers.append(await asyncio.start_server(self._handle_http, "127.0.0.1", self.port))
+                    self.log_fn(f"Status stream: http://127.0.0.1:{self.port}/events")
+                    break
+                except OSError as e:
+                    if attempt == BIND_ATTEMPTS - 1:
+                        self.log_fn(f"Status stream: port {self.port} unavailable: {e}")
+                    else:
+                        await asyncio.sleep(1.0)
+
+        if self.pipe_path:
+            try:
+                self._servers.extend(await self._start_pipe_server())
+                self.log_fn(f"Status stream: pipe {self.pipe_path}")
+            except Exception as e:
+                self.log_fn(f"Status stream: pipe unavailable: {e}")
+
+    async def _start_pipe_server(self) -> list:
+        if sys.platform == "win32":
+            # Proactor loops only (the default on Windows)
+            loop = asyncio.get_running_loop()
+
+            def factory():
+                return asyncio.StreamReaderProtocol(asyncio.StreamReader(limit=MAX_REQUEST_BYTES), self._handle_pipe)
+
+            return list(await loop.start_serving_pipe(factory, self.pipe_path))
+
+        try:
+            os.unlink(self.pipe_path)  # stale socket from a previous run
+        except OSError:
+            pass
+        server = await asyncio.start_unix_server(self._handle_pipe, self.pipe_path)
+        os.chmod(self.pipe_path, 0o600)
+        return [server]
+
+    async def close(self) -> None:
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.pipe_path and sys.platform != "win32":
+            try:
+                os.unlink(self.pipe_path)
+            except OSError:
+                pass
+
+    # ===== connections =====
+    def _track(self) -> bool:
+        task = asyncio.current_task()
+        if len(self._subscribers) >= self.max_clients:
+            return False
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _serve(self, sub: _Subscriber, reader: Optional[asyncio.StreamReader] = None) -> None:
+        """Writer loop for one subscriber; returns when it disconnects or falls too far behind."""
+        self._subscribers.add(sub)
+        sub.push(json.dumps(self.current, separators=(",", ":")).encode("utf-8"))
+        watcher = asyncio.ensure_future(self._watch_incoming(sub, reader)) if reader is not None else None
+        try:
+            while watcher is None or not watcher.done():
+                if not sub.pending:
+                    sub.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(sub.wakeup.wait(), KEEPALIVE_SEC)
+                    except asyncio.TimeoutError:
+                        ping = sub.keepalive()
+                        if ping:
+                            sub.writer.write(ping)
+                            await asyncio.wait_for(sub.writer.drain(), WRITE_TIMEOUT_SEC)
+                    continue
+                sub.writer.write(sub.encode(sub.pending.popleft()))
+                await asyncio.wait_for(sub.writer.drain(), WRITE_TIMEOUT_SEC)
+        except (ConnectionError, asyncio.TimeoutError, OSError, asyncio.CancelledError):
+            # Cancelled by close(); ending normally keeps asyncio's stream callback quiet
+            pass
+        finally:
+            self._subscribers.discard(sub)
+            if watcher is not None:
+                watcher.cancel()
+            if sub.dropped:
+                self.log_fn(f"Status stream: {sub.kind} subscriber fell behind, {sub.dropped} update(s) skipped")
+            sub.writer.close()
+
+    async def _watch_incoming(self, sub: _Subscriber, reader: asyncio.StreamReader) -> None:
+        """Detect disconnects; for WebSocket also answer pings and close frames."""
+        try:
+            if sub.kind != "ws":
+                while await reader.read(4096):
+                    pass
+                return
+            while True:
+                b1, b2 = await reader.readexactly(2)
+                opcode, length = b1 & 0x0F, b2 & 0x7F
+                if length == 126:
+                    length = struct.unpack("!H", await reader.readexactly(2))[0]
+                elif length == 127:
+                    length = struct.unpack("!Q", await reader.readexactly(8))[0]
+                if length > MAX_REQUEST_BYTES:
+                    return
+                mask = await reader.readexactly(4) if b2 & 0x80 else b"\0\0\0\0"
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(length)))
+                if opcode == 0x8:
+                    sub.writer.write(_ws_frame(payload[:2], opcode=0x8))
+                    return
+                if opcode == 0x9:
+                    sub.writer.write(_ws_frame(payload, opcode=0xA))
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            sub.wakeup.set()  # let the writer loop notice
+
+    async def _handle_pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if not self._track():
+            writer.close()
+            return
+        await self._serve(_Subscriber("pipe", writer, self.buffer_size), reader)
+
+    def _origin_allowed(self, origin: Optional[str]) -> bool:
+        if origin is None:
+            return True
+        origin = origin.rstrip("/").lower()
+        if origin == "null" or origin in self.allowed_origins:
+            return True
+        return origin in {f"http://{host}:{self.port}" for host in _LOCAL_HOSTS}
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if not self._track():
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), WRITE_TIMEOUT_SEC)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError,
+                asyncio.CancelledError):
+            writer.close()
+            return
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        # Only local pages and tools: a foreign Host header means DNS rebinding, not an overlay
+        host = headers.get("host", "")
+        host = host[:host.find("]") + 1] if host.startswith("[") else host.split(":", 1)[0]
+        if len(parts) < 2 or parts[0] != "GET" or host not in _LOCAL_HOSTS:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+
+        # A page from another site must not read the stream (or upgrade to the WebSocket)
+        origin = headers.get("origin")
+        if not self._origin_allowed(origin):
+            writer.write(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+
+        path = parts[1].split("?", 1)[0]
+        cors = f"Access-Control-Allow-Origin: {origin}\r\nVary: Origin\r\n".encode("latin-1") if origin else b""
+        if path == "/status":
+            body = json.dumps(self.current, separators=(",", ":")).encode("utf-8")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n" + cors +
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii") + body)
+            await writer.drain()
+            writer.close()
+        elif path == "/events":
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                         + cors + b"Connection: keep-alive\r\n\r\n")
+            await self._serve(_Subscriber("sse", writer, self.buffer_size), reader)
+        elif path == "/ws" and headers.get("upgrade", "").lower() == "websocket" and headers.get("sec-websocket-key"):
+            accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + _WS_GUID).encode("ascii")).digest())
+            writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+            await self._serve(_Subscriber("ws", writer, self.buffer_size), reader)
+        else:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
@@ -0,0 +1,143 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import presence  # noqa: E402
+from outbox import WebhookOutbox  # noqa: E402
+from presence import MonitorBackend, PresenceMonitor  # noqa: E402
+from runtime import MonitorRuntime  # noqa: E402
+
+
+class FakeBackend(MonitorBackend):
+    """Scriptable RedM: set pid / in_deadwood / answer, read back prompts and messages."""
+
+    def __init__(self, pid: Optional[int] = 4242, in_deadwood: bool = False, answer=True):
+        self.pid = pid
+        self.create_time = 1000.0
+        self.in_deadwood = in_deadwood
+        self.answer = answer
+        self.prompts = []
+        self.messages = []
+        self.title_scans = 0
+        self.hang_titles: Optional[threading.Event] = None  # title scans block until this is set
+
+    def is_redm_pid(self, pid):
+        return pid is not None and pid == self.pid
+
+    def find_redm_pid(self):
+        return self.pid
+
+    def process_create_time(self, pid):
+        return self.create_time if pid == self.pid else None
+
+    def title_contains(self, pid, substring):
+        self.title_scans += 1
+        if self.hang_titles is not None:
+            self.hang_titles.wait()
+        return self.in_deadwood
+
+    def ask_announce(self, nickname):
+        self.prompts.append("announce")
+        return self.answer
+
+    def ask_late_confirmation(self, nickname):
+        self.prompts.append("late")
+        return self.answer
+
+    def send_message(self, content):
+        self.messages.append(content)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, sec: float) -> None:
+        self.now += sec
+
+
+def pytest_addoption(parser):
+    parser.addoption("--bench", action="store_true", help="also run the benchmarks against bench_baseline.json")
+    parser.addoption("--bench-tolerance", type=float, default=None,
+                     help="allowed slowdown for --bench (default: bench.DEFAULT_TOLERANCE)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "bench: timing benchmark, only run with --bench")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Wall-clock comparisons don't belong in the unit run: they depend on the machine and its load
+    if config.getoption("--bench"):
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with --bench")
+    for item in items:
+        if "bench" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def bench_tolerance(request):
+    import bench
+
+    tolerance = request.config.getoption("--bench-tolerance")
+    return bench.DEFAULT_TOLERANCE if tolerance is None else tolerance
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def _fast_title_scans(monkeypatch):
+    monkeypatch.setattr(presence, "TITLE_SCAN_MIN_INTERVAL", 0.0)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def make_runtime():
+    started = []
+
+    def make(send=None, max_attempts=5, **kwargs):
+        delivered = []
+
+        async def default_send(content):
+            delivered.append(content)
+
+        logs = []
+        outbox = WebhookOutbox(send or default_send, logs.append, max_attempts=max_attempts)
+        rt = MonitorRuntime(outbox, log_fn=logs.append, **kwargs).start()
+        rt.configure("Zeke", False)
+        started.append(rt)
+        return rt, delivered, logs
+
+    yield make
+    for rt in started:
+        rt.shutdown(timeout=3)
+
+
+def monitor_for(backend):
+    return PresenceMonitor(backend, check_idle_sec=0.02, check_active_sec=0.02, required_hits=1, grace_sec=0)
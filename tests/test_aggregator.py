@@ -0,0 +1,188 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+import requests
+
+import aggregator
+from aggregator import (STATE_ABSENT, STATE_PRESENT, Aggregator, AggregatorReporter, _loadtest, _post_local,
+                        _StubDiscord)
+from conftest import FakeClock
+
+
+def make(clock=None, webhook="http://127.0.0.1:9/api/webhooks/1/x", **kwargs):
+    return Aggregator(webhook, log_fn=lambda m: None, clock=clock or FakeClock(), **kwargs)
+
+
+def test_duplicates_and_flaps_do_not_publish():
+    agg = make()
+    agg.apply_report("Zeke", STATE_PRESENT, "c1")
+    agg.apply_report("ZEKE", STATE_PRESENT, "c1")  # heartbeat under another spelling
+    assert agg.arrived == {"zeke": "Zeke"}
+
+    agg.apply_report("Ada", STATE_PRESENT)
+    agg.apply_report("Ada", STATE_ABSENT)
+    agg.apply_report("Nobody", STATE_ABSENT)
+    assert agg.arrived == {"zeke": "Zeke"} and agg.left == {}
+    assert "**Zeke** is around." in agg.digest_text()
+    assert "Around now (1): Zeke" in agg.digest_text()
+
+
+def test_big_digest_fits_discord_and_keeps_the_head_count():
+    agg = make()
+    for i in range(500):
+        agg.apply_report(f"Player{i:05d}", STATE_PRESENT)
+    text = agg.digest_text()
+    assert len(text) <= aggregator.DISCORD_MAX_CHARS
+    assert "\nAround now (500): Player00000, " in text and text.endswith(" more")
+
+
+def test_silent_clients_expire_after_the_ttl():
+    clock = FakeClock()
+    agg = make(clock, ttl=600)
+    agg.apply_report("Zeke", STATE_PRESENT)
+    agg.apply_report("Ada", STATE_PRESENT)
+    agg.arrived.clear()
+
+    clock.advance(400)
+    agg.apply_report("Ada", STATE_PRESENT)  # heartbeat
+    clock.advance(300)
+    assert agg.expire() == 1
+    assert [e["nickname"] for e in agg.present()] == ["Ada"]
+    assert agg.left == {"zeke": "Zeke"}
+
+    clock.advance(700)
+    agg.expire()
+    assert "zeke" not in agg.roster
+
+
+def test_report_during_a_publish_goes_out_next():
+    async def scenario():
+        discord = _StubDiscord(delay=0.2)
+        agg = make(webhook=await discord.start())
+        agg.apply_report("First", STATE_PRESENT)
+        in_flight = asyncio.create_task(agg.publish())
+        await asyncio.sleep(0.1)
+        agg.apply_report("Second", STATE_PRESENT)
+        await in_flight
+        assert agg.arrived == {"second": "Second"} and agg.dirty
+        await agg.publish()
+        await discord.close()
+        return [content for _, _, content in discord.requests]
+
+    first, second = asyncio.run(scenario())
+    assert "**First** is around." in first and "Second" not in first
+    assert "**Second** is around." in second and "Around now (2)" in second
+
+
+def test_failed_publish_keeps_changes_and_merges_newer_ones():
+    agg = make()  # nothing listens on the discard port
+    agg.apply_report("Zeke", STATE_PRESENT)
+    agg.apply_report("Ada", STATE_PRESENT)
+    agg.arrived.pop("ada")
+
+    async def publish_with_a_flap():
+        task = asyncio.create_task(agg.publish())
+        await asyncio.sleep(0)
+        agg.apply_report("Zeke", STATE_ABSENT)  # cancels the pending arrival once merged back
+        agg.apply_report("Ada", STATE_ABSENT)
+        await task
+
+    asyncio.run(publish_with_a_flap())
+    assert agg.arrived == {} and agg.left == {"ada": "Ada"} and agg.dirty
+
+
+class RateLimited:
+    status_code = 429
+    headers = {}
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+    def json(self):
+        return {"retry_after": self.retry_after}
+
+    def raise_for_status(self):
+        raise requests.HTTPError("429 Too Many Requests")
+
+
+@pytest.mark.parametrize("retry_after, expected_requests", [(0.01, aggregator.DISCORD_MAX_RETRIES + 1), (60, 1)])
+def test_rate_limits_are_waited_out_a_bounded_number_of_times(monkeypatch, retry_after, expected_requests):
+    sent = []
+    monkeypatch.setattr(aggregator.requests, "request", lambda *a, **kw: sent.append(a) or RateLimited(retry_after))
+    agg = make(publish_interval=30)
+    agg.apply_report("Zeke", STATE_PRESENT)
+
+    asyncio.run(agg.publish())
+    assert len(sent) == expected_requests
+    assert agg.arrived == {"zeke": "Zeke"} and agg.dirty  # goes out with the next publish
+
+
+def test_edit_mode_posts_once_then_edits():
+    async def scenario():
+        discord = _StubDiscord()
+        agg = make(webhook=await discord.start(), mode="edit")
+        agg.apply_report("Zeke", STATE_PRESENT)
+        await agg.publish()
+        agg.apply_report("Ada", STATE_PRESENT)
+        await agg.publish()
+        await discord.close()
+        return agg, discord.requests
+
+    agg, requests_seen = asyncio.run(scenario())
+    assert [(m, p.split("/")[-1]) for m, p, _ in requests_seen] == [("POST", "loadtest"),
+                                                                    ("PATCH", "1000")]
+    assert agg.message_id == "1000"
+    assert "**Around in Deadwood (2)**" in requests_seen[-1][2]
+
+
+def test_http_reports_need_the_token():
+    async def scenario():
+        agg = make(token="secret")
+        port = await agg.start("127.0.0.1", 0)
+        url = f"http://127.0.0.1:{port}/report"
+        report = {"nickname": "Zeke", "state": STATE_PRESENT, "client_id": "c1"}
+        statuses = [
+            await _post_local(url, report, {}),
+            await _post_local(url, {"nickname": "", "state": STATE_PRESENT}, {"Authorization": "Bearer secret"}),
+            await _post_local(url, report, {"Authorization": "Bearer secret"}),
+        ]
+        agg.publish = lambda: asyncio.sleep(0)
+        await agg.close()
+        return agg, statuses
+
+    agg, statuses = asyncio.run(scenario())
+    assert statuses == [401, 400, 204]
+    assert [e["nickname"] for e in agg.present()] == ["Zeke"]
+
+
+def test_reporter_stops_heartbeats_when_monitoring_stops():
+    reporter = AggregatorReporter("http://127.0.0.1:9")
+    reporter.record({"kind": "announce", "nickname": "Zeke"})
+    assert reporter._present == {"zeke": "Zeke"}
+    assert reporter._latest["zeke"]["state"] == STATE_PRESENT
+
+    reporter.record({"kind": "stop", "nickname": "Zeke"})
+    assert reporter._present == {}
+
+    reporter.record({"kind": "resume", "nickname": "Zeke", "announced": True})
+    reporter.record({"kind": "close", "nickname": "Zeke", "announced": True})
+    assert reporter._present == {} and reporter._latest["zeke"]["state"] == STATE_ABSENT
+
+
+def test_small_loadtest(capsys, monkeypatch):
+    monkeypatch.setattr(aggregator, "EXPIRE_CHECK_SEC", 3600)
+    assert asyncio.run(_loadtest(clients=50, duration=3, mode="digest", publish_interval=0.5, seed=1,
+                                 discord_delay=0.2)) == 0
+    assert "LOADTEST OK" in capsys.readouterr().out
+
+
+def test_only_loopback_without_a_token(capsys):
+    args = aggregator.parse_args(["--webhook", "x"])
+    assert args.host == "127.0.0.1"
+    assert args.state == Path(aggregator.__file__).resolve().with_name("aggregator_state.json")
+    assert aggregator.parse_args(["--webhook", "x", "--host", "0.0.0.0", "--token", "s"]).host == "0.0.0.0"
+    assert aggregator.parse_args(["--webhook", "x", "--host", "::1"]).host == "::1"
+    with pytest.raises(SystemExit):
+        aggregator.parse_args(["--webhook", "x", "--host", "0.0.0.0"])
+    assert "--token" in capsys.readouterr().err
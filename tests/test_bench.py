@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import bench
+
+
+def test_committed_baseline_covers_every_case():
+    cases = bench.load_baseline(bench.BASELINE_PATH)
+    assert set(cases) == {name for name, _, _ in bench.CASES}
+    assert all(c["median_us"] > 0 and c["number"] >= 1 for c in cases.values())
+
+
+def test_save_merges_into_an_existing_baseline(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"cases": {"kept": {"median_us": 1.0, "number": 1}}}))
+    assert bench.run(bench.parse_args(["--save", "--baseline", str(path), "-k", "status_feed_publish"])) == 0
+    saved = json.loads(path.read_text())
+    assert set(saved["cases"]) == {"kept", "status_feed_publish"}
+    assert saved["machine"]["python"]
+
+
+@pytest.mark.bench
+@pytest.mark.parametrize("name, factory, param", bench.CASES, ids=[name for name, _, _ in bench.CASES])
+def test_bench(name, factory, param, bench_tolerance):
+    try:
+        with factory(param) as fn:
+            result = bench.measure(fn)
+    except bench.Skip as e:
+        pytest.skip(str(e))
+    base = bench.load_baseline(bench.BASELINE_PATH).get(name, {}).get("median_us")
+    if not base:
+        pytest.skip("no baseline yet (python bench.py --save)")
+    change = result["median_us"] / base - 1.0
+    assert change <= bench_tolerance, (
+        f"{name}: {result['median_us']:.2f}us vs baseline {base:.2f}us ({change:+.0%})")
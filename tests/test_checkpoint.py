@@ -0,0 +1,70 @@
+from checkpoint import SessionCheckpoint
+from presence import SessionState
+
+
+def test_writes_only_when_a_durable_field_changes(tmp_path, clock):
+    cp = SessionCheckpoint(tmp_path / "session.jsonl", clock=clock)
+    state = SessionState(was_running=True, redm_pid=4242)
+    for _ in range(10):
+        state.deadwood_hits += 1  # per-tick counter, not durable
+        cp.save(state, "Zeke")
+    assert cp.writes == 1
+
+    state.presence_announced = True
+    cp.save(state, "Zeke")
+    cp.save(state, "Ezekiel")
+    assert cp.writes == 3
+    cp.close()
+
+    loaded, nickname, saved_at = SessionCheckpoint(tmp_path / "session.jsonl").load()
+    assert loaded.presence_announced is True and loaded.redm_pid == 4242
+    assert nickname == "Ezekiel"
+    assert saved_at == clock()
+
+
+def test_fsync_is_batched_unless_a_session_event_happened(tmp_path, clock):
+    cp = SessionCheckpoint(tmp_path / "session.jsonl", fsync_interval=5.0, clock=clock)
+    state = SessionState()
+    clock.advance(10)
+    cp.save(state, "Zeke")
+    assert cp.fsyncs == 1
+
+    state.was_running = True
+    cp.save(state, "Zeke")
+    assert cp.fsyncs == 1  # within the interval
+
+    cp.record_event({"kind": "announce"})
+    state.presence_announced = True
+    cp.save(state, "Zeke")
+    assert cp.fsyncs == 2
+    cp.close()
+
+
+def test_load_skips_a_torn_last_line(tmp_path):
+    path = tmp_path / "session.jsonl"
+    cp = SessionCheckpoint(path)
+    cp.save(SessionState(redm_pid=7), "Zeke")
+    cp.close()
+    with open(path, "ab") as f:
+        f.write(b'{"t":1,"n":"Zeke","s":{"redm_pi')
+
+    loaded, _, _ = SessionCheckpoint(path).load()
+    assert loaded.redm_pid == 7
+
+
+def test_load_without_a_file(tmp_path):
+    assert SessionCheckpoint(tmp_path / "missing.jsonl").load() is None
+
+
+def test_compacts_to_the_last_record(tmp_path):
+    path = tmp_path / "session.jsonl"
+    cp = SessionCheckpoint(path, compact_bytes=2048)
+    state = SessionState()
+    for pid in range(100):
+        state.redm_pid = pid
+        cp.save(state, "Zeke")
+    cp.close()
+
+    assert path.stat().st_size < 2048
+    loaded, _, _ = SessionCheckpoint(path).load()
+    assert loaded.redm_pid == 99
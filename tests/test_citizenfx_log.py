@@ -0,0 +1,127 @@
+import os
+import time
+
+from citizenfx_log import BACKFILL_BYTES, CitizenFxLogSignal, LogTailer, parse_line
+
+
+class ScriptedTailer:
+    def __init__(self):
+        self.lines = []
+        self.saved = False
+
+    def poll(self):
+        lines, self.lines = self.lines, []
+        return lines
+
+    def save_state(self, force=False):
+        self.saved = force
+
+
+def test_parse_line():
+    assert parse_line("MainThrd/ Connecting to: 12.34.56.78:30120", 1.0).detail == "12.34.56.78:30120"
+    assert parse_line("Received connectOK", 1.0).kind == "connected"
+    assert parse_line('sv_hostname "Deadwood RP"', 1.0).detail == "Deadwood RP"
+    assert parse_line("Joined a network session", 1.0).kind == "session"
+    assert parse_line("Connection timed out", 1.0).kind == "disconnected"
+    assert parse_line("loading streaming assets", 1.0) is None
+
+
+def test_target_address_then_session():
+    tailer = ScriptedTailer()
+    signal = CitizenFxLogSignal(tailer, ["12.34.56.78:30120"])
+    tailer.lines = ["Connecting to: 12.34.56.78:30120"]
+    assert signal.poll(1, 0.0) == 0.3
+    tailer.lines = ["Received connectOK"]
+    assert signal.poll(1, 3.0) == 0.9
+    tailer.lines = ["Joined a network session"]
+    assert signal.poll(1, 6.0) == 1.0
+    tailer.lines = ["Disconnected"]
+    assert signal.poll(1, 9.0) == 0.0
+
+
+def test_hostname_counts_only_for_the_current_connect():
+    tailer = ScriptedTailer()
+    signal = CitizenFxLogSignal(tailer, ["deadwood"])
+
+    # Joining another server whose list happens to mention Deadwood
+    tailer.lines = ["Connecting to: 1.1.1.1:30120", 'hostname: "Other RP"', 'hostname: "Deadwood RP"',
+                    "Received connectOK", "Joined a network session"]
+    assert signal.poll(1, 0.0) == 0.0
+
+    tailer.lines = ["Connecting to: 2.2.2.2:30120", 'hostname: "Deadwood RP"', "Received connectOK"]
+    assert signal.poll(1, 3.0) == 0.9
+
+
+def test_new_process_forgets_the_previous_session():
+    tailer = ScriptedTailer()
+    signal = CitizenFxLogSignal(tailer, ["deadwood"])
+    tailer.lines = ["Connecting to: deadwood.example:30120", "Received connectOK"]
+    assert signal.poll(1, 0.0) == 0.9
+    assert signal.poll(2, 3.0) == 0.0
+    signal.close()
+    assert tailer.saved is True
+
+
+def test_tailer_returns_complete_lines_and_resumes_from_state(tmp_path):
+    log = tmp_path / "CitizenFX.log"
+    state = tmp_path / "tail.json"
+    log.write_bytes(b"one\ntwo\npart")
+    tailer = LogTailer(str(log), state_path=state)
+    assert tailer.poll() == ["one", "two"]
+    with open(log, "ab") as f:
+        f.write(b"ial\nthree\n")
+    assert tailer.poll() == ["partial", "three"]
+    tailer.save_state(force=True)
+
+    with open(log, "ab") as f:
+        f.write(b"four\n")
+    assert LogTailer(str(log), state_path=state).poll() == ["four"]
+
+
+def test_tailer_rereads_a_truncated_file(tmp_path):
+    log = tmp_path / "CitizenFX.log"
+    log.write_bytes(b"old line\n" * 10)
+    tailer = LogTailer(str(log))
+    assert len(tailer.poll()) == 10
+    log.write_bytes(b"new\n")
+    assert tailer.poll() == ["new"]
+
+
+def test_gigabyte_log_is_tailed_not_replayed(tmp_path):
+    log = tmp_path / "CitizenFX_log_1.log"
+    with open(log, "wb") as f:
+        f.write(b"[    1] boot\n" * 100)
+        f.truncate(1024 ** 3)  # sparse: a gigabyte without writing one
+        f.seek(0, 2)
+        f.write(b"\nMainThrd/ Connecting to: 12.34.56.78:30120\nReceived connectOK\n")
+
+    tailer = LogTailer(str(log))
+    started = time.perf_counter()
+    lines = tailer.poll()
+    assert time.perf_counter() - started < 1.0
+    assert lines[-2:] == ["MainThrd/ Connecting to: 12.34.56.78:30120", "Received connectOK"]
+    assert tailer.offset == log.stat().st_size
+
+    with open(log, "ab") as f:
+        f.write(b"Joined a network session\n")
+    assert tailer.poll() == ["Joined a network session"]
+
+
+def test_newer_file_after_a_restart_is_tailed(tmp_path):
+    old = tmp_path / "CitizenFX_log_1.log"
+    old.write_bytes(b"old session\n")
+    state = tmp_path / "tail.json"
+    pattern = str(tmp_path / "CitizenFX_log_*.log")
+    tailer = LogTailer(pattern, state_path=state)
+    assert tailer.poll() == ["old session"]
+    tailer.save_state(force=True)
+
+    # While we weren't running, RedM started a new log that is already large
+    new = tmp_path / "CitizenFX_log_2.log"
+    new.write_bytes(b"x" * 100 + b"\n" + b"filler line\n" * 100_000 + b"Received connectOK\n")
+    os.utime(new, (time.time() + 10, time.time() + 10))
+
+    lines = LogTailer(pattern, state_path=state).poll()
+    assert lines[-1] == "Received connectOK"
+    assert all(line == "filler line" for line in lines[:-1])  # starts on a line boundary
+    assert len(lines) <= BACKFILL_BYTES // len("filler line\n") + 1
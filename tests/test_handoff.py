@@ -0,0 +1,183 @@
+import asyncio
+import json
+import queue
+import socket
+import threading
+from unittest import mock
+
+import pytest
+
+import bench
+from handoff import HandoffServer, _recv_json, _send_json, request_handoff
+
+
+def serve(info_path, client):
+    """Run a HandoffServer on a loop and `client(info_path)` against it in a worker thread."""
+    calls = []
+
+    async def freeze():
+        calls.append("freeze")
+        return {"session": {"redm_pid": 4242}, "outbox": [{"content": "hi"}]}
+
+    async def scenario():
+        server = HandoffServer(info_path, freeze, lambda: calls.append("handed_off"),
+                               lambda: calls.append("aborted"))
+        await server.start()
+        try:
+            result = await asyncio.to_thread(client, info_path)
+            await asyncio.sleep(0.05)  # let the server finish its side
+            return result
+        finally:
+            await server.close()
+
+    return asyncio.run(scenario()), calls
+
+
+def test_handoff_transfers_the_state(tmp_path):
+    info_path = tmp_path / "HANDOFF"
+    payload, calls = serve(info_path, request_handoff)
+    assert payload == {"session": {"redm_pid": 4242}, "outbox": [{"content": "hi"}]}
+    assert calls == ["freeze", "handed_off"]
+    assert not info_path.exists()
+
+
+def test_wrong_token_is_refused_without_freezing(tmp_path):
+    def forged(info_path):
+        info = json.loads(info_path.read_text())
+        info_path.write_text(json.dumps({**info, "token": "0" * 32}))
+        return request_handoff(info_path)
+
+    payload, calls = serve(tmp_path / "HANDOFF", forged)
+    assert payload is None and calls == []
+
+
+def test_missing_ack_resumes_the_old_instance(tmp_path):
+    def no_ack(info_path):
+        info = json.loads(info_path.read_text())
+        with socket.create_connection(("127.0.0.1", info["port"]), timeout=2) as sock:
+            _send_json(sock, {"op": "handoff", "token": info["token"], "pid": 1})
+            reply = _recv_json(sock, bytearray())
+            _send_json(sock, {"op": "nope"})
+            return reply
+
+    reply, calls = serve(tmp_path / "HANDOFF", no_ack)
+    assert reply["ok"] is True
+    assert calls == ["freeze", "aborted"]
+
+
+def test_nobody_to_ask(tmp_path):
+    assert request_handoff(tmp_path / "HANDOFF") is None
+    (tmp_path / "HANDOFF").write_text(json.dumps({"port": 9, "token": "x"}))
+    assert request_handoff(tmp_path / "HANDOFF", timeout=1) is None
+
+
+# ===== DeadwoodApp wiring =====
+class TkThread:
+    """Stands in for UiBridge: runs calls on one dedicated thread, like the Tk mainloop."""
+
+    def __init__(self):
+        self.calls = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="tk", daemon=True)
+        self.thread.start()
+
+    def call(self, fn, *args):
+        self.calls.put((fn, args))
+
+    def _run(self):
+        while True:
+            fn, args = self.calls.get()
+            if fn is None:
+                return
+            fn(*args)
+
+    def stop(self):
+        self.calls.put((None, ()))
+        self.thread.join(timeout=2)
+
+
+class FakeRuntime:
+    nickname = "Ezekiel"
+
+    def __init__(self):
+        self.thawed = None
+
+    async def freeze_on_loop(self):
+        return {"redm_pid": 4242}, [{"content": "hi"}]
+
+    def thaw(self, pending):
+        self.thawed = pending
+
+
+@pytest.fixture
+def app():
+    try:
+        m = bench.need_main()
+    except bench.Skip as e:
+        pytest.skip(str(e))
+
+    class App(m.DeadwoodApp):
+        """Only the attributes the hand-off paths touch; Tk-owned ones must be read on the Tk thread."""
+
+        def __init__(self):
+            self.ui_bridge = TkThread()
+            self.runtime = FakeRuntime()
+            self.tray_icon = None
+            self.root = mock.Mock()
+            self.calls = []
+            self.off_tk_reads = []
+            self._monitoring, self._hidden = True, True
+            self._handoff_outbox = []
+
+        def _tk(self, name):
+            if threading.current_thread() is not self.ui_bridge.thread:
+                self.off_tk_reads.append(name)
+
+        @property
+        def monitoring(self):
+            self._tk("monitoring")
+            return self._monitoring
+
+        @monitoring.setter
+        def monitoring(self, value):
+            self._monitoring = value
+
+        @property
+        def is_hidden_to_tray(self):
+            self._tk("is_hidden_to_tray")
+            return self._hidden
+
+        def start_monitoring(self, minimize=False):
+            self.calls.append(("start_monitoring", minimize))
+
+        def persist_config(self):
+            self.calls.append("persist_config")
+
+        def shutdown_services(self):
+            self.calls.append("shutdown_services")
+
+    app = App()
+    yield app
+    app.ui_bridge.stop()
+
+
+def test_freeze_reads_tk_state_on_the_tk_thread(app):
+    payload = asyncio.run(app.freeze_for_handoff())
+    assert payload["monitoring"] is True and payload["monitor"] == {"redm_pid": 4242}
+    assert payload["tray"] == {"hidden": True} and payload["outbox"] == [{"content": "hi"}]
+    assert app.off_tk_reads == []
+
+
+def test_aborted_handoff_puts_the_outbox_back_and_restarts(app):
+    asyncio.run(app.freeze_for_handoff())
+    app.resume_after_aborted_handoff()
+    assert app.runtime.thawed == [{"content": "hi"}]
+    assert app.calls == [("start_monitoring", True)]
+
+
+def test_exit_after_handoff_leaves_the_config_to_the_new_instance(app):
+    app.exit_after_handoff()
+    assert app.calls == ["shutdown_services"]
+    app.root.destroy.assert_called_once()
+
+    app.exit_app()
+    assert app.calls == ["shutdown_services", "persist_config", "shutdown_services"]
@@ -0,0 +1,91 @@
+import sqlite3
+
+from history import SessionHistory
+
+T0 = 1_760_000_000.0
+
+
+def write(db, events, owner=True):
+    history = SessionHistory(db, flush_interval=0.01).start(close_orphans=owner)
+    for event in events:
+        history.record(event)
+    history.close()
+    return history
+
+
+def sessions(db):
+    conn = sqlite3.connect(str(db))
+    try:
+        return conn.execute(
+            "SELECT redm_pid, started_at, deadwood_at, announced_at, closed_at FROM sessions ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def test_records_a_full_session(tmp_path):
+    db = tmp_path / "history.sqlite3"
+    history = write(db, [
+        {"kind": "redm_start", "ts": T0, "nickname": "Zeke", "pid": 1},
+        {"kind": "deadwood_enter", "ts": T0 + 60, "nickname": "Zeke"},
+        {"kind": "announce", "ts": T0 + 90, "nickname": "Zeke"},
+        {"kind": "close", "ts": T0 + 3600, "nickname": "Zeke", "announced": True},
+    ])
+    assert sessions(db) == [(1, T0, T0 + 60, T0 + 90, T0 + 3600)]
+    assert history.written == 4
+    assert history.avg_time_to_announce() == 90
+    assert sum(h for _, h in history.hours_per_week(now=T0 + 7200)) == 1.0
+
+
+def test_crashed_session_ends_at_its_last_event(tmp_path):
+    db = tmp_path / "history.sqlite3"
+    write(db, [
+        {"kind": "redm_start", "ts": T0, "nickname": "Zeke", "pid": 1},
+        {"kind": "deadwood_enter", "ts": T0 + 600, "nickname": "Zeke"},
+    ])
+    write(db, [], owner=False)  # --stats, --profile, a second instance about to exit
+    assert sessions(db)[0][4] is None
+    write(db, [])  # the next owning instance
+    assert sessions(db)[0][4] == T0 + 600
+
+
+def test_resume_reopens_the_same_process_session(tmp_path):
+    db = tmp_path / "history.sqlite3"
+    write(db, [
+        {"kind": "redm_start", "ts": T0, "nickname": "Zeke", "pid": 1},
+        {"kind": "announce", "ts": T0 + 30, "nickname": "Zeke"},
+    ])
+    write(db, [
+        {"kind": "resume", "ts": T0 + 100, "nickname": "Zeke", "pid": 1},
+        {"kind": "close", "ts": T0 + 200, "nickname": "Zeke"},
+    ])
+    assert sessions(db) == [(1, T0, None, T0 + 30, T0 + 200)]
+
+
+def test_resume_of_another_process_starts_a_new_session(tmp_path):
+    db = tmp_path / "history.sqlite3"
+    write(db, [{"kind": "redm_start", "ts": T0, "nickname": "Zeke", "pid": 1}])
+    write(db, [{"kind": "resume", "ts": T0 + 100, "nickname": "Zeke", "pid": 2}])
+    rows = sessions(db)
+    assert [r[0] for r in rows] == [1, 2]
+    assert rows[0][4] == T0
+
+
+def test_live_session_counts_up_to_now(tmp_path):
+    db = tmp_path / "history.sqlite3"
+    history = write(db, [{"kind": "redm_start", "ts": T0, "nickname": "Zeke", "pid": 1}])
+    assert sum(h for _, h in history.hours_per_week(now=T0 + 1800)) == 0.5
+    assert history.hours_per_week(nickname="Someone else", now=T0 + 1800) == []
+
+
+def test_sessions_overlapping_the_window_are_clipped(tmp_path):
+    db = tmp_path / "history.sqlite3"
+    since = T0  # one week back from now
+    history = write(db, [
+        {"kind": "redm_start", "ts": since - 3600, "nickname": "Zeke", "pid": 1},
+        {"kind": "close", "ts": since + 1800, "nickname": "Zeke"},
+        {"kind": "redm_start", "ts": since - 7200, "nickname": "Zeke", "pid": 2},
+        {"kind": "close", "ts": since - 3600, "nickname": "Zeke"},  # entirely before the window
+    ])
+    rows = history.hours_per_week(weeks=1, now=since + 7 * 24 * 3600)
+    assert sum(h for _, h in rows) == 0.5
@@ -0,0 +1,53 @@
+import json
+
+from launch_cache import LaunchCache
+
+
+def test_miss_then_hit(tmp_path):
+    path = tmp_path / "launch_cache.json"
+    cache = LaunchCache(path, "C:/app/Checker.exe", 100.0, "1.2.0")
+    assert cache.hit is False
+    cache.remember_exe("C:/app/Checker.exe", 100.0, True)
+    cache.remember_exe("C:/other/Tool.exe", 50.0, False)
+    cache.mark_startup_cleaned()
+    cache.save()
+
+    again = LaunchCache(path, "C:/app/Checker.exe", 100.0, "1.2.0")
+    assert again.hit is True and again.startup_cleaned is True
+    assert again.our_exe_names == {"checker.exe"}
+    assert again.exe_verdict("C:/other/Tool.exe", 50.0) is False
+    assert again.exe_verdict("C:/other/Tool.exe", 51.0) is None  # file changed
+
+
+def test_new_build_is_a_miss_but_keeps_verdicts(tmp_path):
+    path = tmp_path / "launch_cache.json"
+    cache = LaunchCache(path, "C:/app/Checker.exe", 100.0, "1.2.0")
+    cache.remember_exe("C:/app/Checker.exe", 100.0, True)
+    cache.mark_startup_cleaned()
+    cache.save()
+
+    newer = LaunchCache(path, "C:/app/Checker.exe", 200.0, "1.3.0")
+    assert newer.hit is False and newer.startup_cleaned is False
+    assert newer.exe_verdict("C:/app/Checker.exe", 100.0) is True
+
+
+def test_unchanged_hit_is_not_rewritten(tmp_path):
+    path = tmp_path / "launch_cache.json"
+    first = LaunchCache(path, "C:/app/Checker.exe", 100.0, "1.2.0")
+    first.remember_exe("C:/x/Known.exe", 1.0, False)
+    first.save()
+    path.write_text(json.dumps({**json.loads(path.read_text()), "marker": 1}))
+
+    cache = LaunchCache(path, "C:/app/Checker.exe", 100.0, "1.2.0")
+    cache.remember_exe("C:/x/Known.exe", 1.0, False)  # same verdict as cached
+    cache.save()
+    assert json.loads(path.read_text())["marker"] == 1
+
+
+def test_corrupt_cache_is_a_miss(tmp_path):
+    path = tmp_path / "launch_cache.json"
+    path.write_text("{not json")
+    cache = LaunchCache(path, "C:/app/Checker.exe", 100.0, "1.2.0")
+    assert cache.hit is False
+    cache.save()
+    assert LaunchCache(path, "C:/app/Checker.exe", 100.0, "1.2.0").hit is True
@@ -0,0 +1,111 @@
+import datetime as dt
+import os
+import sys
+
+import pytest
+
+import bench
+from logview import LogIndex, entry_category, parse_time
+
+NOW = dt.datetime(2026, 10, 14, 12, 0, 0)  # a Wednesday
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    lines = []
+    start = dt.datetime(2026, 10, 13, 0, 0, 0)
+    for i in range(2000):
+        ts = (start + dt.timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")
+        category = ("Webhook: sent OK", "Monitor: tick", "Startup repaired. ok")[i % 3]
+        lines.append(f"[{ts}] {category} #{i}\n")
+        if i % 100 == 0:
+            lines.append("Traceback (most recent call last):\n  boom\n")
+    path = tmp_path / "log.txt"
+    path.write_text("".join(lines), encoding="utf-8")
+    return path
+
+
+def test_entry_category():
+    assert entry_category("Webhook: sent OK") == "Webhook"
+    assert entry_category("Startup repaired. ...") == "Startup"
+    assert entry_category("") == ""
+
+
+def test_parse_time():
+    assert parse_time("today", NOW) == dt.datetime(2026, 10, 14)
+    assert parse_time("yesterday", NOW) == dt.datetime(2026, 10, 13)
+    assert parse_time("monday", NOW) == dt.datetime(2026, 10, 12)
+    assert parse_time("last wednesday", NOW) == dt.datetime(2026, 10, 7)
+    assert parse_time("90m", NOW) == NOW - dt.timedelta(minutes=90)
+    assert parse_time("2026-10-01 08:30", NOW) == dt.datetime(2026, 10, 1, 8, 30)
+    with pytest.raises(ValueError):
+        parse_time("sometime", NOW)
+
+
+def test_seek_lands_on_the_first_entry_at_or_after(log_path):
+    with LogIndex(log_path, step=4096) as index:
+        entry = next(index.entries(index.seek(dt.datetime(2026, 10, 13, 10, 0, 30))))
+        assert entry.ts == "2026-10-13 10:01:00"
+        assert index.seek(dt.datetime(2030, 1, 1)) == index.size
+
+
+def test_query_filters_and_keeps_continuation_lines(log_path):
+    with LogIndex(log_path, step=4096) as index:
+        got = list(index.query(since=dt.datetime(2026, 10, 13, 1, 0), until=dt.datetime(2026, 10, 13, 2, 0),
+                               categories=["webhook"]))
+        assert len(got) == 20
+        assert all(e.category == "Webhook" and "01:" in e.ts for e in got)
+
+        tb = list(index.query(since=dt.datetime(2026, 10, 13, 5, 0), until=dt.datetime(2026, 10, 13, 5, 1)))
+        assert len(tb) == 1
+        assert tb[0].text == "Webhook: sent OK #300\nTraceback (most recent call last):\n  boom"
+
+        assert [e.text for e in index.query(grep="#1999")] == ["Monitor: tick #1999"]
+
+
+def test_query_slices_match_query(log_path):
+    with LogIndex(log_path, step=4096) as index:
+        since = dt.datetime(2026, 10, 13, 3, 0)
+        expected = list(index.query(since=since, categories=["monitor"]))
+        slices = list(index.query_slices(since=since, categories=["monitor"], slice_bytes=2048))
+        assert len(slices) > 10
+        assert [e for s in slices for e in s] == expected
+
+
+def test_empty_log(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"")
+    with LogIndex(path) as index:
+        assert list(index.query()) == []
+
+
+@pytest.fixture
+def windowed_main(monkeypatch, tmp_path, log_path):
+    """main.py as the windowed build sees it: no console, results go to a file that gets opened."""
+    try:
+        m = bench.need_main()
+    except bench.Skip as e:
+        pytest.skip(str(e))
+    opened, messages = [], []
+    monkeypatch.setattr(m, "LOG_PATH", log_path)
+    monkeypatch.setattr(m, "LOG_QUERY_PATH", tmp_path / "log_query.txt")
+    monkeypatch.setattr(os, "startfile", opened.append, raising=False)
+    monkeypatch.setattr(m, "show_message", lambda title, text: messages.append(text))
+    return m, opened, messages
+
+
+def test_logs_without_a_console_opens_the_results(windowed_main, monkeypatch):
+    m, opened, messages = windowed_main
+    monkeypatch.setattr(sys, "stdout", None)  # set in the test: capturing resets it after fixture setup
+    assert m.run_log_query(["--day", "2026-10-14", "-g", "#1500"]) == 0
+    assert opened == [str(m.LOG_QUERY_PATH)] and messages == []
+    assert m.LOG_QUERY_PATH.read_text(encoding="utf-8").startswith("[2026-10-14 01:00:00] Webhook: sent OK #1500")
+
+
+def test_logs_without_a_console_reports_problems(windowed_main, monkeypatch):
+    m, opened, messages = windowed_main
+    monkeypatch.setattr(sys, "stdout", None)
+    assert m.run_log_query(["-g", "no such entry"]) == 0
+    assert m.run_log_query(["--day", "someday"]) == 2
+    assert opened == [] and messages[0] == "No log entries match."
+    assert "someday" in messages[1]
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import outbox
+from outbox import WebhookOutbox
+
+
+@pytest.fixture(autouse=True)
+def _fast_retries(monkeypatch):
+    monkeypatch.setattr(outbox, "RETRY_BASE_SEC", 0.01)
+
+
+class FlakySender:
+    def __init__(self, failures=0, retry_after=None):
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = []
+        self.delivered = []
+
+    async def __call__(self, content):
+        self.calls.append(content)
+        if self.failures:
+            self.failures -= 1
+            e = RuntimeError("429")
+            e.retry_after = self.retry_after
+            raise e
+        self.delivered.append(content)
+
+
+def test_delivers_in_order_after_retries():
+    sender = FlakySender(failures=2)
+
+    async def scenario():
+        box = WebhookOutbox(sender).start()
+        for i in range(3):
+            box.send_message(f"m{i}")
+        await box.close(timeout=2)
+        return box
+
+    box = asyncio.run(scenario())
+    assert sender.delivered == ["m0", "m1", "m2"]
+    assert sender.calls[:3] == ["m0", "m0", "m0"]
+    assert (box.sent, box.failed, box.depth()) == (3, 0, 0)
+
+
+def test_retry_after_is_honoured():
+    sender = FlakySender(failures=1, retry_after=0.2)
+
+    async def scenario():
+        box = WebhookOutbox(sender).start()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        box.send_message("hello")
+        await box.close(timeout=2)
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) >= 0.2
+    assert sender.delivered == ["hello"]
+
+
+def test_gives_up_and_reports_the_drop():
+    sender = FlakySender(failures=100)
+    dropped, logs = [], []
+
+    async def scenario():
+        box = WebhookOutbox(sender, log_fn=logs.append, max_attempts=3, on_dropped=dropped.append).start()
+        box.send_message("lost")
+        await box.close(timeout=2)
+        return box
+
+    box = asyncio.run(scenario())
+    assert dropped == ["lost"]
+    assert len(sender.calls) == 3 and box.failed == 1
+    assert any("giving up after 3 attempts" in line for line in logs)
+
+
+def test_full_outbox_drops_the_oldest():
+    dropped = []
+    box = WebhookOutbox(FlakySender(), max_pending=2, on_dropped=dropped.append)
+    for content in ("a", "b", "c"):
+        box.send_message(content)
+    assert dropped == ["a"]
+    assert [item["content"] for item in box.take_pending()] == ["b", "c"]
+
+
+def test_take_pending_and_put_back_keep_order():
+    old = WebhookOutbox(FlakySender())
+    for content in ("a", "b"):
+        old.send_message(content)
+    items = old.take_pending()
+    assert old.depth() == 0
+
+    new = WebhookOutbox(FlakySender())
+    new.send_message("c")
+    new.put_back(items + [{"content": ""}, "junk"])
+    assert [item["content"] for item in new.take_pending()] == ["a", "b", "c"]
@@ -0,0 +1,140 @@
+from presence import (ANNOUNCE_MESSAGE, BED_MESSAGE, CLOSED_REQUIRED_HITS, LATE_CONFIRM_SEC, PROMPT_PENDING,
+                      PresenceMonitor, SessionState)
+
+
+def make_monitor(backend, clock, **kwargs):
+    events = []
+    kwargs.setdefault("grace_sec", 0)
+    kwargs.setdefault("required_hits", 2)
+    monitor = PresenceMonitor(backend, clock=clock, listeners=[events.append], **kwargs)
+    return monitor, events
+
+
+def run(monitor, clock, ticks, nickname="Zeke", always_notify=False):
+    for _ in range(ticks):
+        monitor.tick(nickname, always_notify)
+        clock.advance(3)
+
+
+def close_game(monitor, backend, clock):
+    backend.pid = None
+    run(monitor, clock, CLOSED_REQUIRED_HITS)
+
+
+def test_announces_once_after_required_hits(backend, clock):
+    backend.in_deadwood = True
+    monitor, events = make_monitor(backend, clock)
+
+    run(monitor, clock, 1)
+    assert backend.prompts == []
+    run(monitor, clock, 5)
+
+    assert backend.prompts == ["announce"]
+    assert backend.messages == [ANNOUNCE_MESSAGE.format(nickname="Zeke")]
+    assert [e["kind"] for e in events] == ["redm_start", "deadwood_enter", "decision", "announce"]
+
+
+def test_no_is_latched_for_the_session(backend, clock):
+    backend.in_deadwood = True
+    backend.answer = False
+    monitor, _ = make_monitor(backend, clock)
+
+    run(monitor, clock, 4)
+    backend.in_deadwood = False
+    run(monitor, clock, 2)
+    backend.in_deadwood = True
+    run(monitor, clock, 4)
+
+    assert backend.prompts == ["announce"]
+    assert backend.messages == []
+
+
+def test_bed_message_only_after_announcement(backend, clock):
+    backend.in_deadwood = True
+    monitor, events = make_monitor(backend, clock)
+    run(monitor, clock, 3)
+    close_game(monitor, backend, clock)
+
+    assert backend.messages[-1] == BED_MESSAGE.format(nickname="Zeke")
+    assert events[-1]["kind"] == "close" and events[-1]["announced"] is True
+    assert monitor.state.presence_announced is False
+
+
+def test_grace_period_delays_title_scans(backend, clock):
+    backend.in_deadwood = True
+    monitor, _ = make_monitor(backend, clock, grace_sec=60)
+    run(monitor, clock, 5)
+    assert backend.title_scans == 0
+    clock.advance(60)
+    run(monitor, clock, 2)
+    assert backend.title_scans == 2
+
+
+def test_late_confirmation_when_title_never_matches(backend, clock):
+    monitor, _ = make_monitor(backend, clock)
+    run(monitor, clock, 1)
+    clock.advance(LATE_CONFIRM_SEC)
+    run(monitor, clock, 2)
+    assert backend.prompts == ["late"]
+    assert backend.messages == [ANNOUNCE_MESSAGE.format(nickname="Zeke")]
+
+
+def test_pending_prompt_is_answered_later(backend, clock):
+    backend.in_deadwood = True
+    backend.answer = PROMPT_PENDING
+    monitor, _ = make_monitor(backend, clock)
+    run(monitor, clock, 4)
+    assert monitor.state.prompt_pending == "announce"
+    assert backend.prompts == ["announce"]  # not asked again while the dialog is up
+
+    assert monitor.answer_prompt("announce", True, "Zeke") is True
+    assert backend.messages == [ANNOUNCE_MESSAGE.format(nickname="Zeke")]
+    assert monitor.answer_prompt("announce", True, "Zeke") is False  # stale
+
+
+def test_dropped_announcement_suppresses_bed_message(backend, clock):
+    backend.in_deadwood = True
+    monitor, events = make_monitor(backend, clock)
+    run(monitor, clock, 3)
+
+    assert monitor.message_dropped("something else", "Zeke") is False
+    assert monitor.message_dropped(ANNOUNCE_MESSAGE.format(nickname="Zeke"), "Zeke") is True
+    assert events[-1]["kind"] == "announce_failed"
+    close_game(monitor, backend, clock)
+
+    assert backend.messages == [ANNOUNCE_MESSAGE.format(nickname="Zeke")]
+    assert backend.prompts == ["announce"]
+
+
+def test_resume_same_process_keeps_the_decision(backend, clock):
+    backend.in_deadwood = True
+    first, _ = make_monitor(backend, clock)
+    run(first, clock, 3)
+    saved = SessionState.from_dict(first.state.to_dict())
+
+    second, events = make_monitor(backend, clock)
+    assert second.resume(saved, "Zeke", clock()) == "resumed"
+    run(second, clock, 5)
+
+    assert backend.prompts == ["announce"]
+    assert events[0]["kind"] == "resume" and events[0]["announced"] is True
+    assert "deadwood_enter" not in [e["kind"] for e in events]
+
+
+def test_resume_after_the_game_closed_says_goodnight(backend, clock):
+    backend.in_deadwood = True
+    first, _ = make_monitor(backend, clock)
+    run(first, clock, 3)
+    saved = SessionState.from_dict(first.state.to_dict())
+
+    backend.create_time += 50  # same pid, different process
+    second, events = make_monitor(backend, clock)
+    assert second.resume(saved, "Zeke", clock()) == "ended"
+    assert backend.messages[-1] == BED_MESSAGE.format(nickname="Zeke")
+    assert events[-1]["kind"] == "close" and events[-1]["resumed"] is True
+
+
+def test_next_deadline_is_grace_end(backend, clock):
+    monitor, _ = make_monitor(backend, clock, grace_sec=60)
+    run(monitor, clock, 1)
+    assert monitor.next_deadline() == monitor.state.first_seen_running_ts + 60
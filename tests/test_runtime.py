@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+from checkpoint import SessionCheckpoint
+from conftest import FakeBackend, monitor_for, wait_for
+from presence import ANNOUNCE_MESSAGE
+
+
+class OutboxBackend(FakeBackend):
+    """Sends through the runtime's outbox, like the Windows backend does."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.runtime = None
+
+    def send_message(self, content):
+        super().send_message(content)
+        self.runtime.outbox.send_message(content)
+
+
+def test_session_announces_through_the_outbox_and_checkpoints(make_runtime, tmp_path):
+    rt, delivered, _ = make_runtime()
+    backend = OutboxBackend(in_deadwood=True)
+    backend.runtime = rt
+    checkpoint = SessionCheckpoint(tmp_path / "session.jsonl")
+
+    done = rt.start_session(monitor_for(backend), checkpoint, max_ticks=5)
+    assert done.result(5) == 5
+    assert wait_for(lambda: delivered == [ANNOUNCE_MESSAGE.format(nickname="Zeke")])
+
+    state, nickname, _ = SessionCheckpoint(tmp_path / "session.jsonl").load()
+    assert state.presence_announced is True and state.redm_pid == 4242 and nickname == "Zeke"
+    assert rt.tick_stats.summary()["ticks"] == 5
+
+
+def test_freeze_returns_the_session_and_pending_messages(make_runtime, tmp_path):
+    gate = threading.Event()
+
+    async def blocked_send(content):
+        await asyncio.get_running_loop().run_in_executor(None, gate.wait, 5)
+        raise ConnectionError("webhook down")
+
+    rt, _, _ = make_runtime(send=blocked_send)
+    backend = OutboxBackend(in_deadwood=True)
+    backend.runtime = rt
+    rt.start_session(monitor_for(backend), SessionCheckpoint(tmp_path / "session.jsonl"))
+    assert wait_for(lambda: backend.messages)
+    ticks = rt.tick_stats.ticks
+    assert wait_for(lambda: rt.tick_stats.ticks > ticks)  # the announcing tick has completed
+
+    state, pending = rt.freeze(timeout=3)
+    gate.set()
+    assert not rt.session_running
+    assert state["presence_announced"] is True
+    assert [item["content"] for item in pending] == backend.messages
+
+
+def test_dropped_announcement_is_taken_back(make_runtime, tmp_path):
+    async def failing_send(content):
+        raise ConnectionError("webhook down")
+
+    rt, _, logs = make_runtime(send=failing_send, max_attempts=1)
+    backend = OutboxBackend(in_deadwood=True)
+    backend.runtime = rt
+    rt.start_session(monitor_for(backend), SessionCheckpoint(tmp_path / "session.jsonl"))
+
+    assert wait_for(lambda: any("announcement was never delivered" in line for line in logs))
+    assert wait_for(lambda: rt.monitor.state.presence_announced is False)
+    assert rt.monitor.state.presence_decided is True  # not asked again
+    assert backend.prompts == ["announce"]
+
+
+def test_session_events_are_fsynced_in_the_tick_that_emits_them(make_runtime, tmp_path):
+    rt, _, _ = make_runtime()
+    backend = OutboxBackend(in_deadwood=True)
+    backend.runtime = rt
+    # Never due for a periodic fsync: only an event can force one
+    checkpoint = SessionCheckpoint(tmp_path / "session.jsonl", fsync_interval=3600, clock=lambda: 1.0)
+    after_tick = []
+
+    def on_tick(ticks):
+        after_tick.append((rt.monitor.state.presence_announced, checkpoint.writes, checkpoint._unsynced))
+
+    rt.start_session(monitor_for(backend), checkpoint, max_ticks=5, on_tick=on_tick).result(5)
+    announced, writes, unsynced = next(tick for tick in after_tick if tick[0])
+    assert writes >= 1 and unsynced is False  # the announce tick's write is already on disk
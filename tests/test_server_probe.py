@@ -0,0 +1,64 @@
+import socket
+import threading
+import time
+
+from server_probe import (CONFIDENCE_IP_ONLY, CONFIDENCE_TCP_EXACT, Addr, Conn, ServerProbeSignal,
+                          parse_endpoint)
+
+
+def tcp(ip, port, status="ESTABLISHED"):
+    return Conn(socket.SOCK_STREAM, status, Addr(ip, port))
+
+
+def udp(ip, port):
+    return Conn(socket.SOCK_DGRAM, "NONE", Addr(ip, port))
+
+
+def test_parse_endpoint():
+    assert parse_endpoint("1.2.3.4:30120") == ("1.2.3.4", 30120)
+    assert parse_endpoint("play.example.com") == ("play.example.com", None)
+    assert parse_endpoint("[::1]:30120") == ("::1", 30120)
+    assert parse_endpoint("Deadwood RP") is None
+    assert parse_endpoint("host:abc") is None
+
+
+def test_scores_established_tcp_only():
+    probe = ServerProbeSignal(["1.2.3.4:30120"])
+    assert probe.score([tcp("1.2.3.4", 30120)]) == (CONFIDENCE_TCP_EXACT, "1.2.3.4:30120")
+    assert probe.score([tcp("1.2.3.4", 443)]) == (CONFIDENCE_IP_ONLY, "1.2.3.4:443")
+    assert probe.score([udp("1.2.3.4", 30120)]) == (0.0, None)
+    assert probe.score([tcp("1.2.3.4", 30120, "TIME_WAIT"), tcp("5.6.7.8", 30120)]) == (0.0, None)
+
+
+def test_poll_refreshes_on_interval_or_new_pid():
+    calls = []
+
+    def connections(pid):
+        calls.append(pid)
+        return [tcp("1.2.3.4", 30120)]
+
+    probe = ServerProbeSignal(["1.2.3.4:30120"], refresh_sec=15, connections_fn=connections)
+    assert probe.poll(1, 0.0) == CONFIDENCE_TCP_EXACT
+    assert probe.poll(1, 10.0) == CONFIDENCE_TCP_EXACT
+    assert probe.poll(2, 11.0) == CONFIDENCE_TCP_EXACT
+    assert probe.poll(2, 30.0) == CONFIDENCE_TCP_EXACT
+    assert calls == [1, 2, 2]
+
+
+def test_slow_resolver_does_not_block_poll():
+    release = threading.Event()
+
+    def resolve(host):
+        release.wait(5)
+        return ["9.9.9.9"]
+
+    probe = ServerProbeSignal(["play.example.com:30120"], resolve_fn=resolve,
+                              connections_fn=lambda pid: [tcp("9.9.9.9", 30120)])
+    started = time.monotonic()
+    assert probe.poll(1, 0.0) == 0.0
+    assert time.monotonic() - started < 1.0
+
+    release.set()
+    probe.wait_resolved(5)
+    assert probe.poll(1, 20.0) == CONFIDENCE_TCP_EXACT
+    assert probe.matched_endpoint == "9.9.9.9:30120"
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+import bench
+from presence import PresenceMonitor
+from runtime import StatusFeed
+from tick_watchdog import TickStats
+
+
+def test_newer_snapshots_replace_ones_the_ui_has_not_taken():
+    feed = StatusFeed()
+    for i in range(100):
+        feed.put("monitor", {"pid": i})
+    feed.put("other", 1)
+    assert feed.take() == {"monitor": {"pid": 99}, "other": 1}
+    assert feed.take() == {}
+    assert feed.puts == 101 and feed.coalesced == 99
+
+
+def test_put_never_waits_for_a_slow_taker():
+    feed = StatusFeed()
+    writers = [threading.Thread(target=lambda: [feed.put("monitor", i) for i in range(10_000)]) for _ in range(4)]
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join(5)
+    assert feed.puts == 40_000 and set(feed.take()) == {"monitor"}
+
+
+def live_snapshot(monitor, clock, **extra):
+    snap = monitor.snapshot()
+    snap.update(webhook_queue=0, ts=clock(), next_tick_sec=1.0, stall_sec=20.0,
+                ticks=TickStats(0.5).summary())
+    snap.update(extra)
+    return snap
+
+
+def test_live_panel_texts(backend, clock):
+    try:
+        m = bench.need_main()
+    except bench.Skip as e:
+        pytest.skip(str(e))
+    assert m.format_live_status(None, clock())["redm"] == "not monitoring"
+
+    monitor = PresenceMonitor(backend, required_hits=2, grace_sec=60, clock=clock)
+    monitor.tick("Zeke", False)
+    clock.advance(15)
+    texts = m.format_live_status(live_snapshot(monitor, clock, webhook_queue=2), clock())
+    assert texts["redm"] == "running (PID 4242)"
+    assert texts["uptime"] == "15s" and texts["grace"] == "45s left"
+    assert texts["queue"] == "2 pending" and texts["decision"] == "undecided"
+    assert set(texts) == {key for key, _ in m.LIVE_PANEL_FIELDS}
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import socket
+import sys
+
+import pytest
+
+from status_stream import STATE_IN_DEADWOOD, STATE_IN_GAME, STATE_OFFLINE, StatusStream
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_record_tracks_state_and_only_counts_changes(clock):
+    stream = StatusStream(port=0, clock=clock)
+    published = []
+    stream.publish = published.append
+
+    stream.record({"kind": "redm_start", "pid": 7, "nickname": "Zeke"})
+    stream.record({"kind": "title_scan"})  # not a state event
+    stream.record({"kind": "deadwood_enter"})
+    stream.record({"kind": "deadwood_enter"})
+    stream.record({"kind": "announce"})
+    stream.record({"kind": "deadwood_leave"})  # still announced: stays in Deadwood
+    stream.record({"kind": "close"})
+
+    assert [(m["seq"], m["state"], m["event"]) for m in published] == [
+        (1, STATE_IN_GAME, "redm_start"),
+        (2, STATE_IN_DEADWOOD, "deadwood_enter"),
+        (3, STATE_IN_DEADWOOD, "announce"),
+        (4, STATE_OFFLINE, "close"),
+    ]
+    assert published[0]["pid"] == 7 and published[0]["nickname"] == "Zeke"
+
+
+def test_resume_restores_the_announced_state(clock):
+    stream = StatusStream(port=0, clock=clock)
+    stream.record({"kind": "resume", "pid": 7, "announced": True, "in_deadwood": False})
+    assert stream.state == STATE_IN_DEADWOOD and stream.current["event"] == "resume"
+
+
+def test_http_status_and_foreign_host(clock):
+    port = free_port()
+
+    async def get(host):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET /status HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return response
+
+    async def scenario():
+        stream = StatusStream(port=port, clock=clock)
+        await stream.start()
+        try:
+            stream.record({"kind": "redm_start", "pid": 7, "nickname": "Zeke"})
+            return await get(f"127.0.0.1:{port}"), await get("evil.example")
+        finally:
+            await stream.close()
+
+    ok, rejected = asyncio.run(scenario())
+    assert ok.startswith(b"HTTP/1.1 200")
+    assert json.loads(ok.split(b"\r\n\r\n", 1)[1])["state"] == STATE_IN_GAME
+    assert rejected.startswith(b"HTTP/1.1 400")
+
+
+def test_foreign_origins_are_refused(clock):
+    port = free_port()
+
+    async def get(path, origin=None, upgrade=False):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        head = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+        if origin is not None:
+            head += f"Origin: {origin}\r\n"
+        if upgrade:
+            head += "Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+        writer.write((head + "\r\n").encode())
+        response = await reader.readuntil(b"\r\n\r\n")
+        writer.close()
+        return response
+
+    async def scenario():
+        stream = StatusStream(port=port, allowed_origins=["http://localhost:3000/"], clock=clock)
+        await stream.start()
+        try:
+            return {
+                "none": await get("/status"),
+                "file": await get("/status", "null"),
+                "own": await get("/status", f"http://localhost:{port}"),
+                "configured": await get("/status", "http://localhost:3000"),
+                "foreign": await get("/status", "https://evil.example"),
+                "ws_file": await get("/ws", "null", upgrade=True),
+                "ws_foreign": await get("/ws", "https://evil.example", upgrade=True),
+            }
+        finally:
+            await stream.close()
+
+    r = asyncio.run(scenario())
+    assert all(r[k].startswith(b"HTTP/1.1 200") for k in ("none", "file", "own", "configured"))
+    assert b"Access-Control-Allow-Origin: *" not in b"".join(r.values())
+    assert b"Access-Control-Allow-Origin" not in r["none"]
+    assert b"Access-Control-Allow-Origin: http://localhost:3000\r\n" in r["configured"]
+    assert r["ws_file"].startswith(b"HTTP/1.1 101")
+    assert r["foreign"].startswith(b"HTTP/1.1 403") and r["ws_foreign"].startswith(b"HTTP/1.1 403")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="named pipes need a Proactor client")
+def test_pipe_subscriber_gets_current_state_then_updates(tmp_path, clock):
+    path = str(tmp_path / "status.sock")
+
+    async def scenario():
+        stream = StatusStream(port=0, pipe_path=path, clock=clock)
+        await stream.start()
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            first = json.loads(await asyncio.wait_for(reader.readline(), 2))
+            stream.record({"kind": "redm_start", "pid": 7, "nickname": "Zeke"})
+            second = json.loads(await asyncio.wait_for(reader.readline(), 2))
+            writer.close()
+            return first, second
+        finally:
+            await stream.close()
+
+    first, second = asyncio.run(scenario())
+    assert first["state"] == STATE_OFFLINE and first["seq"] == 0
+    assert second["state"] == STATE_IN_GAME and second["seq"] == 1
@@ -0,0 +1,62 @@
+import threading
+
+import runtime
+from checkpoint import SessionCheckpoint
+from conftest import FakeBackend, monitor_for, wait_for
+from tick_watchdog import TickStats
+
+
+def test_hung_title_scan_restarts_the_observer_and_is_skipped(make_runtime, monkeypatch, tmp_path):
+    monkeypatch.setattr(runtime, "RESTART_BACKOFF_SEC", 0.05)
+    monkeypatch.setattr(runtime, "STAGE_SKIP_SEC", 0.5)
+    rt, _, logs = make_runtime(stall_sec=0.2)
+    backend = FakeBackend(in_deadwood=True)
+    backend.hang_titles = threading.Event()
+    rt.start_session(monitor_for(backend), SessionCheckpoint(tmp_path / "session.jsonl"))
+
+    assert wait_for(lambda: rt.tick_stats.restarts >= 1)
+    assert any("skipping title_scan for pid 4242" in line for line in logs)
+    # Ticks go on without the title scan while it is skipped
+    assert wait_for(lambda: rt.tick_stats.ticks >= 3)
+
+    backend.hang_titles.set()
+    assert wait_for(lambda: any("title_scan answered again" in line for line in logs))
+    assert wait_for(lambda: backend.prompts == ["announce"])
+    incident = rt.tick_stats.last_incident
+    assert incident["stage"] == "title_scan" and incident["restarted"] is True
+
+
+def test_hung_threads_are_capped(make_runtime, monkeypatch, tmp_path):
+    monkeypatch.setattr(runtime, "RESTART_BACKOFF_SEC", 0.02)
+    monkeypatch.setattr(runtime, "STAGE_SKIP_SEC", 0.05)
+    monkeypatch.setattr(runtime, "MAX_ABANDONED_OBSERVERS", 2)
+    earlier = set(threading.enumerate())  # observers of earlier tests may still be winding down
+    rt, _, logs = make_runtime(stall_sec=0.1)
+    backend = FakeBackend(in_deadwood=True)
+    backend.hang_titles = threading.Event()
+    try:
+        rt.start_session(monitor_for(backend), SessionCheckpoint(tmp_path / "session.jsonl"))
+        assert wait_for(lambda: any("waiting instead of restarting" in line for line in logs))
+        observers = [t for t in threading.enumerate() if t.name.startswith("monitor-observer") and t not in earlier]
+        assert len(observers) <= 3
+        assert rt.tick_stats.restarts == 2
+    finally:
+        backend.hang_titles.set()
+
+
+def test_tick_stats():
+    logs = []
+    now = [0.0]
+    stats = TickStats(slo_sec=0.1, log_fn=logs.append, clock=lambda: now[0])
+    for latency in (0.01, 0.02, 0.5, 0.6):
+        stats.record(latency, {"title_scan": latency})
+    assert len(logs) == 1 and "slowest stage title_scan 500 ms" in logs[0]
+    now[0] = 120.0
+    stats.record(0.7)
+    assert "(1 more since the last report)" in logs[-1]
+
+    stats.stall("title_scan", 20.0, generation=3, restarted=False)
+    summary = stats.summary()
+    assert summary["ticks"] == 5 and summary["slo_breaches"] == 3 and summary["max_ms"] == 700.0
+    assert summary["stalls"] == {"title_scan": 1} and summary["restarts"] == 0
+    assert summary["last_incident"]["restarted"] is False
@@ -0,0 +1,92 @@
+"""
+Tick watchdog bookkeeping.
+
+MonitorRuntime runs each PresenceMonitor tick on an observer thread and waits for it
+with a stall timeout. TickStats keeps what that produces: a rolling window of tick
+latencies measured against the configured SLO, which stage made a tick slow, and
+every stall (the stage the observer was stuck in, how long, which generation of the
+observer was abandoned). summary() is what the live panel and the logs show.
+
+The constants below also bound what recovery may do: how many hung observer threads
+can be left behind, how fast restarts may follow each other, and how long a stage
+that hung (title scan, signals) is skipped for the RedM process it hung on.
+"""
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+
+TICK_SLO_MS = 500             # a tick slower than this counts as an SLO breach
+STALL_SEC = 20.0              # a tick that hasn't finished after this is a hang
+LATENCY_WINDOW = 256          # ticks kept for the percentiles
+BREACH_LOG_INTERVAL_SEC = 60  # at most one "slow tick" log line per minute
+MAX_ABANDONED_OBSERVERS = 3   # hung threads left behind before we stop starting new ones
+RESTART_BACKOFF_SEC = 1.0     # wait before ticking again after a restart, doubling per stall in a row
+RESTART_BACKOFF_MAX_SEC = 60.0
+STAGE_SKIP_SEC = 60.0         # a stage that hung is skipped this long, then probed (doubling, too)
+STAGE_SKIP_MAX_SEC = 15 * 60
+SKIPPABLE_STAGES = ("title_scan", "signals")
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class TickStats:
+    def __init__(self, slo_sec: float = TICK_SLO_MS / 1000.0, window: int = LATENCY_WINDOW,
+                 log_fn: Callable[[str], None] = lambda msg: None, clock: Callable[[], float] = time.monotonic):
+        self.slo_sec = slo_sec
+        self.log_fn = log_fn
+        self.clock = clock
+        self._latencies = deque(maxlen=window)
+        self.ticks = 0
+        self.breaches = 0
+        self.max_sec = 0.0
+        self.stalls: Dict[str, int] = {}
+        self.restarts = 0
+        self.last_incident: Optional[dict] = None
+        self._breaches_unlogged = 0
+        self._last_breach_log = float("-inf")
+
+    def record(self, latency_sec: float, stage_times: Optional[dict] = None) -> None:
+        self.ticks += 1
+        self._latencies.append(latency_sec)
+        self.max_sec = max(self.max_sec, latency_sec)
+        if latency_sec <= self.slo_sec:
+            return
+        self.breaches += 1
+        self._breaches_unlogged += 1
+        now = self.clock()
+        if now - self._last_breach_log < BREACH_LOG_INTERVAL_SEC:
+            return
+        slowest = max((stage_times or {}).items(), key=lambda kv: kv[1], default=None)
+        where = f", slowest stage {slowest[0]} {slowest[1] * 1000:.0f} ms" if slowest else ""
+        more = f" ({self._breaches_unlogged - 1} more since the last report)" if self._breaches_unlogged > 1 else ""
+        self.log_fn(f"Watchdog: tick took {latency_sec * 1000:.0f} ms, SLO {self.slo_sec * 1000:.0f} ms{where}{more}")
+        self._breaches_unlogged = 0
+        self._last_breach_log = now
+
+    def stall(self, stage: str, elapsed_sec: float, generation: int, restarted: bool = True) -> None:
+        self.stalls[stage] = self.stalls.get(stage, 0) + 1
+        if restarted:
+            self.restarts += 1
+        self.last_incident = {"ts": time.time(), "stage": stage, "elapsed_sec": round(elapsed_sec, 3),
+                              "generation": generation, "restarted": restarted}
+
+    def summary(self) -> dict:
+        ordered = sorted(self._latencies)
+        return {
+            "ticks": self.ticks,
+            "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 99) * 1000, 3),
+            "max_ms": round(self.max_sec * 1000, 3),
+            "slo_ms": round(self.slo_sec * 1000),
+            "slo_breaches": self.breaches,
+            "stalls": dict(self.stalls),
+            "restarts": self.restarts,
+            "last_incident": self.last_incident,
+        }